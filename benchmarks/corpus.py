@@ -0,0 +1,168 @@
+# benchmarks/corpus.py
+
+"""
+Synthetic notebook corpus for the pipeline benchmarks.
+
+    python benchmarks/corpus.py bench_corpus --notebooks 50 --cells 80 --output-kb 256 --data-mb 4
+
+Writes <dest>/notebooks/nb_XXXX.ipynb plus per-notebook data files under
+<dest>/notebooks/data/. Everything is derived from --seed, so a corpus can be
+regenerated byte for byte instead of being stored.
+"""
+
+import base64
+import json
+import random
+from pathlib import Path
+import click
+import nbformat
+from nbformat.v4 import new_code_cell, new_markdown_cell, new_notebook, new_output
+from rich import print
+
+# Module -> relative weight; a mix of stdlib, common third-party and aliased imports
+DEFAULT_IMPORT_MIX = {
+    "os": 4, "sys": 3, "json": 3, "re": 2, "pathlib": 2, "collections": 2,
+    "numpy": 5, "pandas": 5, "matplotlib.pyplot": 4, "scipy.stats": 2,
+    "sklearn.linear_model": 2, "requests": 2, "yaml": 1, "PIL": 1, "seaborn": 1,
+}
+ALIASES = {"numpy": "np", "pandas": "pd", "matplotlib.pyplot": "plt", "seaborn": "sns"}
+
+CELL_TEMPLATES = [
+    "values = [i ** 2 for i in range({n})]\ntotal = sum(values)\nprint(total)",
+    "def step_{n}(x, y=2):\n    result = x * y\n    return result + {n}\n\nstep_{n}(3)",
+    "data = {{'a': {n}, 'b': [1, 2, 3]}}\nfor key, value in data.items():\n    print(key, value)",
+    "%time total_{n} = sum(range({n}))",
+    "!echo cell {n}",
+    # Deliberate style issues so the linters have something to report
+    "x={n};y = x+1 ;print( y )",
+    "import os\nunused_{n} = os.path.join('a', 'b', 'c', 'd', 'e', 'f', 'g', 'h', 'i', 'j', 'k', 'l', 'm', 'n', 'o')",
+]
+
+
+def parse_import_mix(spec: str) -> dict[str, float]:
+    """Parse "numpy=5,pandas=2,os" into module -> weight (weight defaults to 1)."""
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight) if weight else 1.0
+    return mix
+
+
+def _import_line(module: str) -> str:
+    if module in ALIASES:
+        return f"import {module} as {ALIASES[module]}"
+    if "." in module:
+        package, _, name = module.rpartition(".")
+        return f"from {package} import {name}"
+    return f"import {module}"
+
+
+def _outputs(rng: random.Random, output_kb: int) -> list:
+    """A text stream plus a PNG-sized base64 blob of roughly output_kb."""
+    outputs = [new_output("stream", name="stdout", text=f"{rng.random():.6f}\n" * rng.randint(1, 20))]
+    if output_kb:
+        blob = base64.b64encode(rng.randbytes(output_kb * 1024 * 3 // 4)).decode("ascii")
+        outputs.append(new_output("display_data", data={"image/png": blob, "text/plain": "<Figure>"}))
+    return outputs
+
+
+def generate_notebook(rng: random.Random, cells: int, import_mix: dict[str, float],
+                      output_kb: int, output_ratio: float) -> nbformat.NotebookNode:
+    modules, weights = list(import_mix), list(import_mix.values())
+    nb = new_notebook()
+    nb.metadata["kernelspec"] = {"name": "python3", "display_name": "Python 3", "language": "python"}
+    imported = sorted(set(rng.choices(modules, weights, k=min(len(modules), rng.randint(2, 8))))) if modules else []
+    nb.cells.append(new_markdown_cell(f"# Synthetic notebook\n\nSeed value {rng.random():.6f}"))
+    nb.cells.append(new_code_cell("\n".join(_import_line(m) for m in imported)))
+
+    for n in range(cells - 2):
+        if rng.random() < 0.15:
+            nb.cells.append(new_markdown_cell(f"## Section {n}\n\n" + "Lorem ipsum dolor sit amet. " * rng.randint(1, 10)))
+            continue
+        source = rng.choice(CELL_TEMPLATES).format(n=n)
+        if modules and rng.random() < 0.1:
+            # Imports scattered through the notebook, not only at the top
+            source = _import_line(rng.choices(modules, weights)[0]) + "\n" + source
+        cell = new_code_cell(source, execution_count=n + 1)
+        if rng.random() < output_ratio:
+            cell.outputs = _outputs(rng, output_kb)
+        nb.cells.append(cell)
+    return nb
+
+
+def _write_data(rng: random.Random, folder: Path, stem: str, size: int):
+    """Half compressible CSV, half random binary, like typical research data."""
+    folder.mkdir(parents=True, exist_ok=True)
+    rows = []
+    written = 0
+    while written < size // 2:
+        row = f"{rng.randint(0, 10 ** 6)},{rng.random():.8f},{rng.choice(('a', 'b', 'c'))}\n"
+        rows.append(row)
+        written += len(row)
+    (folder / f"{stem}.csv").write_text("id,value,label\n" + "".join(rows))
+    (folder / f"{stem}.bin").write_bytes(rng.randbytes(size - size // 2))
+
+
+def generate_corpus(
+    dest: Path,
+    notebooks: int = 20,
+    cells: int = 50,
+    import_mix: dict[str, float] = None,
+    output_kb: int = 64,
+    output_ratio: float = 0.3,
+    data_mb: float = 1.0,
+    seed: int = 0,
+) -> dict:
+    """
+    Write a reproducible corpus of synthetic notebooks under dest/notebooks.
+
+    Every notebook gets `cells` cells drawing imports from import_mix
+    (module -> weight), an embedded output of about output_kb on
+    output_ratio of its code cells, and data_mb of data files in data/.
+    Returns the corpus description that is stored alongside benchmark results.
+    """
+    dest = Path(dest)
+    notebook_dir = dest / "notebooks"
+    notebook_dir.mkdir(parents=True, exist_ok=True)
+    import_mix = DEFAULT_IMPORT_MIX if import_mix is None else import_mix
+    rng = random.Random(seed)
+
+    for i in range(notebooks):
+        stem = f"nb_{i:04d}"
+        nb = generate_notebook(rng, max(cells, 2), import_mix, output_kb, output_ratio)
+        with open(notebook_dir / f"{stem}.ipynb", "w", encoding="utf-8") as f:
+            nbformat.write(nb, f)
+        if data_mb:
+            _write_data(rng, notebook_dir / "data", stem, int(data_mb * 1024 * 1024))
+
+    spec = {
+        "notebooks": notebooks,
+        "cells": cells,
+        "import_mix": import_mix,
+        "output_kb": output_kb,
+        "output_ratio": output_ratio,
+        "data_mb": data_mb,
+        "seed": seed,
+    }
+    with open(dest / "corpus.json", "w") as f:
+        json.dump(spec, f, indent=2)
+    return spec
+
+
+@click.command()
+@click.argument("dest", type=click.Path(file_okay=False))
+@click.option("--notebooks", "-n", default=20, show_default=True, help="Number of notebooks")
+@click.option("--cells", "-m", default=50, show_default=True, help="Cells per notebook")
+@click.option("--imports", default=None, help="Import mix as module=weight pairs, e.g. 'numpy=5,pandas=2,os'")
+@click.option("--output-kb", default=64, show_default=True, help="Size of each embedded image output in KB")
+@click.option("--output-ratio", default=0.3, show_default=True, help="Fraction of code cells with outputs")
+@click.option("--data-mb", default=1.0, show_default=True, help="Size of the data files per notebook in MB")
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+def main(dest, notebooks, cells, imports, output_kb, output_ratio, data_mb, seed):
+    mix = parse_import_mix(imports) if imports else None
+    generate_corpus(Path(dest), notebooks, cells, mix, output_kb, output_ratio, data_mb, seed)
+    print(f"[green]✅ Generated {notebooks} notebooks in {Path(dest) / 'notebooks'}[/]")
+
+
+if __name__ == "__main__":
+    main()
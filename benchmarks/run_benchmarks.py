@@ -0,0 +1,295 @@
+# benchmarks/run_benchmarks.py
+
+"""
+Stage-by-stage benchmark of the notebook pipeline on a synthetic corpus.
+
+    python benchmarks/run_benchmarks.py --notebooks 50 --cells 80
+    python benchmarks/run_benchmarks.py --save-baseline     # record benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py                     # compare against it, exit 1 on regression
+
+Each stage of checks_pipeline runs over the whole corpus with the functions
+the CLI uses: parsing, import extraction, style, dependency files, crate
+build, zip and upload (to the local Zenodo emulator). Times are the best of
+--repeat runs; peak memory is the Python heap high-water mark of a separate
+traced run, so tracing never skews the timings.
+"""
+
+import contextlib
+import io
+import json
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+import click
+from rich import print
+from rich.table import Table
+from corpus import generate_corpus, parse_import_mix
+from repronotebook.checks_pipeline.notebook_document import clear_notebook_cache, load_notebook
+from repronotebook.checks_pipeline.dependency_check.dependency import (
+    extract_imports_from_notebook,
+    generate_environment_yml,
+    generate_requirements
+)
+from repronotebook.checks_pipeline.styling_check.style_engine import check_style
+from repronotebook.ro_crate_library.library_rocrate import generate_ro_crate_from_manifest
+from repronotebook.push_to_zenodo.emulator import ZenodoEmulator
+from repronotebook.push_to_zenodo.postprocessing import generate_zenodo_metadata, zip_ro_crate
+from repronotebook.push_to_zenodo.upload_scheduler import schedule_uploads
+
+STAGES = ["parse", "imports", "style", "dependencies", "crate", "zip", "upload"]
+DEFAULT_BASELINE = Path(__file__).parent / "baseline.json"
+# Differences below this many seconds are noise, whatever the percentage
+MIN_REGRESSION_SECONDS = 0.05
+
+
+def _tree_size(path: Path) -> int:
+    return sum(p.stat().st_size for p in Path(path).rglob("*") if p.is_file())
+
+
+class _Run:
+    """One pass of every stage over the corpus, in a fresh work directory."""
+
+    def __init__(self, notebooks: list[Path], work_dir: Path, api_url: str, upload_concurrency: int):
+        self.notebooks = notebooks
+        self.work_dir = work_dir
+        self.api_url = api_url
+        self.upload_concurrency = upload_concurrency
+        self.docs = []
+        self.crates = []
+        self.zips = []
+
+    def parse(self) -> int:
+        clear_notebook_cache()
+        self.docs = [load_notebook(nb) for nb in self.notebooks]
+        return sum(doc.size for doc in self.docs)
+
+    def imports(self) -> int:
+        for doc in self.docs:
+            extract_imports_from_notebook(doc)
+        return 0
+
+    def style(self) -> int:
+        # Fresh per-cell cache: this measures cold linting
+        cache_dir = self.work_dir / "cache" / "style"
+        for doc in self.docs:
+            check_style(doc, cache_dir)
+        return 0
+
+    def dependencies(self) -> int:
+        for doc in self.docs:
+            out_dir = self.work_dir / "dependencies" / doc.stem
+            out_dir.mkdir(parents=True, exist_ok=True)
+            generate_requirements(doc, out_dir, overwrite=True)
+            generate_environment_yml(doc, out_dir, overwrite=True)
+        return 0
+
+    def crate(self) -> int:
+        self.crates = []
+        for doc in self.docs:
+            deps = self.work_dir / "dependencies" / doc.stem
+            manifest = {doc.name: doc.path}
+            for filename in ("requirements.txt", "environment.yml"):
+                manifest[filename] = deps / filename
+            for data_file in sorted((doc.path.parent / "data").glob(f"{doc.stem}.*")):
+                manifest[f"data/{data_file.name}"] = data_file
+            crate_folder = self.work_dir / "ro_crates" / f"{doc.stem}-ro-crate"
+            generate_ro_crate_from_manifest(manifest, crate_folder, "Benchmark", metadata_folder=doc.path.parent)
+            self.crates.append(crate_folder)
+        return sum(_tree_size(c) for c in self.crates)
+
+    def zip(self) -> int:
+        self.zips = [zip_ro_crate(c, output_path=c.with_suffix(".zip")) for c in self.crates]
+        return sum(z.stat().st_size for z in self.zips)
+
+    def upload(self) -> int:
+        zenodo_dir = self.work_dir / "zenodo"
+        jobs = []
+        for doc, crate, zip_path in zip(self.docs, self.crates, self.zips):
+            metadata_path = generate_zenodo_metadata(crate, f"RO-Crate for {doc.stem}", "Benchmark upload", "Benchmark",
+                                                     output_path=zenodo_dir / f"zenodo_metadata_{doc.stem}.json")
+            jobs.append({
+                "notebook": str(doc.path),
+                "zip_path": str(zip_path),
+                "metadata_path": str(metadata_path),
+                "state_path": str(zenodo_dir / f"upload_state_{doc.stem}.json"),
+                "results_path": str(zenodo_dir / f"upload_results_{doc.stem}.json"),
+            })
+        # A generous client-side rate so the emulator's settings, not the limiter, set the pace
+        outcomes = schedule_uploads(jobs, zenodo_dir, access_token="benchmark", base_url=self.api_url,
+                                    concurrency=self.upload_concurrency, rate=1000)
+        failed = [nb for nb, o in outcomes.items() if o.get("status") != "done"]
+        if failed:
+            raise RuntimeError(f"{len(failed)} emulated upload(s) failed")
+        return sum(z.stat().st_size for z in self.zips)
+
+
+def run_stages(notebooks: list[Path], api_url: str, upload_concurrency: int, trace_memory: bool = False) -> dict:
+    """Run every stage once; returns stage -> {seconds, bytes, peak_mb}."""
+    work_dir = Path(tempfile.mkdtemp(prefix="repronotebook-bench-"))
+    run = _Run(notebooks, work_dir, api_url, upload_concurrency)
+    results = {}
+    try:
+        for stage in STAGES:
+            if trace_memory:
+                tracemalloc.start()
+            started = time.perf_counter()
+            # The pipeline reports progress on stdout; keep it out of the measurements
+            with contextlib.redirect_stdout(io.StringIO()):
+                processed = getattr(run, stage)()
+            seconds = time.perf_counter() - started
+            results[stage] = {"seconds": seconds, "bytes": processed}
+            if trace_memory:
+                results[stage]["peak_mb"] = tracemalloc.get_traced_memory()[1] / (1024 * 1024)
+                tracemalloc.stop()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def benchmark(notebooks: list[Path], repeat: int, memory: bool, upload_concurrency: int, emulator_options: dict) -> dict:
+    """Best-of-`repeat` timings per stage, plus peak memory from one traced run."""
+    stages = {stage: {"seconds": float("inf")} for stage in STAGES}
+    with ZenodoEmulator(**emulator_options) as emulator:
+        for _ in range(repeat):
+            for stage, measured in run_stages(notebooks, emulator.api_url, upload_concurrency).items():
+                if measured["seconds"] < stages[stage]["seconds"]:
+                    stages[stage] = measured
+        if memory:
+            traced = run_stages(notebooks, emulator.api_url, upload_concurrency, trace_memory=True)
+            for stage, measured in traced.items():
+                stages[stage]["peak_mb"] = measured["peak_mb"]
+
+    for measured in stages.values():
+        seconds = max(measured["seconds"], 1e-9)
+        measured["notebooks_per_s"] = len(notebooks) / seconds
+        if measured["bytes"]:
+            measured["mb_per_s"] = measured["bytes"] / (1024 * 1024) / seconds
+    return stages
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Stages whose time or peak memory grew by more than tolerance (a fraction) over the baseline."""
+    regressions = []
+    for stage, measured in current.items():
+        previous = baseline.get(stage)
+        if not previous:
+            continue
+        slower = measured["seconds"] - previous["seconds"]
+        if slower > MIN_REGRESSION_SECONDS and measured["seconds"] > previous["seconds"] * (1 + tolerance):
+            regressions.append(f"{stage}: {previous['seconds']:.3f}s -> {measured['seconds']:.3f}s")
+        if "peak_mb" in measured and "peak_mb" in previous and previous["peak_mb"] > 1:
+            if measured["peak_mb"] > previous["peak_mb"] * (1 + tolerance):
+                regressions.append(f"{stage}: peak {previous['peak_mb']:.1f} MB -> {measured['peak_mb']:.1f} MB")
+    return regressions
+
+
+def print_results(stages: dict, baseline: dict = None):
+    table = Table(title="Pipeline benchmark")
+    table.add_column("Stage")
+    table.add_column("Time (s)", justify="right")
+    table.add_column("Notebooks/s", justify="right")
+    table.add_column("MB/s", justify="right")
+    table.add_column("Peak MB", justify="right")
+    if baseline:
+        table.add_column("vs baseline", justify="right")
+    for stage, measured in stages.items():
+        row = [
+            stage,
+            f"{measured['seconds']:.3f}",
+            f"{measured['notebooks_per_s']:.1f}",
+            f"{measured['mb_per_s']:.1f}" if "mb_per_s" in measured else "-",
+            f"{measured['peak_mb']:.1f}" if "peak_mb" in measured else "-",
+        ]
+        if baseline:
+            previous = baseline.get(stage)
+            row.append(f"{(measured['seconds'] / previous['seconds'] - 1) * 100:+.0f}%" if previous else "-")
+        table.add_row(*row)
+    print(table)
+
+
+@click.command()
+@click.option("--corpus", "corpus_dir", type=click.Path(file_okay=False), help="Existing corpus from corpus.py (default: generate a temporary one)")
+@click.option("--notebooks", "-n", default=20, show_default=True, help="Number of notebooks to generate")
+@click.option("--cells", "-m", default=50, show_default=True, help="Cells per generated notebook")
+@click.option("--imports", default=None, help="Import mix as module=weight pairs, e.g. 'numpy=5,pandas=2,os'")
+@click.option("--output-kb", default=64, show_default=True, help="Size of each embedded image output in KB")
+@click.option("--data-mb", default=1.0, show_default=True, help="Size of the data files per notebook in MB")
+@click.option("--seed", default=0, show_default=True, help="Corpus random seed")
+@click.option("--repeat", "-r", default=3, show_default=True, help="Runs per stage; the fastest counts")
+@click.option("--no-memory", is_flag=True, help="Skip the traced run that measures peak memory")
+@click.option("--upload-concurrency", default=4, show_default=True, help="Depositions uploaded at the same time")
+@click.option("--latency", default=0.0, show_default=True, help="Emulated Zenodo latency per request in seconds")
+@click.option("--bandwidth", default=None, type=float, help="Emulated Zenodo upload bandwidth in MB/s")
+@click.option("--baseline", "baseline_path", type=click.Path(dir_okay=False), default=str(DEFAULT_BASELINE), show_default=True, help="Baseline results to compare against")
+@click.option("--save-baseline", is_flag=True, help="Store these results as the new baseline")
+@click.option("--tolerance", default=0.2, show_default=True, help="Allowed slowdown over the baseline (0.2 = 20%)")
+@click.option("--output", type=click.Path(dir_okay=False), help="Also write the results to this JSON file")
+def main(corpus_dir, notebooks, cells, imports, output_kb, data_mb, seed, repeat, no_memory, upload_concurrency,
+         latency, bandwidth, baseline_path, save_baseline, tolerance, output):
+    temp_corpus = None
+    if corpus_dir:
+        corpus_dir = Path(corpus_dir)
+        spec_path = corpus_dir / "corpus.json"
+        corpus = json.loads(spec_path.read_text()) if spec_path.exists() else {"path": str(corpus_dir)}
+    else:
+        temp_corpus = corpus_dir = Path(tempfile.mkdtemp(prefix="repronotebook-corpus-"))
+        print(f"[bold]🧪 Generating {notebooks} notebooks x {cells} cells...[/]")
+        corpus = generate_corpus(corpus_dir, notebooks, cells, parse_import_mix(imports) if imports else None,
+                                 output_kb=output_kb, data_mb=data_mb, seed=seed)
+
+    notebook_paths = sorted((corpus_dir / "notebooks").glob("*.ipynb")) or sorted(corpus_dir.glob("*.ipynb"))
+    if not notebook_paths:
+        print("[red]❌ No notebooks found in the corpus[/]")
+        sys.exit(2)
+
+    emulator_options = {"latency": latency, "bandwidth": bandwidth * 1024 * 1024 if bandwidth else None}
+    print(f"[bold]⏱️ Benchmarking {len(notebook_paths)} notebooks ({repeat} run(s) per stage)...[/]")
+    try:
+        stages = benchmark(notebook_paths, max(1, repeat), not no_memory, upload_concurrency, emulator_options)
+    finally:
+        if temp_corpus:
+            shutil.rmtree(temp_corpus, ignore_errors=True)
+
+    results = {
+        "corpus": corpus,
+        "repeat": repeat,
+        "upload_concurrency": upload_concurrency,
+        "emulator": {"latency": latency, "bandwidth_mb_s": bandwidth},
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "stages": stages,
+    }
+
+    baseline_path = Path(baseline_path)
+    baseline = None
+    if baseline_path.exists() and not save_baseline:
+        baseline = json.loads(baseline_path.read_text())
+        if baseline.get("corpus") != corpus:
+            print("[yellow]⚠️ Baseline was recorded on a different corpus; not comparing[/]")
+            baseline = None
+    print_results(stages, baseline["stages"] if baseline else None)
+    print(f"[bold]📊 Max RSS: {results['max_rss_mb']:.0f} MB[/]")
+
+    if output:
+        Path(output).write_text(json.dumps(results, indent=2))
+    if save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print(f"[green]✅ Baseline saved to {baseline_path}[/]")
+    elif baseline:
+        regressions = compare(stages, baseline["stages"], tolerance)
+        if regressions:
+            print(f"[red]❌ {len(regressions)} regression(s) over {tolerance:.0%}:[/]")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("[green]✅ No regressions against the baseline[/]")
+
+
+if __name__ == "__main__":
+    main()
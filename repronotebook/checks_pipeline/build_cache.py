@@ -0,0 +1,146 @@
+# repronotebook/checks_pipeline/build_cache.py
+
+import hashlib
+import json
+import os
+import sys
+from importlib.metadata import PackageNotFoundError, version
+from pathlib import Path
+from typing import Any, Optional
+
+MANIFEST_VERSION = 1
+# Machine-wide caches (distribution index, Conda env pool) live outside generated/
+USER_CACHE_DIR = Path(os.environ.get("REPRONOTEBOOK_CACHE_DIR", Path.home() / ".cache" / "repronotebook"))
+_CHUNK_SIZE = 1024 * 1024
+
+
+def tool_version(name: str) -> str:
+    """Return the installed version of a Python distribution, or 'missing'."""
+    try:
+        return version(name)
+    except PackageNotFoundError:
+        return "missing"
+
+
+class BuildCache:
+    """
+    Content-hash manifest that lets unchanged pipeline stages be skipped.
+
+    Each notebook gets its own manifest file so parallel workers never write
+    to the same file. For every stage the manifest stores a digest of the
+    stage's inputs, the hashes of the files it produced and any small result
+    data (e.g. style issues) needed to replay the stage without running it.
+    """
+
+    def __init__(self, manifest_path: Path, force: bool = False):
+        self.manifest_path = Path(manifest_path)
+        self.force = force
+        self.hits = 0
+        self.misses = 0
+        self._file_hashes = {}
+        self.stages = {}
+        if self.manifest_path.exists():
+            try:
+                with open(self.manifest_path, "r") as f:
+                    manifest = json.load(f)
+                if manifest.get("version") == MANIFEST_VERSION:
+                    self.stages = manifest.get("stages", {})
+            except (OSError, ValueError):
+                self.stages = {}
+
+    def hash_file(self, path: Path) -> str:
+        """sha256 of a file, memoized per (path, size, mtime) for this run."""
+        stat = os.stat(path)
+        key = (str(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._file_hashes:
+            digest = hashlib.sha256()
+            with open(path, "rb") as f:
+                for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            self._file_hashes[key] = digest.hexdigest()
+        return self._file_hashes[key]
+
+    def digest(self, *inputs: Any) -> str:
+        """
+        Hash a stage's inputs.
+
+        Paths are hashed by content (directories recursively, in sorted order,
+        missing paths as a marker); everything else by its JSON representation.
+        """
+        digest = hashlib.sha256()
+        for item in inputs:
+            if isinstance(item, Path):
+                if item.is_dir():
+                    for file in sorted(p for p in item.rglob("*") if p.is_file()):
+                        digest.update(str(file.relative_to(item)).encode())
+                        digest.update(self.hash_file(file).encode())
+                elif item.exists():
+                    digest.update(self.hash_file(item).encode())
+                else:
+                    digest.update(b"<missing>")
+            else:
+                digest.update(json.dumps(item, sort_keys=True, default=str).encode())
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _outputs_intact(self, outputs: dict[str, str]) -> bool:
+        for path, expected in outputs.items():
+            path = Path(path)
+            if not path.is_file() or self.hash_file(path) != expected:
+                return False
+        return True
+
+    def lookup(self, stage: str, inputs_digest: str) -> Optional[dict]:
+        """
+        Return the recorded data for a stage if it can be skipped.
+
+        A stage is a hit when its inputs digest matches the manifest and every
+        recorded output still exists with the same content.
+        """
+        entry = self.stages.get(stage)
+        if (
+            not self.force
+            and entry is not None
+            and entry["inputs"] == inputs_digest
+            and self._outputs_intact(entry["outputs"])
+        ):
+            self.hits += 1
+            return entry.get("data") or {}
+        self.misses += 1
+        return None
+
+    def record(self, stage: str, inputs_digest: str, outputs: list[Path] = (), data: dict = None):
+        """Store a stage's inputs digest, output hashes and result data."""
+        files = []
+        for output in outputs:
+            output = Path(output)
+            if output.is_dir():
+                files.extend(p for p in output.rglob("*") if p.is_file())
+            elif output.is_file():
+                files.append(output)
+        self.stages[stage] = {
+            "inputs": inputs_digest,
+            "outputs": {str(p.resolve()): self.hash_file(p) for p in files},
+            "data": data or {},
+        }
+
+    def save(self):
+        """Write the manifest atomically."""
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.manifest_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"version": MANIFEST_VERSION, "stages": self.stages}, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+
+def pipeline_fingerprint() -> dict[str, str]:
+    """Versions of the tools whose output ends up in generated artifacts."""
+    return {
+        "python": sys.version.split()[0],
+        "repronotebook": tool_version("repronotebook"),
+        "nbformat": tool_version("nbformat"),
+        "rocrate": tool_version("rocrate"),
+        "flakenb": tool_version("flakenb"),
+        "pyflakes": tool_version("pyflakes"),
+        "pycodestyle": tool_version("pycodestyle"),
+    }
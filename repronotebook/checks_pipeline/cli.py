@@ -1,24 +1,14 @@
 # repronotebook/checks_pipeline/cli.py
 import click
+import time
 from rich import print
 from pathlib import Path
-import os
-import json
-from repronotebook.checks_pipeline.styling_check.styling import run_flakenb
-from repronotebook.checks_pipeline.dependency_check.dependency import (
-    extract_imports_from_notebook,
-    check_existing_dependency_file,
-    generate_requirements,
-    generate_environment_yml
-)
-from repronotebook.checks_pipeline.conda_env.execute_conda import (
-    create_conda_env,
-    run_notebook_in_env,
-    remove_conda_env
-)
-from repronotebook.ro_crate_library.library_rocrate import generate_ro_crate_with_library
-from repronotebook.push_to_zenodo.postprocessing import zip_ro_crate, generate_zenodo_metadata
-from repronotebook.push_to_zenodo.zenodo_upload import upload_ro_crate_to_zenodo
+from itertools import chain, islice
+from repronotebook.checks_pipeline.discovery import iter_notebooks
+from repronotebook.checks_pipeline.preflight import get_preflight
+from repronotebook.checks_pipeline.execution.profiling import print_hot_cells
+from repronotebook.checks_pipeline.tracing import enable_tracing, finish_tracing
+from repronotebook.checks_pipeline.pipeline import determine_output_root, prepare_output_dirs, run_pipeline, print_summary, print_cache_report
 
 
 
@@ -27,199 +17,107 @@ from repronotebook.push_to_zenodo.zenodo_upload import upload_ro_crate_to_zenodo
 @click.option('--fail-on-style', is_flag=True, help='Abort if flakenb detects any style issues')
 @click.option('--author', default='Unknown', help='Notebook author')
 @click.option('--use-conda', is_flag=True, help='Use Conda environment for execution')
-@click.option('--remove-conda-env', is_flag=True, help='Delete Conda env after execution')
+@click.option('--conda-pool-size', type=int, default=5, show_default=True, help='Maximum number of cached Conda envs to keep (least recently used are removed)')
+@click.option('--conda-pool-disk', type=float, default=None, help='Maximum total size in GB of cached Conda envs')
+@click.option('--remove-conda-env', is_flag=True, help='Delete Conda env after execution (same as --conda-pool-size 0)')
+@click.option('--engine', type=click.Choice(['nbclient', 'nbconvert']), default='nbclient', show_default=True, help='Execution engine: pooled in-process kernels or `conda run jupyter nbconvert`')
+@click.option('--cell-timeout', type=float, default=None, help='Maximum seconds per cell')
+@click.option('--notebook-timeout', type=float, default=None, help='Maximum seconds per notebook')
+@click.option('--kernel-reset', type=click.Choice(['restart', 'reset']), default='restart', show_default=True, help='Between notebooks, restart pooled kernels or only clear their namespace (faster, keeps imported modules)')
+@click.option('--profile', is_flag=True, help='Record wall time, CPU time and peak RSS of every cell to generated/profiles/')
+@click.option('--profile-top', default=10, show_default=True, help='Number of hot cells to list at the end of a profiled run')
+@click.option('--embed-timings', is_flag=True, help='Store per-cell timings in the executed notebook\'s cell metadata')
+@click.option('--incremental', is_flag=True, help='Re-execute only from the first changed cell, restoring kernel state from a checkpoint (needs dill in the env)')
+@click.option('--full', is_flag=True, help='Execute every cell and compare the outputs with the ones --incremental runs cached')
 @click.option('--generate-rocrate', is_flag=True, help='Generate RO-Crate for the notebook')
+@click.option('--externalize-outputs', is_flag=True, help='Move large cell outputs into content-addressed files under blobs/ in the RO-Crate')
+@click.option('--externalize-min-size', default=64, show_default=True, help='Smallest output in KB moved by --externalize-outputs')
 @click.option('--upload', is_flag=True, help='Upload to Zenodo')
 @click.option('--validate', is_flag=True, help='Validate RO-Crate')
 @click.option('--zenodo-token', help='Zenodo API token (overrides ZENODO_TOKEN env var)')
+@click.option('--sync', is_flag=True, help='Upload the crate\'s files individually, skipping files Zenodo already holds (new version if published)')
+@click.option('--deposition-id', help='Existing Zenodo deposition to sync into (with --sync, single notebook only)')
+@click.option('--upload-concurrency', default=4, show_default=True, help='Number of depositions uploaded to Zenodo at the same time')
+@click.option('--zenodo-url', help='Zenodo API root, e.g. a local test server (overrides ZENODO_API_URL env var)')
 @click.option('--sandbox', is_flag=True, help='Use Zenodo sandbox for testing')
-def main(notebook_path, fail_on_style, author, use_conda, remove_conda_env, generate_rocrate, upload, validate, zenodo_token, sandbox):
+@click.option('--force', is_flag=True, help='Ignore the build cache and rerun every stage')
+@click.option('--jobs', '-j', default=1, show_default=True, help='Number of notebooks to process in parallel (0 = one per CPU core)')
+@click.option('--exclude', multiple=True, help='Glob of notebooks or folders to skip, matched against names and relative paths (repeatable)')
+@click.option('--no-gitignore', is_flag=True, help='Also process notebooks that .gitignore files exclude')
+@click.option('--trace', 'trace_path', type=click.Path(dir_okay=False), help='Record stage, subprocess and HTTP spans to FILE (Chrome trace JSON) and to FILE with a .csv suffix instead of its own (trace.json -> trace.csv)')
+def main(notebook_path, fail_on_style, author, use_conda, conda_pool_size, conda_pool_disk, remove_conda_env, engine, cell_timeout, notebook_timeout, kernel_reset, profile, profile_top, embed_timings, incremental, full, generate_rocrate, externalize_outputs, externalize_min_size, upload, validate, zenodo_token, sync, deposition_id, upload_concurrency, zenodo_url, sandbox, force, jobs, exclude, no_gitignore, trace_path):
+    """Check a notebook, or every notebook under a folder, once."""
     # Collect all notebooks
     notebook_path = Path(notebook_path) # Convert to Path object
-    notebooks = []
+    notebooks = iter(())
     if notebook_path.is_file() and notebook_path.suffix == ".ipynb":
-        notebooks = [notebook_path]
+        notebooks = iter([notebook_path])
     elif notebook_path.is_dir():
-        notebooks = list(notebook_path.rglob("*.ipynb"))
-    
+        # Streamed: the pipeline starts on the first notebooks while the scan goes on
+        notebooks = iter_notebooks(notebook_path, exclude=exclude, use_gitignore=not no_gitignore)
+
+    # Only the first two are needed to pick the output root and validate options
+    first = list(islice(notebooks, 2))
     # Determine output root directory
     # If notebook is in subdirectory, use parent as output root
-    if notebooks:
-        first_notebook = notebooks[0]
-        # Check if notebook is in a subdirectory (like test_pipeline/)
-        if first_notebook.parent.name != first_notebook.parent.parent.name:
-            output_root = first_notebook.parent.parent
-        else:
-            output_root = first_notebook.parent
-        
-        # Create organized output structure
-        generated_dir = output_root / "generated"
-        dependencies_dir = generated_dir / "dependencies"
-        style_reports_dir = generated_dir / "style_reports"
-        conda_execution_dir = generated_dir / "conda_execution"
-        ro_crates_dir = generated_dir / "ro_crates"
-        zenodo_dir = generated_dir / "zenodo"
-        
-        # Create directories
-        for dir_path in [dependencies_dir, style_reports_dir, conda_execution_dir, ro_crates_dir, zenodo_dir]:
-            dir_path.mkdir(parents=True, exist_ok=True)
-
-    for nb in notebooks:
-        nb = Path(nb).resolve()  # Convert to absolute path
-        relative_name = nb.relative_to(Path.cwd())
-        print(f"\n[bold cyan]🔍 Processing:[/] {relative_name}")
-        # Style check
-        print("[bold]🎨 Checking code style with flakenb...[/]")
-        style_issues = run_flakenb(str(nb))
-        if style_issues:
-            print(f"[yellow]⚠️ {len(style_issues)} style issue(s) found in {nb.name}:[/]")
-            for line in style_issues:
-                print("  ", line)
-            
-            if fail_on_style:
-                print("[red]❌ Aborting due to style issues (use --fail-on-style to disable this check).[/]")
-                return  # or sys.exit(1)
-            else:
-                print("[green]✅ No PEP8 style issues detected[/]")
-            
-        # Extract imports from the notebook
-        notebook_imports = extract_imports_from_notebook(str(nb))
-            
-        # Handle requirements.txt - generate in organized location
-        req_path = dependencies_dir / "requirements.txt"
-        notebook_req_path = nb.parent / "requirements.txt"  # Check if exists in notebook dir
-        
-        if notebook_req_path.exists():
-            all_present, missing = check_existing_dependency_file(notebook_req_path, notebook_imports)
-            if all_present:
-                print("[green]✅ All notebook imports are already in requirements.txt[/]")
-                # Copy to organized location
-                import shutil
-                shutil.copy2(notebook_req_path, req_path)
-            else:
-                print(f"[yellow]⚠️ requirements.txt exists but is missing: {missing}[/]")
-        else:
-            if generate_requirements(str(nb), dependencies_dir, overwrite=True):
-                print(f"[green]✅ requirements.txt generated at: {req_path}[/]")
+    if not first:
+        print("[red]❌ No notebooks found[/]")
+        return
+    if deposition_id and len(first) > 1:
+        print("[red]❌ --deposition-id can only be used with a single notebook[/]")
+        return
+    output_root = determine_output_root(first)
 
-        # Handle environment.yml - generate in organized location
-        env_path = dependencies_dir / "environment.yml"
-        notebook_env_path = nb.parent / "environment.yml"  # Check if exists in notebook dir
-        
-        if notebook_env_path.exists():
-            all_present, missing = check_existing_dependency_file(notebook_env_path, notebook_imports)
-            if all_present:
-                print("[green]✅ All notebook imports are already in environment.yml[/]")
-                # Copy to organized location
-                import shutil
-                shutil.copy2(notebook_env_path, env_path)
-            else:
-                print(f"[yellow]⚠️ environment.yml exists but is missing: {missing}[/]")
-        else:
-            if generate_environment_yml(str(nb), dependencies_dir, overwrite=True):
-                print(f"[green]✅ environment.yml generated at: {env_path}[/]")
-        
-        # Handle running in a conda environment.
-        if use_conda:
-            print("[bold]📦 Running in Conda environment...[/]")
-            # Use environment.yml from organized location
-            env_yml_path = dependencies_dir / "environment.yml"
-            env_name = "repronotebook-run" 
-            if env_yml_path.exists():
-                if create_conda_env(env_yml_path, env_name):
-                    # Log execution to organized location
-                    execution_log = conda_execution_dir / "execution_log.txt"
-                    with open(execution_log, 'w') as f:
-                        f.write(f"Executed notebook: {nb.name}\n")
-                        f.write(f"Environment: {env_name}\n")
-                    run_notebook_in_env(nb, env_name)
-            else:
-                print("[red]❌ environment.yml not found. Cannot execute in Conda environment.[/]")
-        if use_conda and remove_conda_env:
-            remove_conda_env("repronotebook-run")
-        
-        # Generate RO-Crate if requested
-        crate_folder = None
-        if generate_rocrate:
-            print("[bold]📦 Generating RO-Crate...[/]")
-            
-            # Generate RO-Crate in organized location
-            crate_name = f"{nb.stem}-ro-crate"
-            crate_folder = ro_crates_dir / crate_name
-            
-            # Create temporary directory structure for RO-Crate generation
-            temp_nb_dir = ro_crates_dir / "temp_notebook_dir"
-            temp_nb_dir.mkdir(exist_ok=True)
-            
-            # Copy notebook and dependencies to temp location
-            import shutil
-            shutil.copy2(nb, temp_nb_dir / nb.name)
-            if (dependencies_dir / "requirements.txt").exists():
-                shutil.copy2(dependencies_dir / "requirements.txt", temp_nb_dir / "requirements.txt")
-            if (dependencies_dir / "environment.yml").exists():
-                shutil.copy2(dependencies_dir / "environment.yml", temp_nb_dir / "environment.yml")
-            
-            # Generate RO-Crate
-            generate_ro_crate_with_library(str(temp_nb_dir), author)
-            
-            # Move generated RO-Crate to final location
-            generated_crate = temp_nb_dir.with_name(f"{temp_nb_dir.name}-library-ro-crate_v2")
-            if generated_crate.exists():
-                if crate_folder.exists():
-                    shutil.rmtree(crate_folder)
-                shutil.move(str(generated_crate), str(crate_folder))
-            
-            # Cleanup temp directory
-            if temp_nb_dir.exists():
-                shutil.rmtree(temp_nb_dir)
-            
-            print(f"[green]✅ RO-Crate generated at: {crate_folder}[/]")
-        
-        # Upload to Zenodo if requested
-        if upload and crate_folder and crate_folder.exists():
-            print("[bold]☁️ Uploading RO-Crate to Zenodo...[/]")
-            try:
-                # Create ZIP archive in organized location
-                zip_filename = f"{nb.stem}-ro-crate.zip"
-                zip_path = ro_crates_dir / zip_filename
-                zip_path = zip_ro_crate(crate_folder, output_path=zip_path)
-                
-                # Generate Zenodo metadata in organized location (unique per notebook)
-                title = f"RO-Crate for {nb.stem}"
-                description = f"Reproducible research package containing Jupyter notebook '{nb.name}' with dependencies and environment specifications."
-                zenodo_metadata_path = zenodo_dir / f"zenodo_metadata_{nb.stem}.json"
-                zenodo_metadata_path = generate_zenodo_metadata(crate_folder, title, description, author, output_path=zenodo_metadata_path)
-                
-                # Read metadata for upload
-                with open(zenodo_metadata_path, 'r') as f:
-                    zenodo_metadata = json.load(f)
-                
-                # Upload to Zenodo
-                result = upload_ro_crate_to_zenodo(
-                    crate_zip_path=zip_path,
-                    zenodo_metadata=zenodo_metadata,
-                    access_token=zenodo_token,  # Pass CLI token
-                    sandbox=sandbox,  # Use CLI flag
-                    publish=False   # Manual review before publishing
-                )
-                
-                # Save upload results (unique per notebook)
-                upload_results_path = zenodo_dir / f"upload_results_{nb.stem}.json"
-                with open(upload_results_path, 'w') as f:
-                    json.dump(result, f, indent=2)
-                
-                print(f"[green]✅ Upload complete! Deposition ID: {result['deposition_id']}[/]")
-                print(f"[green]✅ Results saved to: {upload_results_path}[/]")
-                
-            except Exception as e:
-                print(f"[red]❌ Zenodo upload failed: {str(e)}[/]")
-                print("[yellow]💡 Make sure ZENODO_TOKEN environment variable is set[/]")
-        elif upload and not generate_rocrate:
-            print("[red]❌ Cannot upload without RO-Crate. Use --generate-rocrate flag[/]")
-        elif upload and not (crate_folder and crate_folder.exists()):
-            print("[red]❌ RO-Crate folder not found for upload[/]")
+    # Create organized output structure
+    prepare_output_dirs(output_root)
 
+    # Before anything runs, so worker processes inherit it
+    if trace_path:
+        enable_tracing(Path(trace_path))
+    try:
+        # Probe kernels, Conda envs and tools once; workers reuse the persisted result
+        get_preflight()
 
+        started = time.perf_counter()
+        results = run_pipeline(
+            chain(first, notebooks),
+            output_root,
+            jobs=jobs,
+            author=author,
+            fail_on_style=fail_on_style,
+            use_conda=use_conda,
+            conda_pool_size=0 if remove_conda_env else conda_pool_size,
+            conda_pool_disk_gb=conda_pool_disk,
+            engine=engine,
+            cell_timeout=cell_timeout,
+            notebook_timeout=notebook_timeout,
+            kernel_reset=kernel_reset,
+            profile=profile,
+            embed_timings=embed_timings,
+            incremental=incremental,
+            full=full,
+            generate_rocrate=generate_rocrate,
+            externalize_outputs=externalize_outputs,
+            externalize_min_size=externalize_min_size * 1024,
+            upload=upload,
+            zenodo_token=zenodo_token,
+            zenodo_url=zenodo_url,
+            sync=sync,
+            deposition_id=deposition_id,
+            upload_concurrency=upload_concurrency,
+            sandbox=sandbox,
+            force=force,
+        )
+        if len(results) > 1 or jobs != 1:
+            print_summary(results, time.perf_counter() - started, jobs=jobs)
+        print_cache_report(results)
+        if profile:
+            print_hot_cells([r["profile_path"] for r in results if r.get("profile_path")], top=profile_top)
+    finally:
+        if trace_path:
+            traced = finish_tracing(Path(trace_path))
+            if traced:
+                print(f"[bold]🧭 Trace written to {traced[0]} (chrome://tracing, Perfetto) and {traced[1]}[/]")
 
 
     # DONE: Generate requirements.txt and environment.yml
@@ -0,0 +1,213 @@
+# repronotebook/checks_pipeline/conda_env/env_pool.py
+
+import hashlib
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+import yaml
+from rich import print
+from repronotebook.checks_pipeline.build_cache import USER_CACHE_DIR
+from repronotebook.checks_pipeline.conda_env.execute_conda import create_conda_env, env_prefix, remove_conda_env
+from repronotebook.checks_pipeline.dependency_check.distribution_index import canonical_name
+from repronotebook.checks_pipeline.execution.kernel_pool import shutdown_env_kernels
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to unlocked registry updates
+    fcntl = None
+
+ENV_NAME_PREFIX = "repronotebook-"
+
+
+def env_spec_hash(env_yml_path: Path) -> str:
+    """
+    Hash the normalized contents of an environment.yml.
+
+    The env name and prefix are ignored and dependency order does not
+    matter, so notebooks with the same dependencies get the same hash.
+    Channel order is kept because it changes how Conda resolves packages.
+    """
+    with open(env_yml_path, "r") as f:
+        spec = yaml.safe_load(f) or {}
+
+    conda_deps, pip_deps = [], []
+    for dep in spec.get("dependencies", []) or []:
+        if isinstance(dep, dict):
+            pip_deps.extend(str(d).strip() for d in dep.get("pip", []))
+        else:
+            conda_deps.append(str(dep).strip())
+
+    normalized = {
+        "channels": [str(c).strip() for c in spec.get("channels", []) or []],
+        "dependencies": sorted(conda_deps, key=canonical_name),
+        "pip": sorted(pip_deps, key=canonical_name),
+    }
+    return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def env_name_for_spec(env_yml_path: Path) -> str:
+    return f"{ENV_NAME_PREFIX}{env_spec_hash(env_yml_path)}"
+
+
+def _directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                stat = os.lstat(os.path.join(root, name))
+            except OSError:
+                continue
+            total += stat.st_size
+    return total
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _env_present(entry: dict) -> bool:
+    """Whether a registry entry still stands for an env on disk (or one being created)."""
+    if entry.get("prefix") is None:
+        # Still being created, unless the process that leased it is gone
+        return any(_pid_alive(pid) for pid in entry["leases"])
+    return Path(entry["prefix"]).is_dir()
+
+
+class CondaEnvPool:
+    """
+    Pool of Conda environments named after the hash of their spec.
+
+    Notebooks with identical dependencies share one environment, a changed
+    environment.yml gets a fresh one, and the pool is capped by number of
+    environments and/or total disk size. When a cap is exceeded the least
+    recently used environments that are not currently in use are removed.
+    The registry lives in the user cache directory because Conda envs are
+    shared by every project on the machine.
+    """
+
+    def __init__(self, max_envs: Optional[int] = None, max_disk_gb: Optional[float] = None, registry_path: Path = None):
+        self.max_envs = max_envs
+        self.max_disk_bytes = int(max_disk_gb * 1024 ** 3) if max_disk_gb is not None else None
+        self.registry_path = Path(registry_path) if registry_path else USER_CACHE_DIR / "conda_env_pool.json"
+        self.registry_path.parent.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def _locked(self, lock_name: str = "registry"):
+        lock_path = self.registry_path.with_name(f"{self.registry_path.stem}.{lock_name}.lock")
+        with open(lock_path, "w") as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _load(self) -> dict:
+        if not self.registry_path.exists():
+            return {}
+        try:
+            with open(self.registry_path, "r") as f:
+                registry = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        # Envs removed outside the pool would otherwise keep it over its caps
+        return {name: e for name, e in registry.items() if _env_present(e)}
+
+    def _save(self, registry: dict):
+        tmp_path = self.registry_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(registry, f, indent=2)
+        os.replace(tmp_path, self.registry_path)
+
+    def _lease(self, env_name: str, env_yml_path: Path, prefix: Optional[Path] = None):
+        """Record this process as a user of env_name, and its prefix once it exists."""
+        with self._locked():
+            registry = self._load()
+            entry = registry.setdefault(env_name, {
+                "spec": str(env_yml_path),
+                "prefix": None,
+                "size": 0,
+                "created": time.time(),
+                "leases": [],
+            })
+            if prefix is not None and entry["prefix"] != str(prefix):
+                entry["prefix"] = str(prefix)
+                entry["size"] = _directory_size(prefix)
+            entry["last_used"] = time.time()
+            entry["leases"] = [pid for pid in entry["leases"] if _pid_alive(pid) and pid != os.getpid()] + [os.getpid()]
+            self._save(registry)
+
+    def acquire(self, env_yml_path: Path) -> Optional[str]:
+        """
+        Return the name of a ready environment for this spec, creating it once.
+
+        The environment is leased to this process before it is created or
+        reused, and until release() is called, so evict() can never remove
+        it while a worker is about to run or running a notebook in it.
+        """
+        env_name = env_name_for_spec(env_yml_path)
+        self._lease(env_name, env_yml_path)
+
+        # Per-env lock: concurrent workers with the same spec wait for one solve
+        with self._locked(env_name):
+            created = create_conda_env(env_yml_path, env_name)
+        if not created:
+            self.release(env_name)
+            return None
+
+        self._lease(env_name, env_yml_path, prefix=env_prefix(env_name))
+        self.evict()
+        return env_name
+
+    def release(self, env_name: str):
+        """Drop this process's lease and enforce the pool caps."""
+        with self._locked():
+            registry = self._load()
+            entry = registry.get(env_name)
+            if entry is not None:
+                entry["leases"] = [pid for pid in entry["leases"] if pid != os.getpid()]
+                entry["last_used"] = time.time()
+                if entry["prefix"] is None and not entry["leases"]:
+                    del registry[env_name]  # creation failed; nothing on disk to track
+                self._save(registry)
+        self.evict()
+
+    def _over_limit(self, registry: dict) -> bool:
+        if self.max_envs is not None and len(registry) > self.max_envs:
+            return True
+        if self.max_disk_bytes is not None and sum(e["size"] for e in registry.values()) > self.max_disk_bytes:
+            return True
+        return False
+
+    def evict(self) -> list[str]:
+        """Remove least recently used idle environments until the pool fits its caps."""
+        evicted = []
+        with self._locked():
+            registry = self._load()
+            idle = sorted(
+                (name for name, e in registry.items() if not any(_pid_alive(pid) for pid in e["leases"])),
+                key=lambda name: registry[name]["last_used"],
+            )
+            while idle and self._over_limit(registry):
+                env_name = idle.pop(0)
+                print(f"[blue]ℹ️ Evicting least recently used Conda environment: {env_name}[/]")
+                if registry[env_name]["prefix"]:
+                    # This process's idle kernels must not outlive the env they run from
+                    shutdown_env_kernels(registry[env_name]["prefix"])
+                if remove_conda_env(env_name):
+                    del registry[env_name]
+                    evicted.append(env_name)
+                elif not _env_present(registry[env_name]):
+                    del registry[env_name]  # already gone; nothing left to remove
+            self._save(registry)
+        return evicted
@@ -1,13 +1,20 @@
 # repronotebook/checks_pipeline/conda_env/execute_conda.py
 
-import subprocess
+import json
 from pathlib import Path
+from typing import Optional
 from rich import print
+from repronotebook.checks_pipeline.preflight import conda_envs
+from repronotebook.checks_pipeline import tracing
 
-def env_exists(env_name: str) -> bool:
-    """Check if the Conda environment already exists."""
+def env_exists(env_name: str, refresh: bool = False) -> bool:
+    """Check if the Conda environment already exists (refresh=True skips the cached env list)."""
+    envs = conda_envs(refresh=refresh)
+    if envs is not None:
+        return env_name in envs
+    # Conda could not be located in-process; ask conda itself
     try:
-        result = subprocess.run(
+        result = tracing.run(
             ["conda", "env", "list"],
             capture_output=True,
             text=True,
@@ -19,20 +26,46 @@ def env_exists(env_name: str) -> bool:
         return False
 
 
+def env_prefix(env_name: str) -> Optional[Path]:
+    """Return the install prefix of a named Conda environment."""
+    envs = conda_envs()
+    if envs is not None:
+        return Path(envs[env_name]) if env_name in envs else None
+    try:
+        result = tracing.run(
+            ["conda", "env", "list", "--json"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        for prefix in json.loads(result.stdout).get("envs", []):
+            if Path(prefix).name == env_name:
+                return Path(prefix)
+    except Exception as e:
+        print(f"[red]❌ Failed to look up Conda environment prefix:[/] {e}")
+    return None
+
+
 def create_conda_env(env_yml_path: Path, env_name: str) -> bool:
-    """Create a Conda environment from an environment.yml file."""
-    if env_exists(env_name):
+    """
+    Create a Conda environment from an environment.yml file.
+
+    Callers hold the env's lock, so the env list is read fresh: another
+    worker may have created the env since this process probed it.
+    """
+    if env_exists(env_name, refresh=True):
         print(f"[blue]ℹ️ Conda environment '{env_name}' already exists. Reusing it.[/]")
         return True
 
     try:
-        result = subprocess.run(
+        result = tracing.run(
             ["conda", "env", "create", "-f", str(env_yml_path), "-n", env_name],
             capture_output=True,
             text=True
         )
         if result.returncode == 0:
             print(f"[green]✅ Created Conda environment: {env_name}[/]")
+            conda_envs(refresh=True)
             return True
         else:
             print(f"[red]❌ Failed to create Conda environment:[/]")
@@ -43,14 +76,25 @@ def create_conda_env(env_yml_path: Path, env_name: str) -> bool:
         return False
 
 
-def run_notebook_in_env(notebook_path: Path, env_name: str) -> bool:
-    """Execute a notebook inside a Conda environment."""
+def run_notebook_in_env(notebook_path: Path, env_name: str, output_path: Path = None) -> bool:
+    """
+    Execute a notebook inside a Conda environment with nbconvert.
+
+    The executed notebook is written to output_path, or over the source
+    notebook when no output_path is given.
+    """
+    if output_path is None:
+        output_args = ["--inplace"]
+    else:
+        output_path = Path(output_path)
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        output_args = ["--output-dir", str(output_path.parent), "--output", output_path.name]
     try:
-        result = subprocess.run(
+        result = tracing.run(
             [
                 "conda", "run", "-n", env_name,
                 "jupyter", "nbconvert", "--to", "notebook",
-                "--execute", "--inplace", str(notebook_path)
+                "--execute", *output_args, str(notebook_path)
             ],
             capture_output=True,
             text=True
@@ -69,13 +113,14 @@ def run_notebook_in_env(notebook_path: Path, env_name: str) -> bool:
 def remove_conda_env(env_name: str) -> bool:
     """Remove the specified Conda environment."""
     try:
-        result = subprocess.run(
+        result = tracing.run(
             ["conda", "env", "remove", "-n", env_name, "--yes"],
             capture_output=True,
             text=True
         )
         if result.returncode == 0:
             print(f"[green]🧹 Removed Conda environment: {env_name}[/]")
+            conda_envs(refresh=True)
             return True
         else:
             print(f"[red]❌ Failed to remove Conda environment: {env_name}[/]")
@@ -1,32 +1,119 @@
 from pathlib import Path
-import nbformat
+import ast
 import re
 import yaml
+from repronotebook.checks_pipeline.notebook_document import NotebookDocument, as_document, strip_magics
+from repronotebook.checks_pipeline.dependency_check.distribution_index import (
+    canonical_name,
+    conda_package,
+    is_stdlib_module,
+    load_distribution_index,
+    resolve_distribution
+)
 
-def extract_imports_from_notebook(notebook_path: str) -> list[str]:
-    """Extract a list of unique top-level imported packages from the notebook."""
-    with open(notebook_path, "r", encoding="utf-8") as f:
-        nb = nbformat.read(f, as_version=4)
+def _imports_from_lines(source: str) -> set[str]:
+    """Line-based fallback for cells that are not valid Python."""
+    imports = set()
+    for line in source.split("\n"):
+        line = line.strip()
+        if line.startswith("import ") or line.startswith("from "):
+            line = line.split("#")[0]  # remove inline comments
+            line = line.replace(",", " ")  # handle comma-separated imports
+            words = line.split()
+            if words[0] == "from" and len(words) > 1:
+                if not words[1].startswith("."):
+                    imports.add(words[1].split(".")[0])
+            elif len(words) > 1:
+                imports.add(words[1].split(".")[0])
+    return imports
+
+
+def extract_imports_from_source(source: str) -> set[str]:
+    """Return the top-level module names imported by a code cell."""
+    code = strip_magics(source)
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return _imports_from_lines(code)
+
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                imports.add(alias.name.split(".")[0])
+        elif isinstance(node, ast.ImportFrom):
+            # Relative imports (`from . import x`) are always local
+            if node.level == 0 and node.module:
+                imports.add(node.module.split(".")[0])
+    return imports
+
+
+def _is_local_module(name: str, notebook_dir: Path) -> bool:
+    return (notebook_dir / f"{name}.py").exists() or (notebook_dir / name / "__init__.py").exists()
 
+
+def notebook_imports(notebook: NotebookDocument) -> set[str]:
+    """Top-level module names imported by any code cell of the notebook."""
+    doc = as_document(notebook)
     imports = set()
-    for cell in nb.cells:
-        if cell.cell_type != "code":
-            continue
-        for line in cell.source.split("\n"):
-            line = line.strip()
-            if line.startswith("import ") or line.startswith("from "):
-                line = line.split("#")[0]  # remove inline comments
-                line = line.replace(",", " ")  # handle comma-separated imports
-                words = line.split()
-                if "import" in words:
-                    try:
-                        idx = words.index("import")
-                        base = words[idx + 1]
-                        base = base.split(".")[0]
-                        imports.add(base)
-                    except IndexError:
-                        continue  # skip malformed lines
-    return sorted(imports)
+    for _, source in doc.code_cells():
+        imports |= extract_imports_from_source(source)
+    return imports
+
+
+def extract_imports_from_notebook(notebook: NotebookDocument) -> list[str]:
+    """Extract the unique third-party top-level modules imported by the notebook."""
+    doc = as_document(notebook)
+    notebook_dir = doc.path.parent
+    return sorted(
+        name for name in notebook_imports(doc)
+        if not is_stdlib_module(name) and not _is_local_module(name, notebook_dir)
+    )
+
+
+def module_search_dirs(notebook_path: Path, project_root: Path) -> list[Path]:
+    """
+    Folders a notebook's helper modules are looked up in, nearest first.
+
+    The notebook's folder and each folder above it up to project_root, each
+    followed by its src/ folder: the layouts notebooks usually put on
+    sys.path (e.g. notebooks/ importing ../src/helpers.py).
+    """
+    notebook_dir, project_root = Path(notebook_path).parent, Path(project_root)
+    folders = [notebook_dir]
+    if project_root in notebook_dir.parents:
+        folders += [parent for parent in notebook_dir.parents if parent == project_root or project_root in parent.parents]
+    search = []
+    for folder in folders:
+        search += [folder, folder / "src"]
+    return search
+
+
+def local_modules(notebook: NotebookDocument, search_dirs: list[Path] = ()) -> list[Path]:
+    """
+    Project modules and packages the notebook imports (<name>.py or <name>/).
+
+    Each import is looked up next to the notebook, then in search_dirs in
+    order (see module_search_dirs); the first match wins, as on sys.path.
+    """
+    doc = as_document(notebook)
+    folders = [doc.path.parent, *search_dirs]
+    modules = []
+    for name in sorted(notebook_imports(doc)):
+        for folder in folders:
+            if (folder / f"{name}.py").exists():
+                modules.append(folder / f"{name}.py")
+                break
+            if (folder / name / "__init__.py").exists():
+                modules.append(folder / name)
+                break
+    return modules
+
+
+def extract_dependencies_from_notebook(notebook: NotebookDocument) -> list[str]:
+    """Map the notebook's imports to the distributions that provide them."""
+    index = load_distribution_index()
+    return sorted({resolve_distribution(name, index) for name in extract_imports_from_notebook(notebook)})
 
 def extract_package_name(line: str, keep_version: bool = False) -> str:
     """Extract base package name from a line with optional version."""
@@ -73,35 +160,52 @@ def read_dependencies(file_path: Path, keep_version: bool = False) -> list[str]:
 
 def check_existing_dependency_file(file_path: Path, notebook_imports: list[str]) -> tuple[bool, list[str]]:
     """Check if all notebook imports are already in the dependency file."""
-    existing_deps = read_dependencies(file_path)
-    missing = [imp for imp in notebook_imports if imp not in existing_deps]
+    existing_deps = {canonical_name(dep) for dep in read_dependencies(file_path)}
+    index = load_distribution_index()
+    # An import counts as present if its module, distribution or Conda package name is listed
+    missing = []
+    for imp in notebook_imports:
+        distribution = resolve_distribution(imp, index)
+        names = {imp, distribution, conda_package(distribution) or distribution}
+        if not existing_deps & {canonical_name(name) for name in names}:
+            missing.append(imp)
     all_present = len(missing) == 0
     return all_present, missing
 
-def generate_requirements(notebook_path: str, output_dir: Path, overwrite: bool = True) -> bool:
+def generate_requirements(notebook: NotebookDocument, output_dir: Path, overwrite: bool = True) -> bool:
     """Generate a requirements.txt based on notebook imports."""
     try:
-        imports = extract_imports_from_notebook(notebook_path)
+        packages = extract_dependencies_from_notebook(notebook)
         filename = "requirements.txt" if overwrite else "auto-requirements.txt"
         req_path = output_dir / filename
         with open(req_path, "w") as f:
-            for package in imports:
+            for package in packages:
                 f.write(package + "\n")
         return True
     except Exception as e:
         print(f"[red]❌ Error generating requirements.txt:[/] {e}")
         return False
 
-def generate_environment_yml(notebook_path: str, output_dir: Path, overwrite: bool = False) -> bool:
-    """Generate a basic environment.yml from notebook imports."""
+def generate_environment_yml(notebook: NotebookDocument, output_dir: Path, overwrite: bool = False) -> bool:
+    """
+    Generate a basic environment.yml from notebook imports.
+
+    Distributions with a known Conda package are installed with Conda, the
+    others from PyPI through a pip: subsection.
+    """
     try:
-        imports = extract_imports_from_notebook(notebook_path)
+        packages = extract_dependencies_from_notebook(notebook)
         filename = "environment.yml" if overwrite else "auto-environment.yml"
         env_path = output_dir / filename
+        conda_deps = sorted({conda_package(package) for package in packages if conda_package(package)})
+        pip_deps = [package for package in packages if not conda_package(package)]
+        if pip_deps:
+            conda_deps.append("pip")
         env_dict = {
             "name": "repronotebook-env",
             "channels": ["defaults"],
-            "dependencies": sorted(imports),
+            "dependencies": conda_deps,
+            "pip": pip_deps,
         }
         with open(env_path, "w") as f:
             f.write(f"name: {env_dict['name']}\n")
@@ -111,6 +215,10 @@ def generate_environment_yml(notebook_path: str, output_dir: Path, overwrite: bo
             f.write("dependencies:\n")
             for dep in env_dict["dependencies"]:
                 f.write(f"  - {dep}\n")
+            if env_dict["pip"]:
+                f.write("  - pip:\n")
+                for dep in env_dict["pip"]:
+                    f.write(f"    - {dep}\n")
         return True
     except Exception as e:
         print(f"[red]❌ Error generating environment.yml:[/] {e}")
@@ -0,0 +1,162 @@
+# repronotebook/checks_pipeline/dependency_check/distribution_index.py
+
+import hashlib
+import json
+import os
+import re
+import sys
+from functools import lru_cache
+from importlib.metadata import packages_distributions
+from pathlib import Path
+from typing import Optional
+from repronotebook.checks_pipeline.build_cache import USER_CACHE_DIR
+
+# Import names whose distribution differs, for packages that are not installed
+# in the interpreter running the pipeline.
+KNOWN_DISTRIBUTIONS = {
+    "sklearn": "scikit-learn",
+    "skimage": "scikit-image",
+    "cv2": "opencv-python",
+    "PIL": "Pillow",
+    "yaml": "PyYAML",
+    "bs4": "beautifulsoup4",
+    "dateutil": "python-dateutil",
+    "dotenv": "python-dotenv",
+    "Bio": "biopython",
+    "jwt": "PyJWT",
+    "serial": "pyserial",
+    "attr": "attrs",
+    "OpenSSL": "pyOpenSSL",
+    "Crypto": "pycryptodome",
+    "docx": "python-docx",
+    "pptx": "python-pptx",
+    "magic": "python-magic",
+    "zmq": "pyzmq",
+    "git": "GitPython",
+    "fitz": "PyMuPDF",
+    "win32api": "pywin32",
+    "tensorflow_hub": "tensorflow-hub",
+}
+
+# Distributions (by canonical name) that the defaults Conda channel packages,
+# and the Conda package to install instead. Everything else goes to pip.
+CONDA_PACKAGES = {
+    "attrs": "attrs",
+    "beautifulsoup4": "beautifulsoup4",
+    "biopython": "biopython",
+    "bokeh": "bokeh",
+    "click": "click",
+    "dask": "dask",
+    "gitpython": "gitpython",
+    "h5py": "h5py",
+    "ipykernel": "ipykernel",
+    "jinja2": "jinja2",
+    "lxml": "lxml",
+    "matplotlib": "matplotlib",
+    "networkx": "networkx",
+    "nltk": "nltk",
+    "numba": "numba",
+    "numpy": "numpy",
+    "opencv-python": "opencv",
+    "pandas": "pandas",
+    "pillow": "pillow",
+    "plotly": "plotly",
+    "pycryptodome": "pycryptodome",
+    "pyjwt": "pyjwt",
+    "pyopenssl": "pyopenssl",
+    "pyserial": "pyserial",
+    "python-dateutil": "python-dateutil",
+    "pyyaml": "pyyaml",
+    "pyzmq": "pyzmq",
+    "requests": "requests",
+    "rich": "rich",
+    "scikit-image": "scikit-image",
+    "scikit-learn": "scikit-learn",
+    "scipy": "scipy",
+    "seaborn": "seaborn",
+    "statsmodels": "statsmodels",
+    "sympy": "sympy",
+    "tensorflow": "tensorflow",
+    "torch": "pytorch",
+    "tqdm": "tqdm",
+    "xarray": "xarray",
+}
+
+
+def is_stdlib_module(name: str) -> bool:
+    """Check whether a top-level module name belongs to the standard library."""
+    return name in sys.stdlib_module_names or name in sys.builtin_module_names or name == "__future__"
+
+
+def canonical_name(name: str) -> str:
+    """Normalize a distribution name as described in PEP 503."""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _environment_fingerprint() -> str:
+    """Hash the interpreter and its import paths so installs invalidate the cache."""
+    digest = hashlib.sha256()
+    digest.update(sys.prefix.encode())
+    digest.update(sys.version.encode())
+    for entry in sys.path:
+        try:
+            mtime = os.stat(entry or ".").st_mtime_ns
+        except OSError:
+            continue
+        digest.update(f"{entry}:{mtime}".encode())
+    return digest.hexdigest()[:16]
+
+
+def build_distribution_index() -> dict[str, str]:
+    """Map every importable top-level name to the distribution that provides it."""
+    index = {}
+    for import_name, distributions in packages_distributions().items():
+        if not import_name.isidentifier() or is_stdlib_module(import_name):
+            continue
+        # Prefer the distribution named like the module (e.g. `numpy` -> numpy)
+        preferred = [d for d in distributions if canonical_name(d) == canonical_name(import_name)]
+        index[import_name] = (preferred or sorted(distributions))[0]
+    return index
+
+
+@lru_cache(maxsize=1)
+def load_distribution_index(cache_dir: Path = None) -> dict[str, str]:
+    """
+    Load the import-to-distribution index, building it only when needed.
+
+    The index is cached on disk per interpreter and rebuilt whenever a
+    package is installed or removed.
+    """
+    cache_dir = Path(cache_dir) if cache_dir else USER_CACHE_DIR
+    cache_path = cache_dir / f"distribution_index-{_environment_fingerprint()}.json"
+    if cache_path.exists():
+        try:
+            with open(cache_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+
+    index = build_distribution_index()
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        pass  # The cache is an optimization only
+    return index
+
+
+def resolve_distribution(import_name: str, index: dict[str, str] = None) -> str:
+    """Return the distribution name to install for a top-level import."""
+    if index is None:
+        index = load_distribution_index()
+    if import_name in index:
+        return index[import_name]
+    return KNOWN_DISTRIBUTIONS.get(import_name, import_name)
+
+
+def conda_package(distribution: str) -> Optional[str]:
+    """Return the Conda package providing a distribution, or None if it has to be installed with pip."""
+    return CONDA_PACKAGES.get(canonical_name(distribution))
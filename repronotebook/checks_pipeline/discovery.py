@@ -0,0 +1,209 @@
+# repronotebook/checks_pipeline/discovery.py
+
+import fnmatch
+import os
+import re
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+# Never hold notebooks worth validating: VCS data, Jupyter autosaves, caches, dependencies
+DEFAULT_EXCLUDES = (
+    ".git", ".hg", ".svn",
+    ".ipynb_checkpoints",
+    "__pycache__", ".mypy_cache", ".pytest_cache", ".tox", ".nox",
+    "node_modules", "site-packages",
+)
+
+# Folders made by prepare_output_dirs(); their executed copies are not sources
+_GENERATED_MARKERS = ("style_reports", "ro_crates")
+
+
+class _IgnoreRule:
+    """One .gitignore pattern, compiled relative to the folder of its .gitignore."""
+
+    __slots__ = ("base", "regex", "negate", "dir_only")
+
+    def __init__(self, base: str, pattern: str):
+        self.base = base
+        self.negate = pattern.startswith("!")
+        if self.negate:
+            pattern = pattern[1:]
+        self.dir_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        # A slash anywhere but at the end anchors the pattern to its .gitignore's folder
+        anchored = "/" in pattern
+        self.regex = re.compile(("" if anchored else "(?:.*/)?") + _glob_to_regex(pattern.lstrip("/")) + r"\Z")
+
+    def matches(self, rel_path: str, is_dir: bool) -> bool:
+        if self.dir_only and not is_dir:
+            return False
+        if self.base:
+            if not rel_path.startswith(self.base + "/"):
+                return False
+            rel_path = rel_path[len(self.base) + 1:]
+        return self.regex.match(rel_path) is not None
+
+
+def _glob_to_regex(pattern: str) -> str:
+    """gitignore glob -> regex: * and ? stop at /, ** crosses folders."""
+    out, i = [], 0
+    while i < len(pattern):
+        char = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("/**", i) and i + 3 == len(pattern):
+            out.append("/.*")
+            i += 3
+        elif char == "*":
+            out.append(".*" if pattern.startswith("**", i) else "[^/]*")
+            i += 2 if pattern.startswith("**", i) else 1
+        elif char == "?":
+            out.append("[^/]")
+            i += 1
+        elif char == "[":
+            end = pattern.find("]", i + 1)
+            if end == -1:
+                out.append(re.escape(char))
+                i += 1
+            else:
+                body = pattern[i + 1:end]
+                out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+                i = end + 1
+        elif char == "\\" and i + 1 < len(pattern):
+            out.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            out.append(re.escape(char))
+            i += 1
+    return "".join(out)
+
+
+def _read_gitignore(path: str, base: str) -> list[_IgnoreRule]:
+    rules = []
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.rstrip("\n").rstrip("\r")
+                # Trailing spaces are ignored unless escaped
+                if not line.endswith("\\ "):
+                    line = line.rstrip(" ")
+                if not line or line.startswith("#"):
+                    continue
+                rules.append(_IgnoreRule(base, line))
+    except OSError:
+        pass
+    return rules
+
+
+def _ignored(rules: list[_IgnoreRule], rel_path: str, is_dir: bool) -> bool:
+    # The last matching rule wins, so a later `!pattern` re-includes
+    ignored = False
+    for rule in rules:
+        if rule.matches(rel_path, is_dir):
+            ignored = not rule.negate
+    return ignored
+
+
+def _is_environment(path: str) -> bool:
+    """Virtualenvs and Conda envs, whatever they are called."""
+    return os.path.exists(os.path.join(path, "pyvenv.cfg")) or os.path.isdir(os.path.join(path, "conda-meta"))
+
+
+def _is_generated(name: str, path: str) -> bool:
+    return name == "generated" and any(os.path.isdir(os.path.join(path, marker)) for marker in _GENERATED_MARKERS)
+
+
+class NotebookScanner:
+    """
+    Finds the notebooks under root, pruning excluded folders before entering them.
+
+    Pruned: DEFAULT_EXCLUDES, virtualenvs / Conda envs, repronotebook's own
+    generated/ output, paths ignored by .gitignore files (root's and every
+    nested one, when use_gitignore is set) and anything matching an
+    `exclude` glob. Globs are matched against both the name and the
+    root-relative path, so `data` and `projects/*/scratch` both work.
+    Symlinked folders are not followed.
+    """
+
+    def __init__(self, root: Path, exclude: Iterable[str] = (), use_gitignore: bool = True,
+                 default_excludes: Optional[Iterable[str]] = DEFAULT_EXCLUDES):
+        self.root = Path(root)
+        self.exclude = list(exclude)
+        self.use_gitignore = use_gitignore
+        self.excluded_names = set(default_excludes or ())
+
+    def _excluded(self, name: str, rel_path: str) -> bool:
+        return any(fnmatch.fnmatch(name, glob) or fnmatch.fnmatch(rel_path, glob) for glob in self.exclude)
+
+    def _rules(self, folder: str, rel_folder: str, inherited: list) -> list:
+        if not self.use_gitignore:
+            return inherited
+        local = _read_gitignore(os.path.join(folder, ".gitignore"), rel_folder)
+        return inherited + local if local else inherited
+
+    def _prune_folder(self, name: str, path: str, rel_path: str, rules: list) -> bool:
+        return (name in self.excluded_names or self._excluded(name, rel_path)
+                or (rules and _ignored(rules, rel_path, True))
+                or _is_environment(path) or _is_generated(name, path))
+
+    def _skip_notebook(self, name: str, rel_path: str, rules: list) -> bool:
+        return self._excluded(name, rel_path) or bool(rules and _ignored(rules, rel_path, False))
+
+    def walk(self) -> Iterator[tuple[str, Path]]:
+        """
+        Yield ("folder", path) for every folder that is entered and
+        ("notebook", path) for every notebook, depth-first in name order.
+        """
+        # Stack of (folder, root-relative path, .gitignore rules in effect above it)
+        pending = [(str(self.root), "", [])]
+        while pending:
+            folder, rel_folder, rules = pending.pop()
+            rules = self._rules(folder, rel_folder, rules)
+            try:
+                with os.scandir(folder) as it:
+                    entries = sorted(it, key=lambda entry: entry.name)
+            except OSError:
+                continue
+            yield "folder", Path(folder)
+
+            subfolders = []
+            for entry in entries:
+                rel_path = f"{rel_folder}/{entry.name}" if rel_folder else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if not self._prune_folder(entry.name, entry.path, rel_path, rules):
+                        subfolders.append((entry.path, rel_path, rules))
+                elif entry.name.endswith(".ipynb") and entry.is_file():
+                    if not self._skip_notebook(entry.name, rel_path, rules):
+                        yield "notebook", Path(entry.path)
+            # Reversed so the stack pops them in name order
+            pending.extend(reversed(subfolders))
+
+    def iter_notebooks(self) -> Iterator[Path]:
+        return (path for kind, path in self.walk() if kind == "notebook")
+
+    def includes(self, notebook_path: Path) -> bool:
+        """Whether a walk would yield notebook_path, checked without walking the tree."""
+        try:
+            rel_parts = Path(notebook_path).relative_to(self.root).parts
+        except ValueError:
+            return False
+        folder, rules = str(self.root), []
+        for depth, name in enumerate(rel_parts[:-1]):
+            rules = self._rules(folder, "/".join(rel_parts[:depth]), rules)
+            folder = os.path.join(folder, name)
+            if os.path.islink(folder) or self._prune_folder(name, folder, "/".join(rel_parts[:depth + 1]), rules):
+                return False
+        rules = self._rules(folder, "/".join(rel_parts[:-1]), rules)
+        return rel_parts[-1].endswith(".ipynb") and not self._skip_notebook(rel_parts[-1], "/".join(rel_parts), rules)
+
+
+def iter_notebooks(root: Path, exclude: Iterable[str] = (), use_gitignore: bool = True,
+                   default_excludes: Optional[Iterable[str]] = DEFAULT_EXCLUDES) -> Iterator[Path]:
+    """
+    Yield the .ipynb files under root as they are found.
+
+    The tree is walked depth-first with os.scandir, in name order, and
+    excluded folders are pruned without being entered (see NotebookScanner).
+    """
+    return NotebookScanner(root, exclude, use_gitignore, default_excludes).iter_notebooks()
@@ -0,0 +1,180 @@
+# repronotebook/checks_pipeline/execution/engine.py
+
+import copy
+import math
+import time
+from pathlib import Path
+from typing import Optional, Union
+import nbformat
+from nbclient import NotebookClient
+from nbclient.exceptions import CellExecutionError, CellTimeoutError, DeadKernelError
+from rich import print
+from repronotebook.checks_pipeline.notebook_document import NotebookDocument, as_document
+from repronotebook.checks_pipeline.execution.incremental import CellCache
+from repronotebook.checks_pipeline.execution.kernel_pool import RESET_CODE, get_kernel_pool
+from repronotebook.checks_pipeline.execution.profiling import CellProfiler, kernel_pid
+
+
+class NotebookTimeoutError(TimeoutError):
+    """The notebook as a whole ran longer than its time budget."""
+
+
+class KernelSetupError(RuntimeError):
+    """Setup code sent to the kernel outside of the notebook failed."""
+
+
+def _run_hidden(client: NotebookClient, code: str) -> dict:
+    """
+    Execute setup code on the kernel without recording it in the notebook.
+
+    This goes straight through the kernel client: NotebookClient.execute_cell
+    would write the cell back into the notebook at its index.
+    """
+    msg_id = client.kc.execute(code, silent=True, store_history=False)
+    reply = client.wait_for_reply(msg_id)
+    content = reply["content"] if reply else {}
+    if content.get("status") != "ok":
+        raise KernelSetupError(f"{content.get('ename', 'Error')}: {content.get('evalue', 'no reply from kernel')}")
+    return content
+
+
+def _timeout_seconds(seconds: Optional[float]) -> Optional[int]:
+    # NotebookClient.timeout only accepts whole seconds
+    return max(1, math.ceil(seconds)) if seconds else None
+
+
+def execute_notebook(
+    notebook: Union[NotebookDocument, str, Path],
+    output_path: Path,
+    kernel_name: str = None,
+    python: Path = None,
+    cell_timeout: Optional[float] = None,
+    notebook_timeout: Optional[float] = None,
+    allow_errors: bool = False,
+    reset_mode: str = "restart",
+    prewarm: bool = False,
+    profile: bool = False,
+    embed_timings: bool = False,
+    cell_cache: Optional[CellCache] = None,
+) -> dict:
+    """
+    Execute a notebook on a pooled kernel and write the result to output_path.
+
+    The kernel comes from the process-wide pool for the given Python
+    interpreter (e.g. a Conda env's python) or kernelspec name, so repeated
+    runs in the same environment skip kernel startup. The kernel is restarted
+    after the run, or with reset_mode="reset" has its namespace cleared before
+    the next one. With prewarm=True (restart mode only) a fresh kernel is
+    started in the background while this notebook runs, for the next notebook
+    in the same environment. The source notebook is never modified.
+    cell_timeout limits each cell; notebook_timeout limits the whole run and
+    shrinks the per-cell budget as time passes.
+
+    With profile=True the wall time, CPU time and peak RSS of every cell are
+    measured on the kernel process and returned under "profile";
+    embed_timings=True also stores them in each executed cell's metadata.
+
+    With a cell_cache, cells whose code and upstream code are unchanged are
+    not executed again: the kernel state is restored from a checkpoint and
+    execution resumes at the first changed cell (see CellCache). A full
+    cell_cache run reports cells whose outputs differ from the cached ones
+    under "mismatches".
+
+    Returns a dictionary with success, error, duration, output_path and profile.
+    """
+    doc = as_document(notebook)
+    nb = copy.deepcopy(doc.nb)  # the cached document is shared, never mutate it
+    notebook_dir = str(doc.path.parent)
+    kernel_name = kernel_name or doc.kernel_name or "python3"
+    pool = get_kernel_pool(kernel_name=None if python else kernel_name, python=python, reset_mode=reset_mode)
+
+    started = time.perf_counter()
+    deadline = started + notebook_timeout if notebook_timeout else None
+    result = {"success": False, "error": None, "duration": 0.0, "output_path": str(output_path), "profile": None,
+              "mismatches": None}
+
+    try:
+        km, needs_reset = pool.acquire()
+    except Exception as e:
+        result["error"] = f"Could not start kernel: {e}"
+        print(f"[red]❌ {result['error']}[/]")
+        return result
+    if prewarm and reset_mode == "restart":
+        pool.prewarm_in_background()
+
+    client = NotebookClient(
+        nb,
+        km=km,
+        timeout=_timeout_seconds(cell_timeout),
+        allow_errors=allow_errors,
+        resources={"metadata": {"path": notebook_dir}},
+    )
+    profiler = CellProfiler(kernel_pid(km)) if profile or embed_timings else None
+    healthy = True
+    try:
+        with client.setup_kernel():
+            info_msg = client.wait_for_reply(client.kc.kernel_info())
+            if info_msg is not None and "language_info" in info_msg["content"]:
+                nb.metadata["language_info"] = info_msg["content"]["language_info"]
+            if needs_reset:
+                _run_hidden(client, RESET_CODE)
+            # A pooled kernel may have been started elsewhere; run next to the notebook
+            _run_hidden(client, f"import os as __os; __os.chdir({notebook_dir!r}); del __os")
+            start = cell_cache.resume(nb, lambda code: _run_hidden(client, code)) if cell_cache is not None else 0
+
+            for index, cell in enumerate(nb.cells):
+                if cell.cell_type != "code" or index < start:
+                    continue
+                if deadline is not None:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        raise NotebookTimeoutError(f"Notebook exceeded its {notebook_timeout}s time limit")
+                    client.timeout = _timeout_seconds(min(cell_timeout, remaining) if cell_timeout else remaining)
+                cell_started = time.perf_counter()
+                if profiler is None:
+                    client.execute_cell(cell, index)
+                else:
+                    with profiler.profile(index, cell.source):
+                        client.execute_cell(cell, index)
+                if cell_cache is not None:
+                    cell_cache.executed(cell, index, time.perf_counter() - cell_started, lambda code: _run_hidden(client, code))
+        result["success"] = True
+    except CellExecutionError as e:
+        result["error"] = str(e)
+    except (CellTimeoutError, NotebookTimeoutError, DeadKernelError, KernelSetupError, RuntimeError) as e:
+        # The kernel may still be busy or gone; don't hand it to the next notebook
+        healthy = False
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if client.kc is not None:
+            client.kc.stop_channels()
+        pool.release(km, healthy=healthy)
+        if cell_cache is not None:
+            # Cells that ran before a failure are still worth reusing
+            cell_cache.save()
+            if cell_cache.full:
+                result["mismatches"] = cell_cache.mismatches()
+
+    if profiler is not None:
+        result["profile"] = profiler.cells
+        if embed_timings:
+            for measurement in profiler.cells:
+                nb.cells[measurement["index"]].metadata.setdefault("repronotebook", {})["profile"] = {
+                    key: measurement[key] for key in ("wall_time", "cpu_time", "peak_rss")
+                }
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    nbformat.write(nb, str(output_path))
+    result["duration"] = time.perf_counter() - started
+
+    if result["mismatches"]:
+        print(f"[yellow]⚠️ Full run differs from the incremental outputs of cell(s): {result['mismatches']}[/]")
+    elif result["mismatches"] is not None and result["success"]:
+        print("[green]✅ Full run matches the incremental outputs[/]")
+    if result["success"]:
+        print(f"[green]✅ Notebook executed successfully in {result['duration']:.1f}s[/]")
+    else:
+        print("[red]❌ Notebook execution failed[/]")
+        print(result["error"])
+    return result
@@ -0,0 +1,229 @@
+# repronotebook/checks_pipeline/execution/incremental.py
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Callable, Optional
+import nbformat
+from rich import print
+from repronotebook.checks_pipeline.output_check.output_diff import compare_cell_outputs
+
+INDEX_VERSION = 1
+# Cheap cells are quicker to re-run than to checkpoint; state is saved once
+# at least this much execution time has passed since the last checkpoint
+CHECKPOINT_MIN_SECONDS = 1.0
+# Checkpoints are whole namespaces (dataframes included); only the latest few
+# are kept, within a disk budget, and older ones are deleted as new ones arrive
+CHECKPOINT_MAX_COUNT = 4
+CHECKPOINT_MAX_BYTES = int(os.environ.get("REPRONOTEBOOK_CHECKPOINT_MAX_BYTES", 2 * 1024 ** 3))
+
+# The kernel runs in the notebook's own environment, where repronotebook is
+# not installed: this code is sent as source and only needs dill there. It
+# runs in a private namespace so the notebook never sees it. IPython's own
+# names (In, Out, _, _i3, get_ipython...) are left out of the checkpoint.
+_STATE_CODE = """\
+import os, re, dill
+from IPython import get_ipython
+shell = get_ipython()
+history = re.compile(r"_{1,3}|_i{1,3}|_i?\\d+|_[iod]h")
+def user_state():
+    return {name: value for name, value in shell.user_ns.items()
+            if name not in shell.user_ns_hidden and not history.fullmatch(name)}
+def checkpoint(path):
+    tmp = path + ".tmp"
+    try:
+        with open(tmp, "wb") as f:
+            dill.dump(user_state(), f)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+def restore(path):
+    with open(path, "rb") as f:
+        shell.user_ns.update(dill.load(f))
+"""
+
+
+def _kernel_call(function: str, path: Optional[Path] = None) -> str:
+    args = repr(str(path)) if path is not None else ""
+    return f"exec({_STATE_CODE!r} + {f'{function}({args})'!r}, {{}})"
+
+
+def chain_hashes(nb, seed: str = "") -> dict[int, str]:
+    """
+    Hash every code cell together with all code cells above it.
+
+    A cell's hash changes when it or any upstream cell changes, so the first
+    unknown hash in a notebook marks where execution has to resume.
+    Returns cell index -> hash.
+    """
+    hashes, previous = {}, hashlib.sha256(seed.encode()).hexdigest()
+    for index, cell in enumerate(nb.cells):
+        if cell.cell_type != "code":
+            continue
+        previous = hashlib.sha256(f"{previous}\0{cell.source}".encode()).hexdigest()
+        hashes[index] = previous
+    return hashes
+
+
+class CellCache:
+    """
+    Per-cell outputs and kernel state checkpoints of one notebook.
+
+    Entries are keyed by chain_hashes(), so a cached cell is only reused when
+    neither it nor anything above it changed. After a cell has run, the
+    kernel's variables may be saved with dill to <hash>.pkl; a later run
+    restores the nearest checkpoint above the first changed cell and resumes
+    execution from there instead of from the top. Without dill in the
+    kernel's environment, or when the state cannot be restored, the notebook
+    runs in full. Only the entries of the latest run are kept on disk, with
+    at most CHECKPOINT_MAX_COUNT checkpoints totalling CHECKPOINT_MAX_BYTES:
+    an earlier checkpoint is dropped first, since any later one restores the
+    same cells and more.
+
+    With full=True every cell is executed and its outputs are compared with
+    the ones the cache holds (the result of earlier incremental runs), the
+    way the output comparison stage does: volatile fields are ignored and
+    numbers and images compared within tolerance.
+    """
+
+    def __init__(self, folder: Path, seed: str = "", full: bool = False):
+        self.folder = Path(folder).resolve()
+        self.seed = seed
+        self.full = full
+        self.cells = {}
+        self.hashes = {}
+        self.checkpoints = True
+        self._since_checkpoint = 0.0
+        self._previous = {}
+        index_path = self.folder / "index.json"
+        if index_path.exists():
+            try:
+                with open(index_path, "r") as f:
+                    index = json.load(f)
+                if index.get("version") == INDEX_VERSION:
+                    self._previous = index.get("cells", {})
+            except (OSError, ValueError):
+                pass
+
+    def _checkpoint_path(self, cell_hash: str) -> Path:
+        return self.folder / f"{cell_hash}.pkl"
+
+    def _reuse(self, nb, index: int):
+        entry = self._previous[self.hashes[index]]
+        nb.cells[index].outputs = [nbformat.from_dict(output) for output in entry["outputs"]]
+        nb.cells[index].execution_count = entry["execution_count"]
+        self.cells[self.hashes[index]] = entry
+
+    def resume(self, nb, run_hidden: Callable[[str], dict]) -> int:
+        """
+        Fill in cached outputs and restore kernel state; return the index of the first cell to execute.
+
+        run_hidden executes code on the (freshly reset) kernel and raises on failure.
+        """
+        self.hashes = chain_hashes(nb, self.seed)
+        self.folder.mkdir(parents=True, exist_ok=True)
+        try:
+            run_hidden(_kernel_call("user_state"))
+        except Exception:
+            self.checkpoints = False
+            print("[yellow]⚠️ dill is not importable in the kernel's environment; running every cell, without checkpoints[/]")
+            print("[yellow]💡 Tip: add dill to environment.yml[/]")
+            return 0
+        if self.full:
+            return 0
+
+        changed = next((index for index, cell_hash in self.hashes.items() if cell_hash not in self._previous), None)
+        if changed is None:
+            for index in self.hashes:
+                self._reuse(nb, index)
+            print(f"[blue]♻️ All {len(self.hashes)} code cells unchanged, reusing their outputs[/]")
+            return len(nb.cells)
+
+        restore = None
+        for index, cell_hash in self.hashes.items():
+            if index >= changed:
+                break
+            if self._previous[cell_hash].get("checkpoint") and self._checkpoint_path(cell_hash).exists():
+                restore = index
+        if restore is None:
+            return 0
+        try:
+            run_hidden(_kernel_call("restore", self._checkpoint_path(self.hashes[restore])))
+        except Exception as e:
+            print(f"[yellow]⚠️ Could not restore kernel state ({e}); running every cell[/]")
+            # Whatever the failed restore left behind must not leak into the full run
+            run_hidden("get_ipython().run_line_magic('reset', '-f')")
+            return 0
+        reused = [index for index in self.hashes if index <= restore]
+        for index in reused:
+            self._reuse(nb, index)
+        print(f"[blue]♻️ Restored kernel state after cell {restore}, reusing {len(reused)} cell(s) "
+              f"and resuming at cell {restore + 1}[/]")
+        return restore + 1
+
+    def executed(self, cell, index: int, elapsed: float, run_hidden: Callable[[str], dict]):
+        """Record a cell that just ran, and checkpoint the kernel if enough work has piled up."""
+        cell_hash = self.hashes[index]
+        entry = {"outputs": list(cell.outputs), "execution_count": cell.execution_count, "checkpoint": False}
+        self.cells[cell_hash] = entry
+        self._since_checkpoint += elapsed
+        if not self.checkpoints or self._since_checkpoint < CHECKPOINT_MIN_SECONDS:
+            return
+        try:
+            run_hidden(_kernel_call("checkpoint", self._checkpoint_path(cell_hash)))
+        except Exception as e:
+            # Open files, sockets, generators...: keep going, a later cell may be picklable again
+            print(f"[yellow]⚠️ Kernel state after cell {index} can't be serialized ({e}); no checkpoint there[/]")
+            return
+        entry["checkpoint"] = True
+        entry["checkpoint_bytes"] = self._checkpoint_path(cell_hash).stat().st_size
+        self._since_checkpoint = 0.0
+        self._prune()
+
+    def _prune(self):
+        """Delete the earliest checkpoints until the rest fit CHECKPOINT_MAX_COUNT and CHECKPOINT_MAX_BYTES."""
+        kept = [(cell_hash, self.cells[cell_hash]) for cell_hash in self.hashes.values()
+                if self.cells.get(cell_hash, {}).get("checkpoint")]
+        for cell_hash, entry in kept:
+            if "checkpoint_bytes" not in entry:  # reused from an index that didn't record it
+                path = self._checkpoint_path(cell_hash)
+                entry["checkpoint_bytes"] = path.stat().st_size if path.exists() else 0
+        total = sum(entry["checkpoint_bytes"] for _, entry in kept)
+        while kept and (len(kept) > CHECKPOINT_MAX_COUNT or total > CHECKPOINT_MAX_BYTES):
+            cell_hash, entry = kept.pop(0)
+            if not kept:
+                print(f"[yellow]⚠️ Kernel state checkpoint ({entry['checkpoint_bytes'] / 1024 ** 2:.0f} MB) "
+                      f"exceeds the {CHECKPOINT_MAX_BYTES / 1024 ** 2:.0f} MB budget; not keeping it[/]")
+            self._checkpoint_path(cell_hash).unlink(missing_ok=True)
+            entry["checkpoint"] = False
+            total -= entry.pop("checkpoint_bytes")
+
+    def mismatches(self) -> Optional[list[int]]:
+        """Code cells of this run whose outputs differ from the cached ones; None if nothing could be compared."""
+        compared = [index for index, cell_hash in self.hashes.items()
+                    if cell_hash in self.cells and cell_hash in self._previous]
+        if not compared:
+            return None
+        return [index for index in compared if any(
+            output["status"] == "different" for output in compare_cell_outputs(
+                self._previous[self.hashes[index]]["outputs"], self.cells[self.hashes[index]]["outputs"]))]
+
+    def save(self):
+        """Write the index of this run and delete checkpoints it no longer references."""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        keep = {f"{cell_hash}.pkl" for cell_hash, entry in self.cells.items() if entry.get("checkpoint")}
+        for path in self.folder.glob("*.pkl"):
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.folder, prefix=".index.json.")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": INDEX_VERSION, "cells": self.cells}, f)
+            os.replace(tmp, self.folder / "index.json")
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
@@ -0,0 +1,234 @@
+# repronotebook/checks_pipeline/execution/kernel_pool.py
+
+import atexit
+import multiprocessing.util
+import sys
+import threading
+import time
+from pathlib import Path
+from jupyter_client.kernelspec import KernelSpec, KernelSpecManager
+from jupyter_client.manager import AsyncKernelManager
+from jupyter_core.utils import run_sync
+from repronotebook.checks_pipeline.tracing import span
+
+# Runs in a reused kernel before each notebook with reset_mode="reset":
+# forget the previous notebook's variables but keep imported modules warm.
+RESET_CODE = """\
+get_ipython().run_line_magic('reset', '-f')
+import gc as __gc; __gc.collect(); del __gc
+"""
+
+# Idle kernels are kept for this many environments (most recently used first);
+# the rest are shut down, e.g. when a run moves on to notebooks of other envs
+MAX_IDLE_ENVS = 2
+
+
+def env_python(prefix: Path) -> Path:
+    """Path of the Python interpreter inside a Conda env prefix."""
+    prefix = Path(prefix)
+    if sys.platform == "win32":
+        return prefix / "python.exe"
+    return prefix / "bin" / "python"
+
+
+def has_ipykernel(prefix: Path) -> bool:
+    """Check whether ipykernel is installed in an env, without starting Python."""
+    prefix = Path(prefix)
+    if sys.platform == "win32":
+        return (prefix / "Lib" / "site-packages" / "ipykernel").is_dir()
+    return any(prefix.glob("lib/python*/site-packages/ipykernel"))
+
+
+class _PythonKernelSpecManager(KernelSpecManager):
+    """Serves a single kernelspec that launches ipykernel from a given Python."""
+
+    def __init__(self, python: str, **kwargs):
+        super().__init__(**kwargs)
+        self.python = python
+
+    def get_kernel_spec(self, kernel_name: str) -> KernelSpec:
+        return KernelSpec(
+            argv=[self.python, "-m", "ipykernel_launcher", "-f", "{connection_file}"],
+            display_name=f"Python ({self.python})",
+            language="python",
+        )
+
+
+class KernelPool:
+    """
+    Pre-started kernels for one environment, reused across notebooks.
+
+    A kernel is identified either by an installed kernelspec name or by the
+    Python interpreter of an environment (e.g. a Conda env), so notebooks run
+    in that env without `conda run` or a new Jupyter process. Between
+    notebooks a kernel is restarted, so nothing one notebook did (imported
+    modules, monkeypatches, open files) leaks into the next. reset_mode="reset"
+    opts into resetting it in place instead: the namespace is cleared but
+    imported modules stay warm.
+
+    Pools of the same environment together keep at most `size` idle
+    kernels, and only the MAX_IDLE_ENVS most recently used environments
+    keep any. A kernel whose interpreter has disappeared (its Conda env was
+    evicted) is never handed out.
+    """
+
+    def __init__(self, kernel_name: str = None, python: str = None, size: int = 1, reset_mode: str = "restart"):
+        if reset_mode not in ("reset", "restart"):
+            raise ValueError(f"Unknown reset mode: {reset_mode}")
+        self.kernel_name = kernel_name
+        self.python = python
+        self.size = size
+        self.reset_mode = reset_mode
+        self._idle = []
+        self._used = set()
+        self._lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+    @property
+    def env(self) -> tuple:
+        """The environment kernels run in; pools differing only in reset_mode share it."""
+        return self.kernel_name, self.python
+
+    def _new_manager(self) -> AsyncKernelManager:
+        if self.python:
+            return AsyncKernelManager(
+                kernel_name="repronotebook-env",
+                kernel_spec_manager=_PythonKernelSpecManager(self.python),
+            )
+        return AsyncKernelManager(kernel_name=self.kernel_name or "python3")
+
+    def _start(self) -> AsyncKernelManager:
+        km = self._new_manager()
+        with span("kernel start", category="subprocess", kernel=km.kernel_name):
+            run_sync(km.start_kernel)()
+        return km
+
+    def prewarm(self):
+        """Start kernels until the pool holds `size` idle ones."""
+        with self._lock:
+            missing = self.size - len(self._idle)
+        for _ in range(max(0, missing)):
+            km = self._start()
+            with self._lock:
+                self._idle.append(km)
+
+    def prewarm_in_background(self) -> threading.Thread:
+        """Run prewarm() in a thread, e.g. to start the next notebook's kernel while one runs."""
+        thread = threading.Thread(target=self._prewarm_quietly, name="kernel-prewarm")
+        thread.start()
+        return thread
+
+    def _prewarm_quietly(self):
+        try:
+            self.prewarm()
+        except Exception:
+            pass  # acquire() starts a kernel itself and reports the error
+
+    def acquire(self) -> tuple[AsyncKernelManager, bool]:
+        """
+        Take a running kernel out of the pool, starting one if none is idle.
+
+        Returns (kernel manager, needs_reset); needs_reset is True when the
+        kernel already ran another notebook and must be reset before use.
+        """
+        self.last_used = time.monotonic()
+        if self.python and not Path(self.python).exists():
+            self.shutdown()
+            raise RuntimeError(f"{self.python} no longer exists; was its environment removed?")
+        with self._lock:
+            km = self._idle.pop() if self._idle else None
+        if km is None or not run_sync(km.is_alive)():
+            km = self._start()
+        return km, id(km) in self._used
+
+    def release(self, km: AsyncKernelManager, healthy: bool = True):
+        """Return a kernel to the pool, or shut it down if it is unusable."""
+        if not healthy or not run_sync(km.is_alive)():
+            self._shutdown(km)
+            return
+        with self._lock:
+            full = len(self._idle) >= self.size
+        # A restart is wasted on a kernel the pool has no room for (e.g. after prewarming)
+        if full:
+            self._shutdown(km)
+            return
+        if self.reset_mode == "restart":
+            run_sync(km.restart_kernel)(now=True)
+            self._used.discard(id(km))
+        else:
+            self._used.add(id(km))
+        with self._lock:
+            kept = len(self._idle) < self.size
+            if kept:
+                self._idle.append(km)
+        if not kept:
+            self._shutdown(km)
+            return
+        self.last_used = time.monotonic()
+        _trim_idle_kernels()
+
+    def _take_idle(self, keep: int) -> list[AsyncKernelManager]:
+        """Remove and return all but the `keep` most recently returned idle kernels."""
+        with self._lock:
+            cut = max(0, len(self._idle) - keep)
+            extra, self._idle = self._idle[:cut], self._idle[cut:]
+        return extra
+
+    def _shutdown(self, km: AsyncKernelManager):
+        self._used.discard(id(km))
+        try:
+            run_sync(km.shutdown_kernel)(now=True)
+        except Exception:
+            pass
+
+    def shutdown(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for km in idle:
+            self._shutdown(km)
+
+
+_pools = {}
+
+
+def get_kernel_pool(kernel_name: str = None, python: str = None, size: int = 1, reset_mode: str = "restart") -> KernelPool:
+    """Return the process-wide pool for a kernelspec name or Python interpreter."""
+    key = (kernel_name, str(python) if python else None, reset_mode)
+    if key not in _pools:
+        _pools[key] = KernelPool(kernel_name=kernel_name, python=str(python) if python else None,
+                                 size=size, reset_mode=reset_mode)
+    return _pools[key]
+
+
+def _trim_idle_kernels():
+    """Enforce the per-environment and MAX_IDLE_ENVS caps on idle kernels across pools."""
+    envs, idle_per_env, excess = [], {}, []
+    for pool in sorted(list(_pools.values()), key=lambda p: p.last_used, reverse=True):
+        if pool.env not in envs:
+            envs.append(pool.env)
+        keep = 0 if envs.index(pool.env) >= MAX_IDLE_ENVS else max(0, pool.size - idle_per_env.get(pool.env, 0))
+        excess.extend((pool, km) for km in pool._take_idle(keep))
+        idle_per_env[pool.env] = idle_per_env.get(pool.env, 0) + len(pool._idle)
+    for pool, km in excess:
+        pool._shutdown(km)
+
+
+def shutdown_env_kernels(prefix: Path):
+    """Shut down the pooled kernels running from a Conda env, e.g. before it is removed."""
+    prefix = Path(prefix)
+    for key, pool in list(_pools.items()):
+        if pool.python and prefix in Path(pool.python).parents:
+            pool.shutdown()
+            del _pools[key]
+
+
+def shutdown_kernel_pools():
+    """Shut down every pooled kernel of this process."""
+    for pool in list(_pools.values()):
+        pool.shutdown()
+    _pools.clear()
+
+
+atexit.register(shutdown_kernel_pools)
+# Worker processes of a ProcessPoolExecutor exit without running atexit hooks
+multiprocessing.util.Finalize(None, shutdown_kernel_pools, exitpriority=10)
@@ -0,0 +1,160 @@
+# repronotebook/checks_pipeline/execution/profiling.py
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+from rich import print
+from rich.table import Table
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+_CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+
+def _read_proc(pid: int) -> tuple[Optional[float], Optional[int]]:
+    """(cpu seconds, rss bytes) of a process from /proc, for systems without psutil."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; fields after it are fixed
+            fields = f.read().rsplit(")", 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / _CLOCK_TICKS  # utime + stime
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * _PAGE_SIZE
+        return cpu, rss
+    except (OSError, IndexError, ValueError):
+        return None, None
+
+
+def sample_process(pid: int) -> tuple[Optional[float], Optional[int]]:
+    """Return (cpu seconds, rss bytes) of a process and its children."""
+    if psutil is not None:
+        try:
+            proc = psutil.Process(pid)
+            procs = [proc] + proc.children(recursive=True)
+            cpu, rss = 0.0, 0
+            for p in procs:
+                try:
+                    times = p.cpu_times()
+                    cpu += times.user + times.system
+                    rss += p.memory_info().rss
+                except psutil.Error:
+                    continue
+            return cpu, rss
+        except psutil.Error:
+            return None, None
+    return _read_proc(pid)
+
+
+class CellProfiler:
+    """
+    Records wall time, CPU time and peak RSS of every executed cell.
+
+    CPU time and memory are measured on the kernel process (pid), so the
+    numbers describe the notebook's own work, not the pipeline's. Peak RSS
+    is found by sampling the kernel in a background thread while a cell runs.
+    """
+
+    def __init__(self, pid: Optional[int], interval: float = 0.02):
+        self.pid = pid
+        self.interval = interval
+        self.cells = []
+
+    @contextmanager
+    def profile(self, index: int, source: str):
+        cpu_before, rss = sample_process(self.pid) if self.pid else (None, None)
+        peak = [rss]
+        stop = threading.Event()
+
+        def sampler():
+            while not stop.wait(self.interval):
+                _, current = sample_process(self.pid)
+                if current is not None and (peak[0] is None or current > peak[0]):
+                    peak[0] = current
+
+        thread = None
+        if self.pid and rss is not None:
+            thread = threading.Thread(target=sampler, daemon=True)
+            thread.start()
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - started
+            stop.set()
+            if thread is not None:
+                thread.join()
+            cpu_after, rss_after = sample_process(self.pid) if self.pid else (None, None)
+            if rss_after is not None and (peak[0] is None or rss_after > peak[0]):
+                peak[0] = rss_after
+            first_line = source.strip().splitlines()[0] if source.strip() else ""
+            self.cells.append({
+                "index": index,
+                "wall_time": wall,
+                "cpu_time": cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None,
+                "peak_rss": peak[0],
+                "source": first_line[:80],
+            })
+
+
+def kernel_pid(km) -> Optional[int]:
+    """Process id of a locally launched kernel."""
+    provisioner = getattr(km, "provisioner", None)
+    pid = getattr(provisioner, "pid", None)
+    if pid is None:
+        process = getattr(provisioner, "process", None)
+        pid = getattr(process, "pid", None)
+    return pid
+
+
+def write_profile(profile_path: Path, notebook_path: Path, cells: list[dict]) -> Path:
+    """Save per-cell measurements to generated/profiles/<notebook>.json."""
+    profile_path = Path(profile_path)
+    profile_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(profile_path, "w") as f:
+        json.dump({
+            "notebook": str(notebook_path),
+            "total_wall_time": sum(c["wall_time"] for c in cells),
+            "cells": cells,
+        }, f, indent=2)
+    return profile_path
+
+
+def _format_mb(value: Optional[int]) -> str:
+    return f"{value / (1024 * 1024):.1f}" if value is not None else "-"
+
+
+def print_hot_cells(profile_paths: list[Path], top: int = 10):
+    """Print the slowest cells across all profiled notebooks."""
+    cells = []
+    for path in profile_paths:
+        try:
+            with open(path, "r") as f:
+                profile = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for cell in profile["cells"]:
+            cells.append((Path(profile["notebook"]).name, cell))
+    if not cells:
+        return
+
+    cells.sort(key=lambda item: item[1]["wall_time"], reverse=True)
+    table = Table(title=f"Top {min(top, len(cells))} hot cells")
+    table.add_column("Notebook")
+    table.add_column("Cell", justify="right")
+    table.add_column("Wall (s)", justify="right")
+    table.add_column("CPU (s)", justify="right")
+    table.add_column("Peak RSS (MB)", justify="right")
+    table.add_column("Source")
+    for name, cell in cells[:top]:
+        cpu = f"{cell['cpu_time']:.2f}" if cell["cpu_time"] is not None else "-"
+        table.add_row(name, str(cell["index"]), f"{cell['wall_time']:.2f}", cpu,
+                      _format_mb(cell["peak_rss"]), cell["source"])
+    print(table)
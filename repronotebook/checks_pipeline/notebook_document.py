@@ -0,0 +1,150 @@
+# repronotebook/checks_pipeline/notebook_document.py
+
+from functools import lru_cache
+from pathlib import Path
+import re
+from typing import Optional, Union
+import nbformat
+from repronotebook.checks_pipeline.notebook_reader import NotebookStreamError, read_notebook_sources
+
+# Documents that were fully parsed (for execution) can hold megabytes of
+# base64 outputs, so keep the cache small.
+NOTEBOOK_CACHE_SIZE = 8
+
+# Cell magics whose body is still Python code
+PYTHON_CELL_MAGICS = {"time", "timeit", "capture", "prun", "debug"}
+# Line magics that wrap a Python statement, e.g. `%time import numpy`
+PYTHON_LINE_MAGICS = {"time", "timeit", "prun"}
+
+_MAGIC_LINE = re.compile(r"^(\s*)(?:([\w.]+)\s*=\s*)?[%!]")
+# Help syntax: `obj?` / `obj.attr??` on a line of its own
+_HELP_LINE = re.compile(r"^[\w.]+\?{1,2}$")
+
+
+class NotebookDocument:
+    """
+    A notebook parsed once and shared by every pipeline stage.
+
+    Loaded documents only hold code-cell sources and the kernelspec /
+    language_info metadata, read by streaming past outputs. The full
+    nbformat notebook is parsed on first access to `nb`, which only
+    execution needs.
+    """
+
+    def __init__(self, path: Path, mtime_ns: int, size: int, nb: Optional[nbformat.NotebookNode] = None,
+                 sources: Optional[dict] = None):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self._nb = nb
+        self._sources = sources
+
+    @property
+    def nb(self) -> nbformat.NotebookNode:
+        if self._nb is None:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self._nb = nbformat.read(f, as_version=4)
+        return self._nb
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def stem(self) -> str:
+        return self.path.stem
+
+    @property
+    def metadata(self) -> dict:
+        if self._nb is None and self._sources is not None:
+            return self._sources["metadata"]
+        return self.nb.metadata
+
+    @property
+    def kernel_name(self) -> str:
+        return self.metadata.get("kernelspec", {}).get("name", None)
+
+    def code_cells(self) -> list[tuple[int, str]]:
+        """Return (cell index, source) for every code cell."""
+        cells = self._sources["cells"] if self._sources is not None else self.nb.cells
+        return [
+            (index, cell["source"])
+            for index, cell in enumerate(cells)
+            if cell["cell_type"] == "code"
+        ]
+
+    def __repr__(self) -> str:
+        return f"NotebookDocument({str(self.path)!r})"
+
+
+def strip_magics(source: str) -> str:
+    """
+    Turn IPython cell source into plain Python that `ast` can parse.
+
+    Shell escapes and magics become `pass` at the same indentation so line
+    numbers stay aligned with the original cell; an assigned one such as
+    `files = !ls` keeps its target as `files = None`. Cells run by a
+    non-Python cell magic (e.g. %%bash) are returned empty.
+    """
+    lines = source.splitlines()
+    if lines and lines[0].startswith("%%"):
+        magic = lines[0][2:].split(maxsplit=1)[0] if lines[0][2:].strip() else ""
+        if magic not in PYTHON_CELL_MAGICS:
+            return ""
+        lines[0] = ""
+
+    cleaned = []
+    for line in lines:
+        match = _MAGIC_LINE.match(line)
+        if match:
+            indent, target = match.group(1), match.group(2)
+            if target:
+                cleaned.append(f"{indent}{target} = None")
+                continue
+            body = line.strip()
+            if body.startswith("%") and not body.startswith("%%"):
+                name, _, rest = body[1:].partition(" ")
+                if name in PYTHON_LINE_MAGICS and rest.strip():
+                    cleaned.append(indent + rest.strip())
+                    continue
+            cleaned.append(indent + "pass")
+        elif _HELP_LINE.match(line.strip()):
+            cleaned.append(line[:len(line) - len(line.lstrip())] + "pass")
+        else:
+            cleaned.append(line)
+    return "\n".join(cleaned)
+
+
+@lru_cache(maxsize=NOTEBOOK_CACHE_SIZE)
+def _load_cached(path: str, mtime_ns: int, size: int) -> NotebookDocument:
+    try:
+        return NotebookDocument(Path(path), mtime_ns, size, sources=read_notebook_sources(path))
+    except NotebookStreamError:
+        # Older nbformat versions or malformed files: let nbformat convert or report them
+        with open(path, "r", encoding="utf-8") as f:
+            nb = nbformat.read(f, as_version=4)
+        return NotebookDocument(Path(path), mtime_ns, size, nb=nb)
+
+
+def load_notebook(notebook_path: Union[str, Path]) -> NotebookDocument:
+    """
+    Load a notebook, reusing the parsed document while the file is unchanged.
+
+    Documents are keyed by (path, mtime, size) so an edited or re-executed
+    notebook is parsed again on its next load.
+    """
+    path = Path(notebook_path).resolve()
+    stat = path.stat()
+    return _load_cached(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def as_document(notebook: Union[NotebookDocument, str, Path]) -> NotebookDocument:
+    """Accept either a loaded document or a path and return the document."""
+    if isinstance(notebook, NotebookDocument):
+        return notebook
+    return load_notebook(notebook)
+
+
+def clear_notebook_cache():
+    """Drop every cached document."""
+    _load_cached.cache_clear()
@@ -0,0 +1,237 @@
+# repronotebook/checks_pipeline/notebook_reader.py
+
+import json
+import re
+from pathlib import Path
+from typing import Iterator, Union
+
+CHUNK_SIZE = 1 << 20
+
+# Notebook metadata kept by the streaming reader; anything else (widget state...) is skipped
+METADATA_KEYS = ("kernelspec", "language_info")
+# Cell fields kept by the streaming reader; outputs, attachments and cell metadata are skipped
+CELL_KEYS = ("cell_type", "source")
+
+_NEXT_TOKEN = re.compile(r"\S")
+_STRING_SPECIAL = re.compile(r'["\\]')
+_NESTED_SPECIAL = re.compile(r'["\[\]{}]')
+_SCALAR_END = re.compile(r"[\s,\]}]")
+
+
+class NotebookStreamError(ValueError):
+    """The file is not a notebook the streaming reader understands."""
+
+
+class _Scanner:
+    """
+    Walks a JSON document chunk by chunk.
+
+    Values can be skipped without being decoded, or captured as raw text and
+    handed to json.loads; only captured values are ever held in memory.
+    """
+
+    def __init__(self, f, chunk_size: int = CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        # Raw text of the value being read_value()'d that already left the buffer
+        self.capture = None
+        self.capture_start = 0
+
+    def _fill(self) -> bool:
+        """Replace the consumed buffer with the next chunk; False at end of file."""
+        if self.capture is not None:
+            self.capture.append(self.buf[self.capture_start:])
+            self.capture_start = 0
+        self.buf = self.f.read(self.chunk_size)
+        self.pos = 0
+        return bool(self.buf)
+
+    def _search(self, pattern: re.Pattern) -> re.Match:
+        while True:
+            match = pattern.search(self.buf, self.pos)
+            if match:
+                return match
+            if not self._fill():
+                raise NotebookStreamError("Unexpected end of notebook file")
+
+    def peek(self) -> str:
+        match = self._search(_NEXT_TOKEN)
+        self.pos = match.start()
+        return self.buf[self.pos]
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise NotebookStreamError(f"Expected {char!r} at {self.buf[self.pos:self.pos + 20]!r}")
+        self.pos += 1
+
+    def _skip_string(self):
+        """Skip a string whose opening quote was already consumed."""
+        while True:
+            match = self._search(_STRING_SPECIAL)
+            self.pos = match.end()
+            if match.group() == '"':
+                return
+            # Escape: skip the escaped character, which may start the next chunk
+            if self.pos >= len(self.buf) and not self._fill():
+                raise NotebookStreamError("Unexpected end of notebook file")
+            self.pos += 1
+
+    def skip_value(self):
+        char = self.peek()
+        self.pos += 1
+        if char == '"':
+            self._skip_string()
+        elif char in "[{":
+            depth = 1
+            while depth:
+                match = self._search(_NESTED_SPECIAL)
+                self.pos = match.end()
+                token = match.group()
+                if token == '"':
+                    self._skip_string()
+                elif token in "[{":
+                    depth += 1
+                else:
+                    depth -= 1
+        else:
+            # Number, true, false or null
+            while True:
+                match = _SCALAR_END.search(self.buf, self.pos)
+                if match:
+                    self.pos = match.start()
+                    return
+                if not self._fill():
+                    return
+
+    def read_value(self):
+        """Decode the next value; it must be small enough to hold in memory."""
+        self.peek()
+        self.capture, self.capture_start = [], self.pos
+        try:
+            self.skip_value()
+            pieces = self.capture
+        finally:
+            self.capture = None
+        pieces.append(self.buf[self.capture_start:self.pos])
+        raw = "".join(pieces)
+        return json.loads(raw)
+
+    def read_key(self) -> str:
+        if self.peek() != '"':
+            raise NotebookStreamError(f"Expected an object key at {self.buf[self.pos:self.pos + 20]!r}")
+        key = self.read_value()
+        self.expect(":")
+        return key
+
+    def iter_object(self):
+        """Yield the keys of the object at the cursor; the caller consumes each value."""
+        self.expect("{")
+        if self.peek() == "}":
+            self.pos += 1
+            return
+        while True:
+            yield self.read_key()
+            char = self.peek()
+            self.pos += 1
+            if char == "}":
+                return
+            if char != ",":
+                raise NotebookStreamError(f"Expected ',' or '}}' in object, got {char!r}")
+
+    def iter_array(self):
+        """Yield once per element of the array at the cursor; the caller consumes each element."""
+        self.expect("[")
+        if self.peek() == "]":
+            self.pos += 1
+            return
+        while True:
+            yield
+            char = self.peek()
+            self.pos += 1
+            if char == "]":
+                return
+            if char != ",":
+                raise NotebookStreamError(f"Expected ',' or ']' in array, got {char!r}")
+
+
+def _read_cell(scanner: _Scanner) -> dict:
+    cell = {}
+    for key in scanner.iter_object():
+        if key in CELL_KEYS:
+            cell[key] = scanner.read_value()
+        else:
+            scanner.skip_value()
+    cell["source"] = _join_lines(cell.get("source", ""))
+    return cell
+
+
+def _join_lines(value):
+    # nbformat 4 stores multi-line strings as a list of lines
+    return "".join(value) if isinstance(value, list) else value
+
+
+def iter_notebook_cells(notebook_path: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Stream the cells of a notebook one at a time, outputs included.
+
+    Only the cell being yielded is decoded, so two large notebooks can be
+    walked side by side without either being loaded. Multi-line sources and
+    output texts are joined into strings, as nbformat.read() would.
+    Raises NotebookStreamError for files that are not nbformat 4 notebooks,
+    possibly after some cells were yielded.
+    """
+    found = False
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        scanner = _Scanner(f, chunk_size)
+        for key in scanner.iter_object():
+            if key == "cells":
+                found = True
+                for _ in scanner.iter_array():
+                    cell = scanner.read_value()
+                    cell["source"] = _join_lines(cell.get("source", ""))
+                    for output in cell.get("outputs", ()):
+                        if "text" in output:
+                            output["text"] = _join_lines(output["text"])
+                        for mime, value in output.get("data", {}).items():
+                            output["data"][mime] = _join_lines(value)
+                    yield cell
+            elif key == "nbformat":
+                if scanner.read_value() != 4:
+                    raise NotebookStreamError(f"{notebook_path} is not an nbformat 4 notebook")
+            else:
+                scanner.skip_value()
+    if not found:
+        raise NotebookStreamError(f"{notebook_path} is not an nbformat 4 notebook")
+
+
+def read_notebook_sources(notebook_path: Union[str, Path], chunk_size: int = CHUNK_SIZE) -> dict:
+    """
+    Stream a notebook and keep only what parse-only stages need.
+
+    Returns {"nbformat", "nbformat_minor", "metadata", "cells"} where metadata
+    holds only METADATA_KEYS and each cell only its cell_type and source.
+    Outputs, attachments and widget state are scanned past without being
+    decoded, so memory use follows the size of the sources, not the file.
+    Raises NotebookStreamError for files that are not nbformat 4 notebooks.
+    """
+    notebook = {"nbformat": None, "nbformat_minor": None, "metadata": {}, "cells": None}
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        scanner = _Scanner(f, chunk_size)
+        for key in scanner.iter_object():
+            if key == "cells":
+                notebook["cells"] = [_read_cell(scanner) for _ in scanner.iter_array()]
+            elif key == "metadata":
+                for meta_key in scanner.iter_object():
+                    if meta_key in METADATA_KEYS:
+                        notebook["metadata"][meta_key] = scanner.read_value()
+                    else:
+                        scanner.skip_value()
+            elif key in ("nbformat", "nbformat_minor"):
+                notebook[key] = scanner.read_value()
+            else:
+                scanner.skip_value()
+    if notebook["nbformat"] != 4 or notebook["cells"] is None:
+        raise NotebookStreamError(f"{notebook_path} is not an nbformat 4 notebook")
+    return notebook
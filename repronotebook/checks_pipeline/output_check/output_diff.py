@@ -0,0 +1,311 @@
+# repronotebook/checks_pipeline/output_check/output_diff.py
+
+import base64
+import binascii
+import hashlib
+import io
+import json
+import math
+import re
+from itertools import zip_longest
+from pathlib import Path
+from typing import Iterator, Optional, Union
+from rich import print
+from repronotebook.checks_pipeline.notebook_reader import iter_notebook_cells
+
+try:
+    import numpy
+except ImportError:  # Numbers are then compared one by one with math.isclose
+    numpy = None
+
+try:
+    from PIL import Image
+except ImportError:  # Images are then compared byte for byte
+    Image = None
+
+OUTPUT_DIFF_VERSION = 2
+RELATIVE_TOLERANCE = 1e-5
+ABSOLUTE_TOLERANCE = 1e-8
+# Perceptual hashes (64 bits) this close are the same picture, e.g. a plot
+# re-rendered with another antialiasing or PNG encoder
+IMAGE_HASH_DISTANCE = 6
+IMAGE_MIMES = ("image/png", "image/jpeg", "image/gif", "image/bmp", "image/webp")
+
+# Output parts that change between runs without the results changing, as
+# (pattern, placeholder, text that must be present for the pattern to match)
+VOLATILE_PATTERNS = [
+    # Object reprs and ids: <Foo object at 0x7f3a2c...>
+    (re.compile(r"\b0x[0-9a-fA-F]{6,16}\b"), "0x<address>", "0x"),
+    # Timestamps (plain dates are left alone, they are usually data)
+    (re.compile(r"\b\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(?::\d{2}(?:[.,]\d+)?)?(?:Z|[+-]\d{2}:?\d{2})?"), "<datetime>", ":"),
+    (re.compile(r"\b\d{1,2}:\d{2}:\d{2}(?:[.,]\d+)?\b"), "<time>", ":"),
+    # %time / %timeit reports and progress bars
+    (re.compile(r"(?m)^(CPU times|Wall time):.*$"), r"\1: <elapsed>", " time"),
+    (re.compile(r"[\d.]+ [nµmu]?s ± [\d.]+ [nµmu]?s per loop.*"), "<timeit>", "per loop"),
+    (re.compile(r"\[\d+:\d+<[\d:?]+, *[\d.?]+ *(?:it/s|s/it)\]"), "[<progress>]", "it"),
+    # Temporary files and folders
+    (re.compile(r"/tmp/[\w.\-/]+"), "<tmpdir>", "/tmp/"),
+]
+
+# A number not glued to a name (x1, v2) or version (3.11.4); split() on it
+# alternates the text around numbers with the numbers themselves
+_NUMBER = re.compile(r"((?<![\w.])[-+]?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?(?![\w.])|(?<![\w.])[-+]?(?:nan|inf)\b)")
+# Order of severity; a cell is as bad as its worst output
+_STATUS_ORDER = {"identical": 0, "equivalent": 1, "different": 2}
+
+
+def mask_volatile(text: str) -> str:
+    """Replace addresses, timestamps, timings and temp paths with placeholders."""
+    for pattern, placeholder, marker in VOLATILE_PATTERNS:
+        if marker in text:
+            text = pattern.sub(placeholder, text)
+    return text
+
+
+def _comparable(output: dict) -> dict:
+    # Execution counts and output metadata (image sizes, display ids) are not results
+    return {key: value for key, value in output.items() if key not in ("execution_count", "metadata", "transient")}
+
+
+def output_digest(output: dict) -> str:
+    return hashlib.sha256(json.dumps(_comparable(output), sort_keys=True).encode()).hexdigest()
+
+
+def _numbers_close(a: list[str], b: list[str]) -> tuple[bool, float]:
+    """Whether two equally long lists of numbers match within tolerance, and their largest difference."""
+    if numpy is not None:
+        x, y = numpy.array(a, dtype=float), numpy.array(b, dtype=float)
+        close = numpy.isclose(x, y, rtol=RELATIVE_TOLERANCE, atol=ABSOLUTE_TOLERANCE, equal_nan=True)
+        with numpy.errstate(invalid="ignore"):
+            diff = numpy.abs(x - y)
+        finite = diff[numpy.isfinite(diff)]
+        return bool(close.all()), float(finite.max()) if finite.size else 0.0
+    close, largest = True, 0.0
+    for x, y in zip(map(float, a), map(float, b)):
+        if math.isnan(x) and math.isnan(y):
+            continue
+        if not math.isclose(x, y, rel_tol=RELATIVE_TOLERANCE, abs_tol=ABSOLUTE_TOLERANCE):
+            close = False
+        if math.isfinite(x - y):
+            largest = max(largest, abs(x - y))
+    return close, largest
+
+
+def _first_difference(a: str, b: str) -> str:
+    for line_a, line_b in zip_longest(a.splitlines(), b.splitlines(), fillvalue=""):
+        if line_a != line_b:
+            return f"{line_a[:60]!r} != {line_b[:60]!r}"
+    return "text differs"
+
+
+def compare_text(a: str, b: str) -> tuple[str, Optional[str]]:
+    """
+    Compare two text outputs (stream text, text/plain, HTML tables, array reprs).
+
+    Texts equal up to VOLATILE_PATTERNS are equivalent, as are texts whose
+    numbers all agree within RELATIVE_TOLERANCE / ABSOLUTE_TOLERANCE while
+    everything around them is the same. Returns (status, detail).
+    """
+    if a == b:
+        return "identical", None
+    a, b = mask_volatile(a), mask_volatile(b)
+    if a == b:
+        return "equivalent", "volatile fields differ"
+    pieces_a, pieces_b = _NUMBER.split(a), _NUMBER.split(b)
+    if pieces_a[::2] != pieces_b[::2]:
+        return "different", _first_difference(a, b)
+    numbers_a, numbers_b = pieces_a[1::2], pieces_b[1::2]
+    close, largest = _numbers_close(numbers_a, numbers_b)
+    if close:
+        return "equivalent", f"{len(numbers_a)} numbers within tolerance (max difference {largest:.3g})"
+    return "different", f"numbers outside tolerance (max difference {largest:.3g})"
+
+
+def is_text_mime(mime: str) -> bool:
+    """Formats whose content is text worth comparing loosely; everything else is compared as bytes."""
+    return mime.startswith("text/") or mime.endswith(("json", "+xml", "javascript"))
+
+
+def _decode_image(data: str):
+    image = Image.open(io.BytesIO(base64.b64decode(data)))
+    image.load()
+    return image
+
+
+def image_hash(image) -> int:
+    """64-bit difference hash: does each pixel of a 9x8 grayscale thumbnail get brighter to the right."""
+    small = image.convert("L").resize((9, 8), Image.LANCZOS)
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (pixels[row * 9 + col] < pixels[row * 9 + col + 1])
+    return bits
+
+
+def compare_image(a: str, b: str) -> tuple[str, Optional[str]]:
+    """Compare two base64 images by perceptual hash; byte for byte without Pillow."""
+    if a == b:
+        return "identical", None
+    if Image is None:
+        return "different", "image bytes differ (install Pillow for perceptual comparison)"
+    try:
+        image_a, image_b = _decode_image(a), _decode_image(b)
+    except (OSError, ValueError, binascii.Error) as e:
+        return "different", f"image could not be decoded: {e}"
+    distance = bin(image_hash(image_a) ^ image_hash(image_b)).count("1")
+    if image_a.size == image_b.size and distance <= IMAGE_HASH_DISTANCE:
+        return "equivalent", f"perceptual hash distance {distance}"
+    return "different", f"perceptual hash distance {distance}, size {image_a.size} vs {image_b.size}"
+
+
+def _worst(statuses) -> str:
+    return max(statuses, key=_STATUS_ORDER.__getitem__, default="identical")
+
+
+def compare_outputs(a: dict, b: dict) -> tuple[str, Optional[str]]:
+    """Compare two outputs whose hashes differ; returns (status, detail)."""
+    if a.get("output_type") != b.get("output_type"):
+        return "different", f"{a.get('output_type')} output became {b.get('output_type')}"
+    output_type = a.get("output_type")
+    if output_type == "stream":
+        if a.get("name") != b.get("name"):
+            return "different", f"{a.get('name')} output became {b.get('name')}"
+        return compare_text(a.get("text", ""), b.get("text", ""))
+    if output_type == "error":
+        if a.get("ename") != b.get("ename"):
+            return "different", f"{a.get('ename')} became {b.get('ename')}"
+        # Tracebacks hold paths and line numbers of the machine that ran it
+        return compare_text(a.get("evalue", ""), b.get("evalue", ""))
+
+    data_a, data_b = a.get("data", {}), b.get("data", {})
+    if data_a.keys() != data_b.keys():
+        return "different", f"formats {sorted(data_a)} became {sorted(data_b)}"
+    results = {}
+    for mime in data_a:
+        value_a, value_b = data_a[mime], data_b[mime]
+        if mime in IMAGE_MIMES:
+            results[mime] = compare_image(value_a, value_b)
+        elif value_a == value_b:
+            results[mime] = ("identical", None)
+        elif not is_text_mime(mime):
+            results[mime] = ("different", "content differs")
+        else:
+            if not isinstance(value_a, str) or not isinstance(value_b, str):
+                value_a, value_b = json.dumps(value_a, sort_keys=True), json.dumps(value_b, sort_keys=True)
+            results[mime] = compare_text(value_a, value_b)
+    status = _worst(status for status, _ in results.values())
+    details = [f"{mime}: {detail}" for mime, (mime_status, detail) in results.items() if detail and mime_status == status]
+    return status, "; ".join(details) or None
+
+
+def _merge_streams(outputs: list[dict]) -> list[dict]:
+    # How stdout is split into stream outputs depends on timing, not on the results
+    merged = []
+    for output in outputs:
+        previous = merged[-1] if merged else None
+        if (output.get("output_type") == "stream" and previous is not None
+                and previous.get("output_type") == "stream" and previous.get("name") == output.get("name")):
+            merged[-1] = {**previous, "text": previous.get("text", "") + output.get("text", "")}
+        else:
+            merged.append(output)
+    return merged
+
+
+def compare_cell_outputs(outputs_a: list[dict], outputs_b: list[dict]) -> list[dict]:
+    """The outputs of a cell that are not identical between two runs, as {"index", "status", "detail"}."""
+    differences = []
+    for position, (a, b) in enumerate(zip_longest(_merge_streams(outputs_a), _merge_streams(outputs_b))):
+        if a is None or b is None:
+            status, detail = "different", "output missing from the re-run" if b is None else "new output in the re-run"
+        elif output_digest(a) == output_digest(b):
+            continue
+        else:
+            status, detail = compare_outputs(a, b)
+        if status != "identical":
+            differences.append({"index": position, "status": status, "detail": detail})
+    return differences
+
+
+def _compare_cell(index: int, original: dict, executed: dict) -> dict:
+    outputs = compare_cell_outputs(original.get("outputs", []), executed.get("outputs", []))
+    return {"index": index, "status": _worst(output["status"] for output in outputs), "outputs": outputs}
+
+
+def _code_cells(notebook_path: Union[str, Path]) -> Iterator[tuple[int, dict]]:
+    """(notebook cell index, cell) of every code cell, streamed."""
+    for index, cell in enumerate(iter_notebook_cells(notebook_path)):
+        if cell.get("cell_type") == "code":
+            yield index, cell
+
+
+def compare_notebooks(original_path: Union[str, Path], executed_path: Union[str, Path]) -> dict:
+    """
+    Compare the outputs stored in a notebook with those of its re-execution.
+
+    Both notebooks are streamed cell by cell side by side, so only one cell
+    of each is decoded at a time. Code cells are paired in order; markdown
+    and raw cells have no outputs and are skipped, so adding or removing
+    one does not shift the pairing. Cell indexes in the report are those
+    of the original notebook. Outputs whose hashes match are identical
+    and not looked at further; the others are compared by kind (text with
+    volatile fields masked and numbers within tolerance, images by
+    perceptual hash). Code cells that were never run in the original have
+    nothing to compare and are reported as "unrecorded".
+
+    Returns a report with a status per code cell ("identical",
+    "equivalent", "different" or "unrecorded"), counts per status and
+    "reproducible": False if any cell differs, None if nothing was compared.
+    """
+    cells = []
+    pairs = zip_longest(_code_cells(original_path), _code_cells(executed_path), fillvalue=(None, None))
+    for (index, original), (executed_index, executed) in pairs:
+        if original is None or executed is None:
+            cells.append({"index": executed_index if original is None else index, "status": "different", "outputs": [],
+                          "detail": "cell missing from the re-run" if executed is None else "new cell in the re-run"})
+        elif original.get("execution_count") is None and not original.get("outputs"):
+            cells.append({"index": index, "status": "unrecorded", "outputs": []})
+        else:
+            cells.append(_compare_cell(index, original, executed))
+
+    counts = {status: 0 for status in ("identical", "equivalent", "different", "unrecorded")}
+    for cell in cells:
+        counts[cell["status"]] += 1
+    compared = counts["identical"] + counts["equivalent"] + counts["different"]
+    return {
+        "version": OUTPUT_DIFF_VERSION,
+        "notebook": str(original_path),
+        "executed": str(executed_path),
+        "tolerance": {"relative": RELATIVE_TOLERANCE, "absolute": ABSOLUTE_TOLERANCE, "image_hash_distance": IMAGE_HASH_DISTANCE},
+        "reproducible": counts["different"] == 0 if compared else None,
+        "counts": counts,
+        "cells": cells,
+    }
+
+
+def write_output_report(report_path: Path, report: dict) -> Path:
+    """Save the per-cell comparison to generated/reproducibility/<notebook>.json."""
+    report_path = Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    return report_path
+
+
+def print_output_report(report: dict, limit: int = 10):
+    counts = report["counts"]
+    if report["reproducible"] is None:
+        print("[yellow]⚠️ The notebook has no stored outputs to compare the re-run with[/]")
+        return
+    summary = f"{counts['identical']} identical, {counts['equivalent']} equivalent, {counts['different']} different"
+    if report["reproducible"]:
+        print(f"[green]✅ Outputs reproduced ({summary})[/]")
+        return
+    print(f"[red]❌ Outputs differ from the stored ones ({summary})[/]")
+    different = [cell for cell in report["cells"] if cell["status"] == "different"]
+    for cell in different[:limit]:
+        details = cell.get("detail") or "; ".join(
+            f"output {output['index']}: {output['detail']}" for output in cell["outputs"] if output["status"] == "different")
+        print(f"   cell {cell['index']}: {details}")
+    if len(different) > limit:
+        print(f"   ... and {len(different) - limit} more")
@@ -0,0 +1,709 @@
+# repronotebook/checks_pipeline/pipeline.py
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections.abc import Iterable, Sized
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain, islice
+from pathlib import Path
+from rich import print
+from rich.table import Table
+from repronotebook.checks_pipeline.build_cache import BuildCache, pipeline_fingerprint
+from repronotebook.checks_pipeline.notebook_document import load_notebook
+from repronotebook.checks_pipeline.tracing import span
+from repronotebook.checks_pipeline.styling_check.style_engine import (
+    check_style,
+    engine_available,
+    format_issue,
+    write_style_report
+)
+from repronotebook.checks_pipeline.dependency_check.dependency import (
+    extract_imports_from_notebook,
+    check_existing_dependency_file,
+    local_modules,
+    module_search_dirs,
+    generate_requirements,
+    generate_environment_yml
+)
+from repronotebook.checks_pipeline.conda_env.execute_conda import env_prefix, run_notebook_in_env
+from repronotebook.checks_pipeline.conda_env.env_pool import CondaEnvPool
+from repronotebook.checks_pipeline.execution.engine import execute_notebook
+from repronotebook.checks_pipeline.execution.incremental import CellCache
+from repronotebook.checks_pipeline.execution.kernel_pool import env_python, has_ipykernel
+from repronotebook.checks_pipeline.execution.profiling import write_profile
+from repronotebook.checks_pipeline.output_check.output_diff import (
+    OUTPUT_DIFF_VERSION,
+    compare_notebooks,
+    print_output_report,
+    write_output_report
+)
+from repronotebook.ro_crate_library.library_rocrate import generate_ro_crate_from_manifest
+from repronotebook.ro_crate_library.externalize import BLOBS_DIR, EXTERNALIZE_MIN_SIZE, externalize_notebook
+from repronotebook.push_to_zenodo.postprocessing import zip_ro_crate, generate_zenodo_metadata
+from repronotebook.push_to_zenodo.zenodo_upload import upload_ro_crate_to_zenodo
+from repronotebook.push_to_zenodo.upload_scheduler import schedule_uploads
+from repronotebook.push_to_zenodo.deposition_sync import sync_crate_to_zenodo
+
+
+def determine_output_root(notebooks: list[Path]) -> Path:
+    """Pick the directory that holds generated/ for a batch of notebooks."""
+    first_notebook = notebooks[0]
+    # If notebook is in subdirectory (like test_pipeline/), use parent as output root
+    if first_notebook.parent.name != first_notebook.parent.parent.name:
+        return first_notebook.parent.parent
+    return first_notebook.parent
+
+
+def notebook_key(nb: Path, output_root: Path) -> str:
+    """
+    Name of a notebook's files under generated/, unique within output_root.
+
+    Notebooks directly in output_root keep their stem; others get a short hash
+    of their relative path appended, so a/analysis.ipynb and b/analysis.ipynb
+    never share generated files.
+    """
+    nb, output_root = Path(nb).resolve(), Path(output_root).resolve()
+    relative = nb.relative_to(output_root) if nb.is_relative_to(output_root) else nb
+    if relative.parent == Path("."):
+        return nb.stem
+    return f"{nb.stem}-{hashlib.sha256(relative.as_posix().encode()).hexdigest()[:8]}"
+
+
+def prepare_output_dirs(output_root: Path, notebook_key: str = None) -> dict[str, Path]:
+    """
+    Create the organized generated/ structure and return its directories.
+
+    When notebook_key is given, the directories whose files have fixed names
+    (dependencies, conda execution logs) get a per-notebook subfolder so
+    concurrent workers never write to the same files. Everything else is
+    named after the notebook's key.
+    """
+    generated_dir = output_root / "generated"
+    dirs = {
+        "generated": generated_dir,
+        "dependencies": generated_dir / "dependencies",
+        "style_reports": generated_dir / "style_reports",
+        "conda_execution": generated_dir / "conda_execution",
+        "executed": generated_dir / "executed",
+        "profiles": generated_dir / "profiles",
+        "reproducibility": generated_dir / "reproducibility",
+        "externalized": generated_dir / "externalized",
+        "blobs": generated_dir / "blobs",
+        "ro_crates": generated_dir / "ro_crates",
+        "zenodo": generated_dir / "zenodo",
+    }
+    if notebook_key is not None:
+        dirs["dependencies"] = dirs["dependencies"] / notebook_key
+        dirs["conda_execution"] = dirs["conda_execution"] / notebook_key
+
+    for name, dir_path in dirs.items():
+        if name != "generated":
+            dir_path.mkdir(parents=True, exist_ok=True)
+    return dirs
+
+
+def _style_cache_dir(output_root: Path) -> Path:
+    # Per-cell lint results are keyed by source and linter versions, so they
+    # are shared by all notebooks and never go stale (even with --force)
+    return output_root / "generated" / "cache" / "style"
+
+
+def _cell_cache_dir(output_root: Path, notebook_key: str) -> Path:
+    # Per-cell outputs and kernel checkpoints of --incremental runs
+    return output_root / "generated" / "cache" / "cells" / notebook_key
+
+
+def process_notebook(
+    nb: Path,
+    output_root: Path,
+    author: str = "Unknown",
+    fail_on_style: bool = False,
+    use_conda: bool = False,
+    conda_pool_size: int = None,
+    conda_pool_disk_gb: float = None,
+    engine: str = "nbclient",
+    cell_timeout: float = None,
+    notebook_timeout: float = None,
+    kernel_reset: str = "restart",
+    prewarm_kernels: bool = False,
+    profile: bool = False,
+    embed_timings: bool = False,
+    incremental: bool = False,
+    full: bool = False,
+    generate_rocrate: bool = False,
+    externalize_outputs: bool = False,
+    externalize_min_size: int = EXTERNALIZE_MIN_SIZE,
+    upload: bool = False,
+    zenodo_token: str = None,
+    zenodo_url: str = None,
+    sync: bool = False,
+    deposition_id: str = None,
+    sandbox: bool = False,
+    isolate_outputs: bool = False,
+    force: bool = False,
+    defer_upload: bool = False,
+) -> dict:
+    """
+    Run every pipeline stage for a single notebook.
+
+    Returns a result dictionary used for the end-of-run summary. With
+    isolate_outputs=True all intermediate files (dependency files, Conda
+    execution logs) are private to this notebook, which makes the function
+    safe to run in parallel worker processes. Stages whose inputs are
+    unchanged since the last run are skipped unless force=True. With
+    incremental=True only the cells from the first changed one onwards are
+    executed (full=True runs every cell and checks the cached ones).
+    kernel_reset picks how a pooled kernel is cleaned up between notebooks
+    ("restart", or "reset" to keep imported modules), and prewarm_kernels
+    starts the next notebook's kernel while this one runs. With
+    defer_upload=True the ZIP and Zenodo metadata are prepared but the upload
+    is returned as result["upload_job"] for run_pipeline to schedule.
+    """
+    started = time.perf_counter()
+    nb = Path(nb).resolve()  # Convert to absolute path
+    result = {
+        "notebook": str(nb),
+        "status": "ok",
+        "style_issues": 0,
+        "executed": None,
+        "crate": None,
+        "deposition_id": None,
+        "profile_path": None,
+        "reproduced": None,
+    }
+
+    key = notebook_key(nb, output_root)
+    dirs = prepare_output_dirs(output_root, key if isolate_outputs else None)
+    dependencies_dir = dirs["dependencies"]
+    conda_execution_dir = dirs["conda_execution"]
+    ro_crates_dir = dirs["ro_crates"]
+    zenodo_dir = dirs["zenodo"]
+    cache = BuildCache(dirs["generated"] / "cache" / f"{key}.json", force=force)
+    fingerprint = pipeline_fingerprint()
+
+    # Notebooks outside the working directory (e.g. `watch ~/project`) keep their absolute path
+    relative_name = nb.relative_to(Path.cwd()) if nb.is_relative_to(Path.cwd()) else nb
+    print(f"\n[bold cyan]🔍 Processing:[/] {relative_name}")
+
+    # Parse the notebook once; every stage below shares this document
+    doc = load_notebook(nb)
+    # Style and dependency results only depend on the code, not on outputs
+    sources_digest = cache.digest([source for _, source in doc.code_cells()], fingerprint)
+
+    # Style check
+    print(f"[bold]🎨 Checking code style with {'pyflakes/pycodestyle' if engine_available() else 'flakenb'}...[/]")
+    style_report = dirs["style_reports"] / f"{key}.json"
+    with span("style", notebook=nb.name) as s:
+        cached = cache.lookup("style", sources_digest)
+        if cached is not None and style_report.exists():
+            style_issues = cached["issues"]
+            print("[blue]♻️ Code unchanged, reusing previous style results[/]")
+        else:
+            style_issues = check_style(doc, _style_cache_dir(output_root))
+            write_style_report(style_report, nb, style_issues)
+            cache.record("style", sources_digest, outputs=[style_report], data={"issues": style_issues})
+        s.set(cached=cached is not None, issues=len(style_issues))
+    result["style_issues"] = len(style_issues)
+    if style_issues:
+        print(f"[yellow]⚠️ {len(style_issues)} style issue(s) found in {nb.name}:[/]")
+        for issue in style_issues:
+            print("  ", format_issue(nb.name, issue))
+
+        if fail_on_style:
+            print("[red]❌ Aborting due to style issues (use --fail-on-style to disable this check).[/]")
+            result["status"] = "style_failed"
+            return _finish(result, cache, started)
+    else:
+        print("[green]✅ No PEP8 style issues detected[/]")
+
+    # Dependency files
+    req_path = dependencies_dir / "requirements.txt"
+    env_path = dependencies_dir / "environment.yml"
+    notebook_req_path = nb.parent / "requirements.txt"  # Check if exists in notebook dir
+    notebook_env_path = nb.parent / "environment.yml"  # Check if exists in notebook dir
+    dependencies_digest = cache.digest(sources_digest, notebook_req_path, notebook_env_path)
+    with span("dependencies", notebook=nb.name) as s:
+        cached = cache.lookup("dependencies", dependencies_digest)
+        if cached is not None:
+            print("[blue]♻️ Code unchanged, reusing previous dependency files[/]")
+            for filename, missing in cached["missing"].items():
+                print(f"[yellow]⚠️ {filename} exists but is missing: {missing}[/]")
+        else:
+            missing = _generate_dependency_files(doc, dependencies_dir)
+            cache.record("dependencies", dependencies_digest, outputs=[req_path, env_path], data={"missing": missing})
+        s.set(cached=cached is not None)
+
+    # Handle running in a conda environment.
+    # Envs are named after the hash of environment.yml, so notebooks with the
+    # same dependencies share one env and parallel workers never race.
+    # The executed notebook goes to generated/executed/, the source is untouched.
+    executed_path = dirs["executed"] / f"{key}.ipynb"
+    if use_conda:
+        print("[bold]📦 Running in Conda environment...[/]")
+        # Use environment.yml from organized location
+        env_yml_path = dependencies_dir / "environment.yml"
+        execution_log = conda_execution_dir / "execution_log.txt"
+        result["executed"] = False
+        profile_path = dirs["profiles"] / f"{key}.json"
+        # Helper modules the notebook imports from the project are part of the code that runs
+        modules = local_modules(doc, module_search_dirs(nb, output_root))
+        execute_digest = cache.digest(sources_digest, env_yml_path, *modules, engine, profile, embed_timings)
+        with span("execute", notebook=nb.name, engine=engine) as s:
+            # A full run exists to re-check earlier results, so it never skips
+            if not full and cache.lookup("execute", execute_digest) is not None:
+                print("[blue]♻️ Code and environment unchanged, skipping execution[/]")
+                result["executed"] = True
+                if profile and profile_path.exists():
+                    result["profile_path"] = str(profile_path)
+            elif env_yml_path.exists():
+                pool = CondaEnvPool(max_envs=conda_pool_size, max_disk_gb=conda_pool_disk_gb)
+                env_name = pool.acquire(env_yml_path)
+                if env_name:
+                    try:
+                        # Log execution to organized location
+                        with open(execution_log, 'w') as f:
+                            f.write(f"Executed notebook: {nb.name}\n")
+                            f.write(f"Environment: {env_name}\n")
+                            f.write(f"Engine: {engine}\n")
+                        cell_cache = None
+                        if incremental or full:
+                            cell_cache = CellCache(_cell_cache_dir(output_root, key),
+                                                   seed=cache.digest(env_yml_path, *modules), full=full)
+                        execution = _execute_in_env(
+                            doc, env_name, executed_path, engine, cell_timeout, notebook_timeout,
+                            kernel_reset=kernel_reset, prewarm_kernels=prewarm_kernels,
+                            profile=profile, embed_timings=embed_timings, cell_cache=cell_cache,
+                        )
+                    finally:
+                        pool.release(env_name)
+                    result["executed"] = execution["success"]
+                    outputs = [execution_log, executed_path]
+                    if profile and execution.get("profile") is not None:
+                        result["profile_path"] = str(write_profile(profile_path, nb, execution["profile"]))
+                        outputs.append(profile_path)
+                    # Only successful runs are worth skipping next time
+                    if result["executed"]:
+                        cache.record("execute", execute_digest, outputs=outputs)
+            else:
+                print("[red]❌ environment.yml not found. Cannot execute in Conda environment.[/]")
+            s.set(executed=result["executed"])
+
+        # Compare the re-executed outputs with the ones stored in the notebook
+        if result["executed"] and executed_path.exists():
+            report_path = dirs["reproducibility"] / f"{key}.json"
+            compare_digest = cache.digest(nb, executed_path, OUTPUT_DIFF_VERSION)
+            with span("compare outputs", notebook=nb.name) as s:
+                if cache.lookup("compare", compare_digest) is not None:
+                    print("[blue]♻️ Outputs unchanged, reusing previous comparison[/]")
+                    with open(report_path, "r") as f:
+                        report = json.load(f)
+                else:
+                    report = compare_notebooks(nb, executed_path)
+                    write_output_report(report_path, report)
+                    cache.record("compare", compare_digest, outputs=[report_path])
+                print_output_report(report)
+                result["reproduced"] = report["reproducible"]
+                s.set(reproducible=report["reproducible"])
+
+    # Generate RO-Crate if requested
+    crate_folder = None
+    if generate_rocrate:
+        print("[bold]📦 Generating RO-Crate...[/]")
+
+        # Generate RO-Crate in organized location
+        crate_name = f"{key}-ro-crate"
+        crate_folder = ro_crates_dir / crate_name
+        # Package the executed notebook when there is one, like the old in-place run did
+        crate_notebook = executed_path if result["executed"] and executed_path.exists() else nb
+        crate_digest = cache.digest(crate_notebook, req_path, env_path, author, fingerprint,
+                                    externalize_min_size if externalize_outputs else None)
+
+        with span("crate", notebook=nb.name):
+            if cache.lookup("crate", crate_digest) is not None:
+                print(f"[blue]♻️ Inputs unchanged, reusing RO-Crate at: {crate_folder}[/]")
+            else:
+                manifest = _crate_manifest(nb.name, crate_notebook, dependencies_dir)
+                file_properties = {}
+                if externalize_outputs:
+                    # Large outputs go to a content-addressed store shared by all notebooks,
+                    # and are linked into the crate next to the slimmed-down notebook
+                    with span("externalize", notebook=nb.name) as s:
+                        slim_notebook = dirs["externalized"] / f"{key}.ipynb"
+                        blobs = externalize_notebook(crate_notebook, slim_notebook, dirs["blobs"], min_size=externalize_min_size)
+                        manifest[nb.name] = slim_notebook
+                        for name, blob in blobs.items():
+                            manifest[f"{BLOBS_DIR}/{name}"] = dirs["blobs"] / name
+                            file_properties[f"{BLOBS_DIR}/{name}"] = _blob_properties(nb.name, blob)
+                        s.set(blobs=len(blobs), bytes=sum(blob["size"] for blob in blobs.values()))
+                    if blobs:
+                        print(f"[green]✅ Moved {len(blobs)} large output(s) to {BLOBS_DIR}/[/]")
+                generate_ro_crate_from_manifest(
+                    manifest, crate_folder, author, metadata_folder=nb.parent, file_properties=file_properties
+                )
+                cache.record("crate", crate_digest, outputs=[crate_folder])
+                print(f"[green]✅ RO-Crate generated at: {crate_folder}[/]")
+        result["crate"] = str(crate_folder)
+
+    # Upload to Zenodo if requested
+    if upload and crate_folder and crate_folder.exists():
+        print("[bold]☁️ Uploading RO-Crate to Zenodo...[/]")
+        try:
+            # Sync uploads the crate's files individually; otherwise one ZIP
+            zip_path = None
+            if not sync:
+                # Create ZIP archive in organized location
+                zip_filename = f"{key}-ro-crate.zip"
+                zip_path = ro_crates_dir / zip_filename
+                zip_digest = cache.digest(crate_folder)
+                with span("zip", notebook=nb.name):
+                    if cache.lookup("zip", zip_digest) is not None:
+                        print(f"[blue]♻️ RO-Crate unchanged, reusing ZIP at: {zip_path}[/]")
+                    else:
+                        zip_path = zip_ro_crate(crate_folder, output_path=zip_path)
+                        cache.record("zip", zip_digest, outputs=[zip_path])
+
+            # Generate Zenodo metadata in organized location (unique per notebook)
+            title = f"RO-Crate for {nb.stem}"
+            description = f"Reproducible research package containing Jupyter notebook '{nb.name}' with dependencies and environment specifications."
+            zenodo_metadata_path = zenodo_dir / f"zenodo_metadata_{key}.json"
+            zenodo_metadata_path = generate_zenodo_metadata(crate_folder, title, description, author, output_path=zenodo_metadata_path)
+
+            state_name = "sync_state" if sync else "upload_state"
+            upload_state_path = zenodo_dir / f"{state_name}_{key}.json"
+            upload_results_path = zenodo_dir / f"upload_results_{key}.json"
+            if defer_upload:
+                result["upload_job"] = {
+                    "notebook": str(nb),
+                    "zip_path": str(zip_path) if zip_path else None,
+                    "crate_folder": str(crate_folder),
+                    "sync": sync,
+                    "deposition_id": deposition_id,
+                    "metadata_path": str(zenodo_metadata_path),
+                    "state_path": str(upload_state_path),
+                    "results_path": str(upload_results_path),
+                }
+                print("[blue]ℹ️ RO-Crate queued for upload[/]")
+                return _finish(result, cache, started)
+
+            # Read metadata for upload
+            with open(zenodo_metadata_path, 'r') as f:
+                zenodo_metadata = json.load(f)
+
+            # Upload to Zenodo
+            with span("upload", notebook=nb.name, sync=sync):
+                if sync:
+                    upload_result = sync_crate_to_zenodo(
+                        crate_folder,
+                        zenodo_metadata,
+                        access_token=zenodo_token,
+                        sandbox=sandbox,
+                        deposition_id=deposition_id,
+                        publish=False,
+                        base_url=zenodo_url,
+                        state_path=upload_state_path,
+                    )
+                else:
+                    upload_result = upload_ro_crate_to_zenodo(
+                        crate_zip_path=zip_path,
+                        zenodo_metadata=zenodo_metadata,
+                        access_token=zenodo_token,  # Pass CLI token
+                        sandbox=sandbox,  # Use CLI flag
+                        publish=False,  # Manual review before publishing
+                        base_url=zenodo_url,
+                        state_path=upload_state_path,  # Lets an interrupted upload resume
+                    )
+
+            # Save upload results (unique per notebook)
+            with open(upload_results_path, 'w') as f:
+                json.dump(upload_result, f, indent=2)
+
+            result["deposition_id"] = upload_result["deposition_id"]
+            print(f"[green]✅ Upload complete! Deposition ID: {upload_result['deposition_id']}[/]")
+            print(f"[green]✅ Results saved to: {upload_results_path}[/]")
+
+        except Exception as e:
+            result["status"] = "upload_failed"
+            print(f"[red]❌ Zenodo upload failed: {str(e)}[/]")
+            print("[yellow]💡 Make sure ZENODO_TOKEN environment variable is set[/]")
+    elif upload and not generate_rocrate:
+        print("[red]❌ Cannot upload without RO-Crate. Use --generate-rocrate flag[/]")
+    elif upload and not (crate_folder and crate_folder.exists()):
+        print("[red]❌ RO-Crate folder not found for upload[/]")
+
+    return _finish(result, cache, started)
+
+
+def _execute_in_env(doc, env_name: str, executed_path: Path, engine: str,
+                    cell_timeout: float = None, notebook_timeout: float = None,
+                    kernel_reset: str = "restart", prewarm_kernels: bool = False,
+                    profile: bool = False, embed_timings: bool = False, cell_cache: CellCache = None) -> dict:
+    """Run a notebook in a Conda env with the selected engine."""
+    if engine == "nbconvert":
+        if profile or embed_timings:
+            print("[yellow]⚠️ Cell profiling needs the nbclient engine; running without it[/]")
+        if cell_cache is not None:
+            print("[yellow]⚠️ Incremental execution needs the nbclient engine; running every cell[/]")
+        return {"success": run_notebook_in_env(doc.path, env_name, output_path=executed_path)}
+
+    prefix = env_prefix(env_name)
+    if prefix is None or not has_ipykernel(prefix):
+        print(f"[red]❌ ipykernel is not installed in Conda environment '{env_name}'[/]")
+        print("[yellow]💡 Tip: add ipykernel to environment.yml, or use --engine nbconvert[/]")
+        return {"success": False}
+    return execute_notebook(
+        doc,
+        executed_path,
+        python=env_python(prefix),
+        cell_timeout=cell_timeout,
+        notebook_timeout=notebook_timeout,
+        reset_mode=kernel_reset,
+        prewarm=prewarm_kernels,
+        profile=profile,
+        embed_timings=embed_timings,
+        cell_cache=cell_cache,
+    )
+
+
+def _finish(result: dict, cache: BuildCache, started: float) -> dict:
+    cache.save()
+    result["cache_hits"] = cache.hits
+    result["cache_misses"] = cache.misses
+    result["duration"] = time.perf_counter() - started
+    return result
+
+
+def _generate_dependency_files(doc, dependencies_dir: Path) -> dict[str, list[str]]:
+    """
+    Write requirements.txt and environment.yml for a notebook.
+
+    Existing files next to the notebook are copied when they cover every
+    import. Returns the imports missing from those files, keyed by filename.
+    """
+    nb = doc.path
+    notebook_imports = extract_imports_from_notebook(doc)
+    generators = {
+        "requirements.txt": generate_requirements,
+        "environment.yml": generate_environment_yml,
+    }
+    missing_by_file = {}
+    for filename, generate in generators.items():
+        out_path = dependencies_dir / filename
+        notebook_dep_path = nb.parent / filename
+
+        if notebook_dep_path.exists():
+            all_present, missing = check_existing_dependency_file(notebook_dep_path, notebook_imports)
+            if all_present:
+                print(f"[green]✅ All notebook imports are already in {filename}[/]")
+                # Copy to organized location
+                shutil.copy2(notebook_dep_path, out_path)
+            else:
+                print(f"[yellow]⚠️ {filename} exists but is missing: {missing}[/]")
+                missing_by_file[filename] = missing
+        else:
+            if generate(doc, dependencies_dir, overwrite=True):
+                print(f"[green]✅ {filename} generated at: {out_path}[/]")
+    return missing_by_file
+
+
+def _crate_manifest(notebook_name: str, crate_notebook: Path, dependencies_dir: Path) -> dict[str, Path]:
+    """Crate-relative path -> source file for everything packaged with a notebook."""
+    manifest = {notebook_name: crate_notebook}
+    for filename in ("requirements.txt", "environment.yml"):
+        if (dependencies_dir / filename).exists():
+            manifest[filename] = dependencies_dir / filename
+    return manifest
+
+
+def _blob_properties(notebook_name: str, blob: dict) -> dict:
+    """RO-Crate File properties of an output extracted from a notebook."""
+    return {
+        "name": f"Output of {notebook_name}",
+        "description": f"Cell output extracted from {notebook_name}, restored into it by "
+                       f"`python -m repronotebook.ro_crate_library.externalize {notebook_name}`",
+        "encodingFormat": blob["mime"],
+        "contentSize": str(blob["size"]),
+        "sha256": blob["sha256"],
+        "isPartOf": {"@id": notebook_name},
+    }
+
+
+def _process_traced(nb: Path, output_root: Path, **options) -> dict:
+    """process_notebook() inside a span covering the whole notebook."""
+    with span("notebook", notebook=Path(nb).name) as s:
+        result = process_notebook(nb, output_root, **options)
+        s.set(status=result["status"])
+        return result
+
+
+def _error_result(nb: Path, error: BaseException) -> dict:
+    return {
+        "notebook": str(Path(nb).resolve()),
+        "status": "error",
+        "error": str(error),
+        "style_issues": 0,
+        "executed": None,
+        "crate": None,
+        "deposition_id": None,
+        "profile_path": None,
+        "reproduced": None,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "duration": 0.0,
+    }
+
+
+def run_pipeline(notebooks: Iterable[Path], output_root: Path, jobs: int = 1, upload_concurrency: int = 4, **options) -> list[dict]:
+    """
+    Process notebooks serially (jobs=1) or in a pool of worker processes.
+
+    notebooks may be a list or a stream such as iter_notebooks(); notebooks
+    from a stream start processing while the rest are still being found.
+    jobs=0 uses one worker per CPU core. When more than one notebook is
+    processed every notebook gets isolated output paths, so parallel workers
+    never share files and one notebook's dependency files never invalidate
+    another's cache entries. A style failure with fail_on_style stops the run:
+    no further notebooks are started and pending ones are cancelled.
+
+    With upload and several notebooks, the Zenodo uploads are collected and
+    run afterwards by the upload scheduler, upload_concurrency at a time.
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    # Whether outputs must be isolated is known as soon as a second notebook turns up
+    stream = iter(notebooks)
+    first = list(islice(stream, 2))
+    if isinstance(notebooks, Sized):
+        jobs = min(jobs, len(notebooks))
+    elif len(first) < 2:
+        jobs = 1
+    jobs = max(1, jobs)
+    isolate_outputs = len(first) > 1
+    fail_on_style = options.get("fail_on_style", False)
+    options["defer_upload"] = options.get("upload", False) and isolate_outputs
+    # With more notebooks to come, start each one's kernel while the previous one runs
+    options.setdefault("prewarm_kernels", isolate_outputs)
+    results = []
+
+    if jobs == 1:
+        for nb in chain(first, stream):
+            try:
+                result = _process_traced(nb, output_root, isolate_outputs=isolate_outputs, **options)
+            except Exception as e:
+                print(f"[red]❌ Pipeline failed for {Path(nb).name}:[/] {e}")
+                result = _error_result(nb, e)
+            results.append(result)
+            if fail_on_style and result["status"] == "style_failed":
+                break
+        return _run_uploads(results, output_root, upload_concurrency, options)
+
+    print(f"[bold cyan]🚀 Processing notebooks with {jobs} workers[/]")
+    discovered, futures = [], {}
+    stopped = False
+
+    def collect(block: bool):
+        nonlocal stopped
+        done, _ = wait(futures, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+        for future in done:
+            nb = futures.pop(future)
+            if future.cancelled():
+                continue
+            try:
+                result = future.result()
+            except Exception as e:
+                print(f"[red]❌ Pipeline failed for {Path(nb).name}:[/] {e}")
+                result = _error_result(nb, e)
+            results.append(result)
+            if fail_on_style and result["status"] == "style_failed" and not stopped:
+                stopped = True
+                for pending in futures:
+                    pending.cancel()
+
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        for nb in chain(first, stream):
+            if stopped:
+                break
+            discovered.append(nb)
+            futures[executor.submit(_process_traced, nb, output_root, isolate_outputs=True, **options)] = nb
+            # A short queue per worker is enough to keep them busy, and keeps a
+            # fail_on_style stop from leaving a long backlog behind
+            collect(block=len(futures) >= jobs * 2)
+        while futures:
+            collect(block=True)
+
+    # Keep the summary in discovery order rather than completion order
+    order = {str(Path(nb).resolve()): i for i, nb in enumerate(discovered)}
+    results.sort(key=lambda r: order.get(r["notebook"], len(order)))
+    return _run_uploads(results, output_root, upload_concurrency, options)
+
+
+def _run_uploads(results: list[dict], output_root: Path, concurrency: int, options: dict) -> list[dict]:
+    """Run the uploads deferred by process_notebook and record their outcome."""
+    upload_jobs = [r.pop("upload_job") for r in results if r.get("upload_job")]
+    if not upload_jobs:
+        return results
+
+    outcomes = schedule_uploads(
+        upload_jobs,
+        output_root / "generated" / "zenodo",
+        access_token=options.get("zenodo_token"),
+        sandbox=options.get("sandbox", False),
+        base_url=options.get("zenodo_url"),
+        concurrency=concurrency,
+    )
+    for result in results:
+        outcome = outcomes.get(result["notebook"])
+        if outcome is None:
+            continue
+        result["deposition_id"] = outcome.get("deposition_id")
+        if outcome.get("status") != "done":
+            result["status"] = "upload_failed"
+    return results
+
+
+def print_summary(results: list[dict], elapsed: float, jobs: int = 1):
+    """Print an aggregated end-of-run summary table."""
+    if not results:
+        return
+
+    table = Table(title="Pipeline summary")
+    table.add_column("Notebook")
+    table.add_column("Status")
+    table.add_column("Style issues", justify="right")
+    table.add_column("Executed")
+    table.add_column("Outputs")
+    table.add_column("RO-Crate")
+    table.add_column("Deposition")
+    table.add_column("Time (s)", justify="right")
+
+    status_colors = {"ok": "green", "style_failed": "yellow"}
+    for r in results:
+        color = status_colors.get(r["status"], "red")
+        executed = "-" if r["executed"] is None else ("yes" if r["executed"] else "no")
+        reproduced = {True: "[green]match[/]", False: "[red]differ[/]"}.get(r.get("reproduced"), "-")
+        table.add_row(
+            Path(r["notebook"]).name,
+            f"[{color}]{r['status']}[/]",
+            str(r["style_issues"]),
+            executed,
+            reproduced,
+            "yes" if r["crate"] else "-",
+            r["deposition_id"] or "-",
+            f"{r['duration']:.1f}",
+        )
+    print(table)
+
+    ok = sum(1 for r in results if r["status"] == "ok")
+    busy = sum(r["duration"] for r in results)
+    print(f"[bold]📊 {ok}/{len(results)} notebooks passed in {elapsed:.1f}s "
+          f"(jobs={jobs}, {busy:.1f}s of notebook work)[/]")
+
+
+def print_cache_report(results: list[dict]):
+    """Print how many stages were reused from the build cache."""
+    hits = sum(r.get("cache_hits", 0) for r in results)
+    misses = sum(r.get("cache_misses", 0) for r in results)
+    if hits + misses:
+        print(f"[bold]♻️ Build cache: {hits} stage(s) reused, {misses} stage(s) rebuilt[/]")
@@ -0,0 +1,217 @@
+# repronotebook/checks_pipeline/preflight.py
+
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+from repronotebook.checks_pipeline.build_cache import USER_CACHE_DIR, tool_version
+from repronotebook.checks_pipeline import tracing
+
+PREFLIGHT_PATH = USER_CACHE_DIR / "preflight.json"
+PREFLIGHT_TTL = float(os.environ.get("REPRONOTEBOOK_PREFLIGHT_TTL", 3600))
+
+# Executables the pipeline may shell out to, and the Python distribution
+# that reports their version (None = read it some other way).
+TOOLS = {
+    "flakenb": "flakenb",
+    "jupyter": "jupyter_core",
+    "conda": None,
+}
+
+_preflight = None
+
+
+def conda_root() -> Optional[Path]:
+    """Locate the Conda installation without starting conda itself."""
+    conda_exe = os.environ.get("CONDA_EXE") or shutil.which("conda")
+    if not conda_exe:
+        return None
+    # <root>/bin/conda or <root>/condabin/conda (Scripts\conda.exe on Windows)
+    return Path(conda_exe).resolve().parent.parent
+
+
+def _conda_envs_txt() -> Path:
+    return Path.home() / ".conda" / "environments.txt"
+
+
+def _probe_conda_envs(root: Optional[Path]) -> Optional[dict[str, str]]:
+    """
+    Map Conda env names to prefixes by reading conda's own bookkeeping.
+
+    Uses ~/.conda/environments.txt plus the envs/ folder of the installation.
+    Returns None when no Conda installation can be found.
+    """
+    if root is None:
+        return None
+    prefixes = set()
+    if (root / "conda-meta").is_dir():
+        prefixes.add(root)
+    envs_dir = root / "envs"
+    if envs_dir.is_dir():
+        prefixes.update(p for p in envs_dir.iterdir() if p.is_dir())
+    envs_txt = _conda_envs_txt()
+    if envs_txt.exists():
+        for line in envs_txt.read_text().splitlines():
+            line = line.strip()
+            if line and Path(line).is_dir():
+                prefixes.add(Path(line))
+
+    envs = {}
+    for prefix in prefixes:
+        name = "base" if prefix == root else prefix.name
+        envs.setdefault(name, str(prefix))
+    return envs
+
+
+def _probe_kernelspecs() -> dict[str, str]:
+    """Map installed Jupyter kernel names to their resource directories."""
+    try:
+        from jupyter_client.kernelspec import KernelSpecManager
+        return dict(KernelSpecManager().find_kernel_specs())
+    except ImportError:
+        pass
+    try:
+        result = tracing.run(
+            ["jupyter", "kernelspec", "list", "--json"],
+            capture_output=True,
+            text=True,
+            check=True
+        )
+        specs = json.loads(result.stdout).get("kernelspecs", {})
+        return {name: spec.get("resource_dir", "") for name, spec in specs.items()}
+    except Exception:
+        return {}
+
+
+def _conda_version(root: Optional[Path]) -> Optional[str]:
+    if root is None:
+        return None
+    # conda-meta/conda-<version>-<build>.json
+    for meta in sorted((root / "conda-meta").glob("conda-[0-9]*.json")):
+        return meta.name[len("conda-"):].split("-")[0]
+    return None
+
+
+def _probe_tools(root: Optional[Path]) -> dict[str, dict]:
+    tools = {}
+    for tool, distribution in TOOLS.items():
+        path = shutil.which(tool)
+        if tool == "conda":
+            version = _conda_version(root)
+        else:
+            version = tool_version(distribution)
+            version = None if version == "missing" else version
+        tools[tool] = {"path": path, "version": version}
+    return tools
+
+
+def _kernelspec_dirs() -> list[Path]:
+    """Folders Jupyter looks for kernelspecs in; installing a kernel adds a subfolder."""
+    try:
+        from jupyter_core.paths import jupyter_path
+    except ImportError:
+        return []
+    return [Path(p) for p in jupyter_path("kernels")]
+
+
+def _fingerprint() -> str:
+    """Cheap stat-based key that changes when PATH, kernels or Conda envs change."""
+    digest = hashlib.sha256(os.environ.get("PATH", "").encode())
+    root = conda_root()
+    watched = [_conda_envs_txt(), *_kernelspec_dirs()]
+    if root is not None:
+        watched.append(root / "envs")
+    for path in watched:
+        try:
+            digest.update(f"{path}:{path.stat().st_mtime_ns}".encode())
+        except OSError:
+            digest.update(f"{path}:-".encode())
+    return digest.hexdigest()[:16]
+
+
+def probe_environment() -> dict:
+    """Collect kernelspecs, Conda envs and tool availability in one pass."""
+    root = conda_root()
+    return {
+        "created": time.time(),
+        "fingerprint": _fingerprint(),
+        "conda_root": str(root) if root else None,
+        "conda_envs": _probe_conda_envs(root),
+        "kernelspecs": _probe_kernelspecs(),
+        "tools": _probe_tools(root),
+    }
+
+
+def get_preflight(refresh: bool = False) -> dict:
+    """
+    Return the environment probe, reusing it for the rest of the run.
+
+    The probe is also persisted in the user cache dir and reused by later
+    runs (and by worker processes) until it is older than PREFLIGHT_TTL
+    seconds or PATH / the Conda env list has changed.
+    """
+    global _preflight
+    if _preflight is not None and not refresh:
+        return _preflight
+
+    if not refresh and PREFLIGHT_PATH.exists():
+        try:
+            with open(PREFLIGHT_PATH, "r") as f:
+                cached = json.load(f)
+            if time.time() - cached["created"] < PREFLIGHT_TTL and cached["fingerprint"] == _fingerprint():
+                _preflight = cached
+                return _preflight
+        except (OSError, ValueError, KeyError):
+            pass
+
+    _preflight = probe_environment()
+    _persist(_preflight)
+    return _preflight
+
+
+def _persist(preflight: dict):
+    try:
+        PREFLIGHT_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = PREFLIGHT_PATH.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(preflight, f, indent=2)
+        os.replace(tmp_path, PREFLIGHT_PATH)
+    except OSError:
+        pass  # The persisted probe is an optimization only
+
+
+def invalidate_preflight():
+    """Forget the probe, e.g. after installing a kernel or a tool."""
+    global _preflight
+    _preflight = None
+    try:
+        PREFLIGHT_PATH.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def tool_available(tool: str) -> bool:
+    return get_preflight()["tools"].get(tool, {}).get("path") is not None
+
+
+def kernel_installed(kernel_name: str) -> bool:
+    return kernel_name in get_preflight()["kernelspecs"]
+
+
+def conda_envs(refresh: bool = False) -> Optional[dict[str, str]]:
+    """
+    Conda env name -> prefix, or None if Conda could not be located.
+
+    With refresh=True the env list is read again from Conda's bookkeeping
+    (a few stat calls, no conda process) and the probe is updated, e.g.
+    after another worker may have created an env.
+    """
+    preflight = get_preflight()
+    if refresh:
+        preflight["conda_envs"] = _probe_conda_envs(conda_root())
+        preflight["fingerprint"] = _fingerprint()
+        _persist(preflight)
+    return preflight["conda_envs"]
@@ -0,0 +1,349 @@
+# repronotebook/checks_pipeline/styling_check/style_engine.py
+
+import ast
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+from repronotebook.checks_pipeline.build_cache import tool_version
+from repronotebook.checks_pipeline.notebook_document import NotebookDocument, as_document, strip_magics
+from repronotebook.checks_pipeline.styling_check.styling import run_flakenb
+
+try:
+    import pycodestyle
+    from pyflakes import checker as pyflakes_checker
+    from pyflakes import messages as pyflakes_messages
+except ImportError:  # Fall back to one flakenb process per notebook
+    pycodestyle = None
+    pyflakes_checker = None
+    pyflakes_messages = None
+
+STYLE_ENGINE_VERSION = 2
+MAX_LINE_LENGTH = 79
+# Cell-level noise: a cell never ends with a newline, and blank lines
+# around definitions are judged per cell rather than per file.
+IGNORED_CODES = ("W291", "W292", "W293", "W391", "E301", "E302", "E303", "E305", "E402")
+# Names IPython puts in every kernel's namespace
+IPYTHON_BUILTINS = (
+    "display", "get_ipython", "In", "Out", "exit", "quit",
+    "_", "__", "___", "_i", "_ii", "_iii", "_ih", "_oh", "_dh",
+)
+
+# Same codes flake8 (and therefore flakenb) reports for pyflakes messages
+PYFLAKES_CODES = {
+    "UnusedImport": "F401",
+    "ImportShadowedByLoopVar": "F402",
+    "ImportStarUsed": "F403",
+    "LateFutureImport": "F404",
+    "ImportStarUsage": "F405",
+    "ImportStarNotPermitted": "F406",
+    "FutureFeatureNotDefined": "F407",
+    "MultiValueRepeatedKeyLiteral": "F601",
+    "MultiValueRepeatedKeyVariable": "F602",
+    "TooManyExpressionsInStarredAssignment": "F621",
+    "TwoStarredExpressions": "F622",
+    "AssertTuple": "F631",
+    "IsLiteral": "F632",
+    "InvalidPrintSyntax": "F633",
+    "IfTuple": "F634",
+    "BreakOutsideLoop": "F701",
+    "ContinueOutsideLoop": "F702",
+    "YieldOutsideFunction": "F704",
+    "ReturnOutsideFunction": "F706",
+    "DefaultExceptNotLast": "F707",
+    "DoctestSyntaxError": "F721",
+    "ForwardAnnotationSyntaxError": "F722",
+    "RedefinedWhileUnused": "F811",
+    "UndefinedName": "F821",
+    "UndefinedExport": "F822",
+    "UndefinedLocal": "F823",
+    "DuplicateArgument": "F831",
+    "UnusedVariable": "F841",
+    "UnusedAnnotation": "F842",
+    "RaiseNotImplemented": "F901",
+}
+
+
+def engine_available() -> bool:
+    return pycodestyle is not None and pyflakes_checker is not None
+
+
+def _engine_key() -> str:
+    """Everything besides the cell source that changes what the linters report."""
+    return json.dumps({
+        "engine": STYLE_ENGINE_VERSION,
+        "pyflakes": tool_version("pyflakes"),
+        "pycodestyle": tool_version("pycodestyle"),
+        "max_line_length": MAX_LINE_LENGTH,
+        "ignore": IGNORED_CODES,
+        "builtins": IPYTHON_BUILTINS,
+    }, sort_keys=True)
+
+
+def cell_hash(source: str, engine_key: str = None) -> str:
+    digest = hashlib.sha256((engine_key or _engine_key()).encode())
+    digest.update(b"\0")
+    digest.update(source.encode())
+    return digest.hexdigest()
+
+
+def _referenced_names(binding: str) -> list[str]:
+    """
+    Names a pyflakes binding can be referred to by in other cells.
+
+    "numpy as np" -> np; "os.path" may be `import os.path` (used as os) or
+    `from os import path` (used as path), so both are candidates.
+    """
+    if " as " in binding:
+        return [binding.rsplit(" as ", 1)[1]]
+    parts = binding.split(".")
+    return sorted({parts[0], parts[-1]})
+
+
+def _bind_targets(node: ast.AST, bound: set[str]):
+    """Add the names a statement binds in the cell's own (module) scope."""
+    for child in ast.iter_child_nodes(node):
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            bound.add(child.name)
+            # `global x` inside a function still binds x for later cells
+            for inner in ast.walk(child):
+                if isinstance(inner, ast.Global):
+                    bound.update(inner.names)
+        elif isinstance(child, (ast.Lambda, ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)):
+            continue  # their loop variables don't leak out
+        elif isinstance(child, ast.Name):
+            if not isinstance(child.ctx, ast.Load):
+                bound.add(child.id)
+        elif isinstance(child, (ast.Import, ast.ImportFrom)):
+            for alias in child.names:
+                bound.add((alias.asname or alias.name).split(".")[0])
+        else:
+            _bind_targets(child, bound)
+
+
+def _cell_names(tree: ast.AST) -> tuple[set[str], set[str]]:
+    """
+    Names a cell binds and names it reads, used to resolve cross-cell references.
+
+    Only module-level bindings count: a name assigned inside a function or
+    class body is not visible to other cells. Reads are collected everywhere,
+    since a function body can use a name another cell defines.
+    """
+    bound = set()
+    _bind_targets(tree, bound)
+    used = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load)}
+    return bound, used
+
+
+if pycodestyle is not None:
+    class _CollectingReport(pycodestyle.BaseReport):
+        """pycodestyle report that keeps errors instead of printing them."""
+
+        def __init__(self, options):
+            super().__init__(options)
+            self.issues = []
+
+        def error(self, line_number, offset, text, check):
+            code = super().error(line_number, offset, text, check)
+            if code:
+                self.issues.append({
+                    "line": line_number,
+                    "column": offset + 1,
+                    "code": code,
+                    "message": text[5:],
+                })
+            return code
+
+
+@lru_cache(maxsize=1)
+def _style_options():
+    ignore = pycodestyle.DEFAULT_IGNORE.split(",") + list(IGNORED_CODES)
+    return pycodestyle.StyleGuide(quiet=True, max_line_length=MAX_LINE_LENGTH, ignore=ignore).options
+
+
+def lint_cell(source: str) -> dict:
+    """
+    Run pyflakes and pycodestyle on the source of one code cell.
+
+    Returns {"issues": [...], "bound": [...], "used": [...]}; issues carry
+    line, column, code and message. Undefined names and unused imports also
+    carry the names they are referred by, to be resolved against other cells.
+    """
+    code = strip_magics(source)
+    if not code.endswith("\n"):
+        code += "\n"
+    issues = []
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        return {
+            "issues": [{
+                "line": e.lineno or 1,
+                "column": e.offset or 1,
+                "code": "E999",
+                "message": f"SyntaxError: {e.msg}",
+            }],
+            "bound": [],
+            "used": [],
+        }
+
+    for message in pyflakes_checker.Checker(tree, filename="<cell>", builtins=IPYTHON_BUILTINS).messages:
+        issue = {
+            "line": message.lineno,
+            "column": message.col + 1,
+            "code": PYFLAKES_CODES.get(type(message).__name__, "F"),
+            "message": message.message % message.message_args,
+        }
+        if isinstance(message, (pyflakes_messages.UndefinedName, pyflakes_messages.UnusedImport)):
+            issue["names"] = _referenced_names(str(message.message_args[0]))
+        issues.append(issue)
+
+    options = _style_options()
+    report = _CollectingReport(options)
+    pycodestyle.Checker(filename="<cell>", lines=code.splitlines(True), options=options, report=report).check_all()
+    issues.extend(report.issues)
+    issues.sort(key=lambda i: (i["line"], i["column"], i["code"]))
+
+    bound, used = _cell_names(tree)
+    return {"issues": issues, "bound": sorted(bound), "used": sorted(used)}
+
+
+class StyleCache:
+    """
+    Lint results keyed by the hash of a cell's source and the linter versions.
+
+    Entries live in <cache_dir>/<hh>/<hash>.json and are content-addressed,
+    so they can be shared by every notebook (and worker) in a project.
+    """
+
+    def __init__(self, cache_dir: Path, enabled: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.enabled = enabled
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> Optional[dict]:
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(key), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, value: dict):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(value, f)
+        os.replace(tmp_path, path)
+
+
+def _resolve_cells(doc: NotebookDocument, linted: dict[int, dict]) -> list[dict]:
+    """
+    Combine per-cell results into notebook issues.
+
+    Cells are assumed to run top to bottom: a name used in one cell and
+    defined in an earlier one is not undefined, and an import used by the
+    same or a later cell is not unused.
+    """
+    # First cell binding each name, last cell reading it
+    first_bound, last_used = {}, {}
+    for index, cell in sorted(linted.items()):
+        for name in cell["bound"]:
+            first_bound.setdefault(name, index)
+        for name in cell["used"]:
+            last_used[name] = index
+
+    issues = []
+    for index, cell in sorted(linted.items()):
+        for issue in cell["issues"]:
+            names = issue.get("names", [])
+            if issue["code"] == "F821" and any(first_bound.get(name, index) < index for name in names):
+                continue
+            if issue["code"] == "F401" and any(last_used.get(name, -1) >= index for name in names):
+                continue
+            issues.append({"cell": index, **{k: v for k, v in issue.items() if k != "names"}})
+    return issues
+
+
+def lint_notebooks(notebooks: list, cache_dir: Path, jobs: int = 1, use_cache: bool = True) -> dict[str, list[dict]]:
+    """
+    Style-check many notebooks in one batch.
+
+    Code cells of all notebooks are deduplicated by source hash; only cells
+    without a cached result are linted, across a pool of worker processes
+    when jobs > 1. Returns notebook path -> issues, each with the notebook
+    cell index, line, column, code and message.
+    """
+    docs = [as_document(nb) for nb in notebooks]
+    cache = StyleCache(cache_dir, enabled=use_cache)
+    engine_key = _engine_key()
+
+    results, pending = {}, {}
+    for doc in docs:
+        for _, source in doc.code_cells():
+            key = cell_hash(source, engine_key)
+            if key not in results and key not in pending:
+                cached = cache.get(key)
+                if cached is not None:
+                    results[key] = cached
+                else:
+                    pending[key] = source
+
+    if pending:
+        keys, sources = list(pending), list(pending.values())
+        if jobs > 1 and len(sources) > 1:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                linted = list(executor.map(lint_cell, sources, chunksize=max(1, len(sources) // (jobs * 4))))
+        else:
+            linted = [lint_cell(source) for source in sources]
+        for key, value in zip(keys, linted):
+            cache.put(key, value)
+            results[key] = value
+
+    return {
+        str(doc.path): _resolve_cells(doc, {
+            index: results[cell_hash(source, engine_key)] for index, source in doc.code_cells()
+        })
+        for doc in docs
+    }
+
+
+def check_style(notebook, cache_dir: Path, use_cache: bool = True) -> list[dict]:
+    """Style-check one notebook, falling back to flakenb when pyflakes/pycodestyle are missing."""
+    doc = as_document(notebook)
+    if not engine_available():
+        return [{"cell": None, "line": None, "column": None, "code": None, "message": line}
+                for line in run_flakenb(str(doc.path))]
+    return lint_notebooks([doc], cache_dir, use_cache=use_cache)[str(doc.path)]
+
+
+def format_issue(notebook_name: str, issue: dict) -> str:
+    """Human-readable form, in the flake8 style flakenb prints."""
+    if issue["cell"] is None:
+        return issue["message"]
+    return f"{notebook_name}:cell_{issue['cell']}:{issue['line']}:{issue['column']}: {issue['code']} {issue['message']}"
+
+
+def write_style_report(report_path: Path, notebook_path: Path, issues: list[dict]) -> Path:
+    """Save the structured style report to generated/style_reports/<notebook>.json."""
+    report_path = Path(report_path)
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    counts = {}
+    for issue in issues:
+        counts[issue["code"]] = counts.get(issue["code"], 0) + 1
+    with open(report_path, "w") as f:
+        json.dump({
+            "notebook": str(notebook_path),
+            "engine": "pyflakes+pycodestyle" if engine_available() else "flakenb",
+            "total": len(issues),
+            "counts": counts,
+            "issues": issues,
+        }, f, indent=2)
+    return report_path
@@ -1,12 +1,16 @@
 # repronotebook/checks_pipeline/styling_check
 
-import subprocess
 from pathlib import Path
+from repronotebook.checks_pipeline import tracing
+from repronotebook.checks_pipeline.preflight import tool_available
 
 def run_flakenb(notebook_path: str) -> list[str]:
     """Run flakenb on a notebook and return a list of style violations."""
+    if not tool_available("flakenb"):
+        print("[red]❌ flakenb is not installed. Please install it with `pip install flakenb`[/]")
+        return []
     try:
-        result = subprocess.run(
+        result = tracing.run(
             ["flakenb", notebook_path],
             capture_output=True,
             text=True,
@@ -0,0 +1,207 @@
+# repronotebook/checks_pipeline/tracing.py
+
+import csv
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+# Set by enable_tracing(); inherited by worker processes through the environment
+TRACE_ENV = "REPRONOTEBOOK_TRACE_DIR"
+
+CSV_COLUMNS = ["name", "category", "notebook", "pid", "tid", "start_ms", "duration_ms", "bytes", "exit_code", "status", "args"]
+
+
+class _NullSpan:
+    """Returned by span() when tracing is off: entering, exiting and annotating do nothing."""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "category", "args", "start_us", "started")
+
+    def __init__(self, tracer: "_Tracer", name: str, category: str, args: dict):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start_us = time.time_ns() // 1000
+        self.started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        duration_us = (time.perf_counter_ns() - self.started) // 1000
+        if exc_type is not None:
+            self.args.setdefault("status", "error")
+            self.args.setdefault("error", f"{exc_type.__name__}: {exc}")
+        self.tracer.record(self.name, self.category, self.start_us, duration_us, self.args)
+        return False
+
+    def set(self, **args):
+        """Attach results known only at the end, e.g. bytes=..., exit_code=..."""
+        self.args.update(args)
+
+
+class _Tracer:
+    """Appends finished spans of this process to <parts_dir>/<pid>.jsonl."""
+
+    def __init__(self, parts_dir: Path):
+        self.parts_dir = Path(parts_dir)
+        self.pid = None
+        self.file = None
+        self.lock = threading.Lock()
+
+    def record(self, name: str, category: str, start_us: int, duration_us: int, args: dict):
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": start_us,
+            "dur": duration_us,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": args,
+        }
+        line = json.dumps(event, default=str) + "\n"
+        with self.lock:
+            # Forked workers inherit the parent's handle; each process needs its own file
+            if self.pid != event["pid"]:
+                self.parts_dir.mkdir(parents=True, exist_ok=True)
+                self.file = open(self.parts_dir / f"{event['pid']}.jsonl", "a", encoding="utf-8")
+                self.pid = event["pid"]
+            # Written right away: pool workers exit without running atexit hooks
+            self.file.write(line)
+            self.file.flush()
+
+
+_tracer: Optional[_Tracer] = _Tracer(os.environ[TRACE_ENV]) if os.environ.get(TRACE_ENV) else None
+
+
+def tracing_enabled() -> bool:
+    return _tracer is not None
+
+
+def span(name: str, category: str = "stage", **args):
+    """
+    Context manager timing a block as one trace span.
+
+        with span("zip", notebook=nb.name) as s:
+            ...
+            s.set(bytes=zip_path.stat().st_size)
+
+    When tracing is off this returns a shared no-op object, so instrumented
+    code pays for one function call and no allocation.
+    """
+    if _tracer is None:
+        return _NULL_SPAN
+    return _Span(_tracer, name, category, args)
+
+
+def run(cmd: list, **kwargs) -> subprocess.CompletedProcess:
+    """subprocess.run() that records the command, its duration and exit code as a span."""
+    if _tracer is None:
+        return subprocess.run(cmd, **kwargs)
+    # "conda env create", "jupyter nbconvert", "flakenb"...
+    words = [str(word) for word in cmd[:3] if not str(word).startswith("-")]
+    with span(" ".join(words), category="subprocess", argv=[str(word) for word in cmd]) as s:
+        try:
+            result = subprocess.run(cmd, **kwargs)
+        except subprocess.CalledProcessError as e:
+            s.set(exit_code=e.returncode)
+            raise
+        s.set(exit_code=result.returncode)
+        return result
+
+
+def enable_tracing(trace_path: Path) -> Path:
+    """
+    Start recording spans for this process and the workers it spawns.
+
+    Spans are collected per process next to trace_path and merged by
+    finish_tracing(). Returns the parts directory.
+    """
+    global _tracer
+    parts_dir = Path(trace_path).resolve().with_name(f".{Path(trace_path).name}.parts")
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    os.environ[TRACE_ENV] = str(parts_dir)
+    _tracer = _Tracer(parts_dir)
+    return parts_dir
+
+
+def finish_tracing(trace_path: Path) -> Optional[tuple[Path, Path]]:
+    """
+    Merge every process's spans into trace_path (Chrome trace-event JSON) and a CSV.
+
+    The JSON opens in chrome://tracing or Perfetto; the CSV (the suffix of
+    trace_path replaced by .csv, e.g. trace.json -> trace.csv; .spans.csv if
+    trace_path already ends in .csv) has one row per span. Returns both paths.
+    """
+    global _tracer
+    if _tracer is None:
+        return None
+    parts_dir = _tracer.parts_dir
+    if _tracer.file is not None:
+        _tracer.file.close()
+    _tracer = None
+    os.environ.pop(TRACE_ENV, None)
+
+    events = []
+    for part in sorted(parts_dir.glob("*.jsonl")):
+        with open(part, "r", encoding="utf-8") as f:
+            events.extend(json.loads(line) for line in f if line.strip())
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    events.sort(key=lambda e: e["ts"])
+
+    trace_path = Path(trace_path)
+    trace_path.parent.mkdir(parents=True, exist_ok=True)
+    pids = sorted({e["pid"] for e in events})
+    metadata = [
+        {"name": "process_name", "ph": "M", "pid": pid, "tid": 0,
+         "args": {"name": "main" if pid == os.getpid() else f"worker {pid}"}}
+        for pid in pids
+    ]
+    with open(trace_path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+
+    csv_path = trace_path.with_suffix(".csv")
+    if csv_path == trace_path:
+        csv_path = trace_path.with_suffix(".spans.csv")
+    origin = events[0]["ts"] if events else 0
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(CSV_COLUMNS)
+        for e in events:
+            args = dict(e["args"])
+            writer.writerow([
+                e["name"],
+                e["cat"],
+                args.pop("notebook", ""),
+                e["pid"],
+                e["tid"],
+                f"{(e['ts'] - origin) / 1000:.3f}",
+                f"{e['dur'] / 1000:.3f}",
+                args.pop("bytes", ""),
+                args.pop("exit_code", ""),
+                args.pop("status", ""),
+                json.dumps(args, default=str) if args else "",
+            ])
+    return trace_path, csv_path
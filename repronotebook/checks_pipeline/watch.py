@@ -0,0 +1,356 @@
+# repronotebook/checks_pipeline/watch.py
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import time
+from itertools import islice
+from pathlib import Path
+import click
+from rich import print
+from repronotebook.checks_pipeline.dependency_check.dependency import notebook_imports
+from repronotebook.checks_pipeline.discovery import NotebookScanner
+from repronotebook.checks_pipeline.notebook_document import load_notebook
+from repronotebook.checks_pipeline.preflight import get_preflight
+from repronotebook.checks_pipeline.pipeline import determine_output_root, prepare_output_dirs, process_notebook
+
+# Changes arriving closer together than this are handled as one (an editor
+# save is often a write, a rename and a metadata update)
+DEBOUNCE = 0.2
+POLL_INTERVAL = 1.0
+
+# Files next to a notebook that feed its pipeline stages
+DEPENDENCY_FILES = ("requirements.txt", "environment.yml")
+
+# <sys/inotify.h>
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+_WATCH_MASK = (IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+               | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+# struct inotify_event: wd, mask, cookie, len, then a NUL-padded name
+_EVENT = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Folder watches on one inotify descriptor (Linux)."""
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            e = ctypes.get_errno()
+            raise OSError(e, os.strerror(e))
+        self.folders = {}
+        self.watched = set()
+
+    def add(self, folder: Path):
+        wd = self._add_watch(self.fd, os.fsencode(folder), _WATCH_MASK)
+        if wd < 0:
+            e = ctypes.get_errno()
+            # The folder went away before it could be watched
+            if e in (errno.ENOENT, errno.ENOTDIR):
+                return
+            raise OSError(e, f"inotify_add_watch {folder}: {os.strerror(e)}")
+        self.folders[wd] = Path(folder)
+        self.watched.add(Path(folder))
+
+    def watching(self, folder: Path) -> bool:
+        return Path(folder) in self.watched
+
+    def read(self, timeout: float) -> tuple[set[Path], bool]:
+        """
+        Wait up to timeout seconds for events.
+
+        Returns the paths that changed and whether a folder was created,
+        moved or removed (or events were lost), which needs a rescan.
+        """
+        changed, rescan = set(), False
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changed, rescan
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                folder = self.folders.get(wd)
+                if mask & IN_IGNORED:
+                    self.watched.discard(self.folders.pop(wd, None))
+                if folder is None:
+                    continue
+                if mask & (IN_ISDIR | IN_DELETE_SELF | IN_MOVE_SELF):
+                    rescan = True
+                if name:
+                    changed.add(folder / os.fsdecode(name))
+        return changed, rescan
+
+    def close(self):
+        os.close(self.fd)
+
+
+class _Poller:
+    """Same interface as _Inotify, comparing folder listings every POLL_INTERVAL seconds."""
+
+    def __init__(self):
+        self.listings = {}
+
+    @staticmethod
+    def _list(folder: Path) -> dict:
+        try:
+            with os.scandir(folder) as it:
+                return {entry.name: (entry.is_dir(follow_symlinks=False),) + _stat(entry) for entry in it}
+        except OSError:
+            return None
+
+    def add(self, folder: Path):
+        listing = self._list(folder)
+        if listing is not None:
+            self.listings[Path(folder)] = listing
+
+    def watching(self, folder: Path) -> bool:
+        return Path(folder) in self.listings
+
+    def read(self, timeout: float) -> tuple[set[Path], bool]:
+        changed, rescan = set(), False
+        time.sleep(min(timeout, POLL_INTERVAL))
+        for folder, before in list(self.listings.items()):
+            after = self._list(folder)
+            if after is None:
+                del self.listings[folder]
+                rescan = True
+                continue
+            self.listings[folder] = after
+            for name in before.keys() | after.keys():
+                if before.get(name) != after.get(name):
+                    changed.add(folder / name)
+                    rescan = rescan or (before.get(name) or after.get(name))[0]
+        return changed, rescan
+
+    def close(self):
+        self.listings.clear()
+
+
+def _stat(entry: os.DirEntry) -> tuple:
+    try:
+        stat = entry.stat(follow_symlinks=False)
+    except OSError:
+        return (None, None)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _open_watcher():
+    if sys.platform.startswith("linux"):
+        try:
+            return _Inotify()
+        except (OSError, AttributeError):  # No inotify in this libc or kernel
+            pass
+    return _Poller()
+
+
+class WatchSession:
+    """
+    Keeps a tree's notebooks validated, re-running them as they are saved.
+
+    Everything runs in this process, so what a cold CLI run rebuilds stays
+    warm between saves: the kernel pools, the parsed-notebook cache, the
+    distribution index used by the dependency stage and the preflight probe.
+    The build cache then skips every stage whose inputs did not change, so a
+    save that only touches markdown never reaches the kernel.
+    """
+
+    def __init__(self, root: Path, exclude=(), use_gitignore: bool = True, debounce: float = DEBOUNCE, **options):
+        self.root = Path(root).resolve()
+        self.exclude = exclude
+        self.use_gitignore = use_gitignore
+        self.debounce = debounce
+        # The next save is always coming: keep a fresh kernel ready for it. Kernels
+        # are restarted, never reset: a reset one keeps the old version of an edited helper module
+        self.options = {"prewarm_kernels": True, **options, "kernel_reset": "restart"}
+        self.scanner = NotebookScanner(self.root, exclude, use_gitignore)
+        self.watcher = _open_watcher()
+        self.notebooks = set()
+
+        first = list(islice(self.scanner.iter_notebooks(), 1))
+        self.output_root = determine_output_root(first) if first else self.root
+        # Before the first scan, so generated/ is recognized and never watched
+        prepare_output_dirs(self.output_root)
+
+    def scan(self) -> list[Path]:
+        """Watch every folder that is not pruned; return notebooks not seen before."""
+        found, new = set(), []
+        for kind, path in self.scanner.walk():
+            if kind == "folder":
+                if not self.watcher.watching(path):
+                    try:
+                        self.watcher.add(path)
+                    except OSError as e:
+                        # Most likely fs.inotify.max_user_watches
+                        print(f"[yellow]⚠️ {e}; polling for changes instead[/]")
+                        self.watcher.close()
+                        self.watcher = _Poller()
+                        return self.scan()
+            else:
+                found.add(path)
+                if path not in self.notebooks:
+                    new.append(path)
+        self.notebooks = found
+        return new
+
+    def run(self, notebooks: list[Path]):
+        for nb in notebooks:
+            try:
+                result = process_notebook(nb, self.output_root, isolate_outputs=True, **self.options)
+            except Exception as e:
+                print(f"[red]❌ {nb.name}: pipeline failed:[/] {e}")
+                continue
+            color = {"ok": "green", "style_failed": "yellow"}.get(result["status"], "red")
+            print(f"[bold {color}]● {nb.relative_to(self.root)}: {result['status']} in {result['duration']:.2f}s[/] "
+                  f"({result['cache_hits']} stage(s) reused, {result['cache_misses']} rebuilt)")
+
+    def _importers(self, module: Path) -> list[Path]:
+        """
+        Notebooks that may import a changed (or deleted) .py file.
+
+        Matched by name: the module's own name, or that of any folder between
+        the watch root and it, for packages and `from src.helpers import ...`.
+        """
+        names = {parent.name for parent in module.parents if self.root in parent.parents}
+        if module.name != "__init__.py":
+            names.add(module.stem)
+        importers = []
+        for nb in self.notebooks:
+            try:
+                if names & notebook_imports(load_notebook(nb)):
+                    importers.append(nb)
+            except (OSError, ValueError):
+                continue  # unreadable right now; its own save will trigger a run
+        return importers
+
+    def _affected(self, changed: set[Path]) -> tuple[list[Path], bool]:
+        """Notebooks to re-run for a set of changed paths, and whether the tree needs a rescan."""
+        affected, rescan = set(), False
+        for path in changed:
+            if path.name == ".gitignore" and self.use_gitignore:
+                rescan = True
+            elif path.name in DEPENDENCY_FILES:
+                # Feeds the dependency and execution stages of its folder's notebooks
+                affected.update(nb for nb in self.notebooks if nb.parent == path.parent)
+            elif path.suffix == ".py":
+                # A helper module or package file; the build cache re-executes only the notebooks importing it
+                affected.update(self._importers(path))
+            elif path.suffix == ".ipynb":
+                if path.is_file() and self.scanner.includes(path):
+                    affected.add(path)
+                elif path in self.notebooks:
+                    self.notebooks.discard(path)
+                    print(f"[dim]➖ {path.relative_to(self.root)} removed[/]")
+        return sorted(affected), rescan
+
+    def serve(self):
+        print(f"[bold]👀 Watching {len(self.notebooks)} notebook(s) under {self.root} (Ctrl+C to stop)[/]")
+        while True:
+            changed, rescan = self.watcher.read(timeout=3600)
+            if not changed and not rescan:
+                continue
+            # Wait for the burst of events from one save to settle
+            while True:
+                more, more_rescan = self.watcher.read(timeout=self.debounce)
+                if not more and not more_rescan:
+                    break
+                changed |= more
+                rescan = rescan or more_rescan
+
+            affected, needs_rescan = self._affected(changed)
+            if rescan or needs_rescan:
+                if needs_rescan:
+                    self.scanner = NotebookScanner(self.root, self.exclude, self.use_gitignore)
+                affected = sorted(set(affected) | set(self.scan()))
+            affected = [nb for nb in affected if nb in self.notebooks or self.scanner.includes(nb)]
+            self.notebooks.update(affected)
+            if affected:
+                print(f"[bold cyan]🔁 {len(affected)} notebook(s) changed[/]")
+                self.run(affected)
+
+    def close(self):
+        self.watcher.close()
+
+
+def watch(root: Path, exclude=(), use_gitignore: bool = True, debounce: float = DEBOUNCE, **options):
+    """Validate every notebook under root, then re-validate each one as it changes."""
+    # Probe kernels, Conda envs and tools once for the whole session
+    get_preflight()
+    session = WatchSession(root, exclude=exclude, use_gitignore=use_gitignore, debounce=debounce, **options)
+    try:
+        notebooks = session.scan()
+        print(f"[bold]🚀 Initial pass over {len(notebooks)} notebook(s)[/]")
+        session.run(notebooks)
+        session.serve()
+    except KeyboardInterrupt:
+        print("[bold]👋 Stopped watching[/]")
+    finally:
+        session.close()
+
+
+@click.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--author', default='Unknown', help='Notebook author')
+@click.option('--use-conda', is_flag=True, help='Use Conda environment for execution')
+@click.option('--conda-pool-size', type=int, default=5, show_default=True, help='Maximum number of cached Conda envs to keep (least recently used are removed)')
+@click.option('--conda-pool-disk', type=float, default=None, help='Maximum total size in GB of cached Conda envs')
+@click.option('--engine', type=click.Choice(['nbclient', 'nbconvert']), default='nbclient', show_default=True, help='Execution engine: pooled in-process kernels or `conda run jupyter nbconvert`')
+@click.option('--cell-timeout', type=float, default=None, help='Maximum seconds per cell')
+@click.option('--notebook-timeout', type=float, default=None, help='Maximum seconds per notebook')
+@click.option('--embed-timings', is_flag=True, help='Store per-cell timings in the executed notebook\'s cell metadata')
+@click.option('--incremental', is_flag=True, help='Re-execute only from the first changed cell, restoring kernel state from a checkpoint (needs dill in the env)')
+@click.option('--generate-rocrate', is_flag=True, help='Regenerate the RO-Crate of each changed notebook')
+@click.option('--externalize-outputs', is_flag=True, help='Move large cell outputs into content-addressed files under blobs/ in the RO-Crate')
+@click.option('--externalize-min-size', default=64, show_default=True, help='Smallest output in KB moved by --externalize-outputs')
+@click.option('--exclude', multiple=True, help='Glob of notebooks or folders to skip, matched against names and relative paths (repeatable)')
+@click.option('--no-gitignore', is_flag=True, help='Also watch notebooks that .gitignore files exclude')
+@click.option('--debounce', default=DEBOUNCE, show_default=True, help='Seconds to wait for a save to settle before re-running')
+def main(directory, author, use_conda, conda_pool_size, conda_pool_disk, engine, cell_timeout, notebook_timeout, embed_timings, incremental, generate_rocrate, externalize_outputs, externalize_min_size, exclude, no_gitignore, debounce):
+    """Keep the notebooks under DIRECTORY validated, re-running the affected stages on every save."""
+    watch(
+        Path(directory),
+        exclude=exclude,
+        use_gitignore=not no_gitignore,
+        debounce=debounce,
+        author=author,
+        use_conda=use_conda,
+        conda_pool_size=conda_pool_size,
+        conda_pool_disk_gb=conda_pool_disk,
+        engine=engine,
+        cell_timeout=cell_timeout,
+        notebook_timeout=notebook_timeout,
+        embed_timings=embed_timings,
+        incremental=incremental,
+        generate_rocrate=generate_rocrate,
+        externalize_outputs=externalize_outputs,
+        externalize_min_size=externalize_min_size * 1024,
+    )
+
+
+if __name__ == "__main__":
+    main()
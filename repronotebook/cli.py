@@ -0,0 +1,16 @@
+# repronotebook/cli.py
+import click
+from repronotebook.checks_pipeline.cli import main as check
+from repronotebook.checks_pipeline.watch import main as watch
+
+
+@click.group()
+def main():
+    """Validate, package and publish Jupyter notebooks."""
+
+
+main.add_command(check, name="check")
+main.add_command(watch, name="watch")
+
+if __name__ == "__main__":
+    main()
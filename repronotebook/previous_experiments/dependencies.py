@@ -1,13 +1,16 @@
 # repronotebook/dependencies.py
-import subprocess
 from pathlib import Path
+from repronotebook.checks_pipeline.dependency_check.dependency import extract_dependencies_from_notebook
 
 def generate_requirements(notebook_dir: str) -> bool:
     try:
-        # pipreqs is a tool that generates requirements.txt from a directory of Python code
-        # pipreqs - Lists only what your code actually imports
-        # --force is used to overwrite the existing requirements.txt file
-        subprocess.run(["pipreqs", notebook_dir, "--force"], check=True)
-        return Path("requirements.txt").exists()
-    except subprocess.CalledProcessError:
+        # Lists only what the notebooks actually import, like pipreqs did,
+        # but from an in-process AST scan instead of an external subprocess.
+        packages = set()
+        for notebook in Path(notebook_dir).glob("*.ipynb"):
+            packages.update(extract_dependencies_from_notebook(notebook))
+        req_path = Path(notebook_dir) / "requirements.txt"
+        req_path.write_text("".join(f"{package}\n" for package in sorted(packages)))
+        return req_path.exists()
+    except Exception:
         return False
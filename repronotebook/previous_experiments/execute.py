@@ -1,38 +1,22 @@
 # repronotebook/execute.py
-import subprocess
 from pathlib import Path
-import nbformat
+from repronotebook.checks_pipeline.notebook_document import NotebookDocument, as_document
+from repronotebook.checks_pipeline.preflight import kernel_installed
+from repronotebook.checks_pipeline.execution.engine import execute_notebook
 
 def run_notebook(path: str) -> bool:
     executed_path = Path(path).with_name(Path(path).stem + "_executed.ipynb")
-    try:
-        subprocess.run([
-            "jupyter", "nbconvert",
-            "--to", "notebook",
-            "--execute", path,
-            "--output", str(executed_path)
-        ], check=True)
-        return True
-    except subprocess.CalledProcessError:
-        return False
+    # runs on a pooled kernel instead of starting `jupyter nbconvert`
+    result = execute_notebook(path, executed_path)
+    return result["success"]
 
-def get_kernel_name(notebook_path: str) -> str:
-    # 1. Opens the notebook file
-    with open(notebook_path) as f:
-        # 2. Parses the notebook JSON using nbformat
-        nb = nbformat.read(f, as_version=4)
-    # 3. Safely extracts the kernel name
-    return nb.metadata.get("kernelspec", {}).get("name", None)
+def get_kernel_name(notebook: NotebookDocument) -> str:
+    # 1. Reuses the parsed notebook (loads it once if given a path)
+    doc = as_document(notebook)
+    # 2. Safely extracts the kernel name
+    return doc.kernel_name
 
 def is_kernel_installed(kernel_name: str) -> bool:
-    try:
-        # runs a shell command
-        result = subprocess.run(
-            ['jupyter', 'kernelspec', 'list'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        return kernel_name in result.stdout
-    except subprocess.CalledProcessError:
-        return False
\ No newline at end of file
+    # looks the kernel up in the cached preflight probe instead of
+    # running `jupyter kernelspec list` on every call
+    return kernel_installed(kernel_name)
@@ -0,0 +1,206 @@
+# repronotebook/push_to_zenodo/deposition_sync.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Optional
+from rich import print
+from repronotebook.push_to_zenodo.zenodo_upload import (
+    ZenodoError,
+    ZenodoUploader,
+    file_md5,
+    load_state,
+    save_state,
+)
+
+
+def crate_files(crate_folder: Path) -> Dict[str, Path]:
+    """Every file of a crate, keyed by its crate-relative path (the deposition file name)."""
+    crate_folder = Path(crate_folder)
+    return {
+        path.relative_to(crate_folder).as_posix(): path
+        for path in sorted(crate_folder.rglob("*"))
+        if path.is_file()
+    }
+
+
+def _local_md5s(files: Dict[str, Path], known: Dict[str, list], jobs: int) -> Dict[str, str]:
+    """
+    MD5 of every local file, reusing hashes recorded for an unchanged (size, mtime).
+
+    known maps key -> [size, mtime_ns, md5] from the previous sync and is
+    updated in place. New hashes are computed in parallel; hashlib releases
+    the GIL on large buffers.
+    """
+    md5s, pending = {}, []
+    for key, path in files.items():
+        stat = path.stat()
+        entry = known.get(key)
+        if entry and entry[:2] == [stat.st_size, stat.st_mtime_ns]:
+            md5s[key] = entry[2]
+        else:
+            pending.append((key, path, stat))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for (key, path, stat), md5 in zip(pending, executor.map(lambda p: file_md5(p[1]), pending)):
+                md5s[key] = md5
+                known[key] = [stat.st_size, stat.st_mtime_ns, md5]
+    for key in list(known):
+        if key not in files:
+            del known[key]
+    return md5s
+
+
+def _resolve_target(uploader: ZenodoUploader, deposition_id: Optional[str],
+                    metadata: Optional[Dict[str, Any]], md5s: Dict[str, str]) -> tuple[str, str]:
+    """
+    Draft to sync into: the deposition itself, a new version of it, or a new deposition.
+
+    Returns (deposition ID, how) where how is "created" (a new deposition
+    with `metadata`), "draft" (an existing or new version draft) or
+    "current" (a published deposition that already holds exactly the files
+    with these MD5s, so no new version is opened).
+    """
+    if deposition_id is None:
+        if metadata is None:
+            raise ValueError("Zenodo metadata is required to create a new deposition")
+        return uploader.create_deposition(metadata), "created"
+
+    deposition = uploader.get_deposition(deposition_id)
+    if deposition.get("submitted"):
+        published = uploader.list_files(deposition_id)
+        if {key: entry["checksum"] for key, entry in published.items()} == md5s:
+            return str(deposition["id"]), "current"
+        return uploader.new_version(deposition_id), "draft"
+    print(f"[blue]♻️ Syncing into draft deposition {deposition_id}[/]")
+    return str(deposition["id"]), "draft"
+
+
+def sync_files(
+    uploader: ZenodoUploader,
+    files: Dict[str, Path],
+    deposition_id: Optional[str] = None,
+    metadata: Optional[Dict[str, Any]] = None,
+    state_path: Optional[Path] = None,
+    concurrency: int = 4,
+    publish: bool = False,
+) -> Dict[str, Any]:
+    """
+    Make a deposition hold exactly `files` (deposition file name -> local path).
+
+    The target is deposition_id, or the deposition recorded in state_path by a
+    previous sync; a published deposition gets a new version, a draft is
+    synced in place, and without either a new deposition is created. Local
+    MD5s are compared with the checksums Zenodo reports before anything is
+    created, so a published deposition whose files are all unchanged is left
+    as it is, without a new version. Otherwise unchanged files are
+    kept, new and changed files are uploaded in parallel, and files that no
+    longer exist locally are removed from the draft.
+
+    Returns deposition_id, optional doi and the uploaded / unchanged /
+    deleted file names with the number of bytes sent.
+    """
+    state = load_state(state_path)
+    md5s = _local_md5s(files, state.setdefault("md5", {}), jobs=max(1, concurrency))
+    try:
+        target, how = _resolve_target(uploader, deposition_id or state.get("deposition_id"), metadata, md5s)
+    except ZenodoError as e:
+        # The deposition remembered from the last sync is gone (e.g. a discarded draft)
+        if deposition_id or e.status_code not in (404, 410):
+            raise
+        state = {"md5": state["md5"]}
+        target, how = _resolve_target(uploader, None, metadata, md5s)
+    state["deposition_id"] = target
+
+    if how == "current":
+        print(f"[blue]♻️ Published deposition {target} already holds these files; no new version needed[/]")
+        state["synced"] = sorted(files)
+        result = {"deposition_id": target, "uploaded": [], "unchanged": sorted(files), "deleted": [], "bytes_uploaded": 0}
+        if publish:
+            result["doi"] = state["doi"] = uploader.get_deposition(target).get("doi")
+        save_state(state_path, state)
+        return result
+
+    state.pop("doi", None)
+    save_state(state_path, state)
+    if metadata is not None and how != "created":
+        uploader.update_metadata(target, metadata)
+
+    remote = uploader.list_files(target)
+
+    unchanged = [k for k in files if k in remote and remote[k]["checksum"] == md5s[k]]
+    changed = [k for k in files if k not in unchanged]
+    stale = [k for k in remote if k not in files]
+
+    for key in stale:
+        uploader.delete_file(target, remote[key]["id"])
+    # A changed file must go before its replacement is uploaded
+    for key in changed:
+        if key in remote:
+            uploader.delete_file(target, remote[key]["id"])
+
+    print(f"[bold]🔁 Sync: {len(changed)} file(s) to upload, {len(unchanged)} unchanged, {len(stale)} removed[/]")
+    local = threading.local()
+    spawned = []
+
+    def upload(key: str):
+        # One client per thread: requests.Session is not thread-safe
+        if not hasattr(local, "uploader"):
+            local.uploader = uploader.spawn(show_progress=uploader.show_progress and concurrency == 1)
+            spawned.append(local.uploader)
+        local.uploader.upload_file(target, files[key], filename=key, existing_files={})
+
+    try:
+        if changed:
+            with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+                list(executor.map(upload, changed))
+    finally:
+        for client in spawned:
+            client.close()
+
+    result = {
+        "deposition_id": target,
+        "uploaded": changed,
+        "unchanged": unchanged,
+        "deleted": stale,
+        "bytes_uploaded": sum(os.path.getsize(files[k]) for k in changed),
+    }
+    state["synced"] = sorted(files)
+    save_state(state_path, state)
+
+    if publish:
+        result["doi"] = uploader.publish_deposition(target)
+        state["doi"] = result["doi"]
+        save_state(state_path, state)
+    return result
+
+
+def sync_crate_to_zenodo(
+    crate_folder: Path,
+    zenodo_metadata: Dict[str, Any],
+    access_token: Optional[str] = None,
+    sandbox: bool = False,
+    deposition_id: Optional[str] = None,
+    publish: bool = False,
+    base_url: Optional[str] = None,
+    state_path: Optional[Path] = None,
+    concurrency: int = 4,
+) -> Dict[str, Any]:
+    """Sync the files of an RO-Crate folder to a Zenodo deposition (see sync_files)."""
+    with ZenodoUploader(access_token=access_token, sandbox=sandbox, base_url=base_url) as uploader:
+        try:
+            result = sync_files(uploader, crate_files(crate_folder), deposition_id=deposition_id,
+                                metadata=zenodo_metadata, state_path=state_path,
+                                concurrency=concurrency, publish=publish)
+        except (ZenodoError, ValueError) as e:
+            print(f"[red]❌ Zenodo sync failed: {str(e)}[/]")
+            raise
+
+        size_mb = result["bytes_uploaded"] / (1024 * 1024)
+        print(f"[green]✅ Synced deposition {result['deposition_id']}: uploaded {len(result['uploaded'])} file(s) "
+              f"({size_mb:.1f} MB), reused {len(result['unchanged'])}[/]")
+        if not publish:
+            print(f"[bold]📄 Review at: {uploader.web_url}/deposit/{result['deposition_id']}[/]")
+        return result
@@ -0,0 +1,448 @@
+# repronotebook/push_to_zenodo/emulator.py
+
+"""
+Local stand-in for the parts of the Zenodo REST API that ZenodoUploader uses.
+
+Run it with `python -m repronotebook.push_to_zenodo.emulator --port 8080` and
+point uploads at it with `--zenodo-url http://127.0.0.1:8080/api`. Latency,
+bandwidth caps, injected errors, dropped connections and rate limiting can be
+configured to benchmark upload throughput and exercise retries offline.
+Uploaded data is hashed and counted but not kept.
+"""
+
+import argparse
+import hashlib
+import itertools
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qs, unquote, urlparse
+from rich import print
+
+READ_SIZE = 64 * 1024
+
+
+class EmulatorConfig:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        bandwidth: Optional[float] = None,
+        error_rate: float = 0.0,
+        drop_rate: float = 0.0,
+        rate_limit: Optional[float] = None,
+        seed: Optional[int] = None,
+    ):
+        """
+        Args:
+            latency: Seconds added to every response
+            bandwidth: Upload bandwidth cap in bytes per second (None = unlimited)
+            error_rate: Fraction of requests answered with a 500/502/503
+            drop_rate: Fraction of uploads whose connection is dropped halfway
+            rate_limit: Requests per minute before answering 429 (None = unlimited)
+            seed: Seed for error injection, for reproducible runs
+        """
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.rate_limit = rate_limit
+        self.random = random.Random(seed)
+
+
+class _Store:
+    """Depositions and their files, shared by all request threads."""
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        self.ids = itertools.count(1)
+        self.depositions = {}
+        self.buckets = {}  # bucket id -> deposition id
+        self.stats = {
+            "requests": 0,
+            "bytes_received": 0,
+            "errors_injected": 0,
+            "connections_dropped": 0,
+            "rate_limited": 0,
+            "files_uploaded": 0,
+        }
+
+    def create(self, metadata: dict, files: dict = None, parent: int = None) -> dict:
+        deposition_id = next(self.ids)
+        bucket = uuid.uuid4().hex
+        self.buckets[bucket] = deposition_id
+        self.depositions[deposition_id] = {
+            "id": deposition_id,
+            "metadata": metadata,
+            "submitted": False,
+            "state": "unsubmitted",
+            "files": dict(files or {}),
+            "bucket": bucket,
+            "parent": parent,
+            "latest_draft": None,
+            "doi": None,
+        }
+        return self.depositions[deposition_id]
+
+    def render(self, deposition: dict) -> dict:
+        api = f"{self.base_url}/api"
+        self_url = f"{api}/deposit/depositions/{deposition['id']}"
+        links = {
+            "self": self_url,
+            "bucket": f"{api}/files/{deposition['bucket']}",
+            "files": f"{self_url}/files",
+            "publish": f"{self_url}/actions/publish",
+            "newversion": f"{self_url}/actions/newversion",
+            "html": f"{self.base_url}/deposit/{deposition['id']}",
+        }
+        if deposition["latest_draft"]:
+            links["latest_draft"] = f"{api}/deposit/depositions/{deposition['latest_draft']}"
+        body = {
+            "id": deposition["id"],
+            "metadata": deposition["metadata"],
+            "submitted": deposition["submitted"],
+            "state": deposition["state"],
+            "links": links,
+            "files": [self.render_file(f) for f in deposition["files"].values()],
+        }
+        if deposition["doi"]:
+            body["doi"] = deposition["doi"]
+        return body
+
+    @staticmethod
+    def render_file(entry: dict) -> dict:
+        return {"id": entry["id"], "filename": entry["filename"], "filesize": entry["size"], "checksum": entry["md5"]}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "ZenodoEmulator/1.0"
+
+    # Set on the subclass created by ZenodoEmulator
+    store: _Store = None
+    config: EmulatorConfig = None
+    limiter: dict = None
+
+    def log_message(self, format, *args):
+        pass
+
+    # -- helpers -----------------------------------------------------------
+
+    def _send(self, status: int, body=None, headers: dict = None):
+        payload = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _error(self, status: int, message: str, headers: dict = None):
+        self._send(status, {"status": status, "message": message}, headers)
+
+    def _drain(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        while length > 0:
+            block = self.rfile.read(min(READ_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+
+    def _json_body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        try:
+            return json.loads(raw) if raw else {}
+        except ValueError:
+            return {}
+
+    def _authorized(self) -> bool:
+        if self.headers.get("Authorization", "").startswith("Bearer ") and len(self.headers["Authorization"]) > 7:
+            return True
+        return bool(parse_qs(urlparse(self.path).query).get("access_token"))
+
+    def _rate_limited(self) -> Optional[float]:
+        """Seconds until the next request is allowed, or None if it may proceed."""
+        rate = self.config.rate_limit
+        if not rate:
+            return None
+        with self.store.lock:
+            now = time.monotonic()
+            bucket = self.limiter
+            bucket["tokens"] = min(rate, bucket["tokens"] + (now - bucket["updated"]) * rate / 60)
+            bucket["updated"] = now
+            if bucket["tokens"] >= 1:
+                bucket["tokens"] -= 1
+                return None
+            return (1 - bucket["tokens"]) * 60 / rate
+
+    def _count(self, name: str, amount: int = 1):
+        with self.store.lock:
+            self.store.stats[name] += amount
+
+    def _handle(self, method: str):
+        self._count("requests")
+        if self.config.latency:
+            time.sleep(self.config.latency)
+        path = urlparse(self.path).path.rstrip("/")
+
+        if path == "/_emulator/stats":
+            with self.store.lock:
+                stats = dict(self.store.stats)
+            return self._send(200, stats)
+        if not self._authorized():
+            self._drain()
+            return self._error(401, "The server could not verify that you are authorized to access the URL requested.")
+
+        wait = self._rate_limited()
+        if wait is not None:
+            self._drain()
+            self._count("rate_limited")
+            return self._error(429, "Too many requests.", {"Retry-After": str(max(1, math.ceil(wait)))})
+        if self.config.error_rate and self.config.random.random() < self.config.error_rate:
+            self._drain()
+            self._count("errors_injected")
+            status = self.config.random.choice((500, 502, 503))
+            return self._error(status, "Injected server error.")
+
+        parts = [unquote(p) for p in path.split("/")[1:]]
+        route = getattr(self, f"_{method.lower()}", None)
+        if route is None or not parts or parts[0] != "api":
+            self._drain()
+            return self._error(404, "Not found.")
+        return route(parts[1:])
+
+    def _deposition(self, deposition_id: str) -> Optional[dict]:
+        try:
+            return self.store.depositions.get(int(deposition_id))
+        except ValueError:
+            return None
+
+    # -- routes ------------------------------------------------------------
+
+    def _get(self, parts):
+        if parts[:2] == ["deposit", "depositions"] and len(parts) in (3, 4):
+            with self.store.lock:
+                deposition = self._deposition(parts[2])
+                if deposition is None:
+                    return self._error(404, "PID does not exist.")
+                if len(parts) == 4 and parts[3] == "files":
+                    return self._send(200, [self.store.render_file(f) for f in deposition["files"].values()])
+                return self._send(200, self.store.render(deposition))
+        return self._error(404, "Not found.")
+
+    def _post(self, parts):
+        body = self._json_body()
+        with self.store.lock:
+            if parts == ["deposit", "depositions"]:
+                deposition = self.store.create(body.get("metadata", {}))
+                return self._send(201, self.store.render(deposition))
+            if len(parts) == 5 and parts[:2] == ["deposit", "depositions"] and parts[3] == "actions":
+                deposition = self._deposition(parts[2])
+                if deposition is None:
+                    return self._error(404, "PID does not exist.")
+                if parts[4] == "publish":
+                    if deposition["submitted"]:
+                        return self._error(400, "Deposition is already published.")
+                    if not deposition["files"]:
+                        return self._error(400, "Minimum one file must be provided.")
+                    deposition.update(submitted=True, state="done", doi=f"10.5072/zenodo.{deposition['id']}")
+                    return self._send(202, self.store.render(deposition))
+                if parts[4] == "newversion":
+                    if not deposition["submitted"]:
+                        return self._error(400, "Deposition is not published.")
+                    draft = self.store.depositions.get(deposition["latest_draft"])
+                    if draft is not None and not draft["submitted"]:
+                        return self._error(400, "Please remove all files first.")
+                    draft = self.store.create(dict(deposition["metadata"]), deposition["files"], parent=deposition["id"])
+                    deposition["latest_draft"] = draft["id"]
+                    return self._send(201, self.store.render(deposition))
+        return self._error(404, "Not found.")
+
+    def _put(self, parts):
+        if parts[:2] == ["deposit", "depositions"] and len(parts) == 3:
+            body = self._json_body()
+            with self.store.lock:
+                deposition = self._deposition(parts[2])
+                if deposition is None:
+                    return self._error(404, "PID does not exist.")
+                if deposition["submitted"]:
+                    return self._error(400, "Published depositions cannot be edited.")
+                deposition["metadata"] = body.get("metadata", deposition["metadata"])
+                return self._send(200, self.store.render(deposition))
+        if parts[:1] == ["files"] and len(parts) >= 3:
+            return self._upload(parts[1], "/".join(parts[2:]))
+        self._drain()
+        return self._error(404, "Not found.")
+
+    def _delete(self, parts):
+        self._drain()
+        if parts[:2] == ["deposit", "depositions"] and len(parts) == 5 and parts[3] == "files":
+            with self.store.lock:
+                deposition = self._deposition(parts[2])
+                if deposition is None:
+                    return self._error(404, "PID does not exist.")
+                if deposition["submitted"]:
+                    return self._error(403, "Published depositions cannot be edited.")
+                for key, entry in list(deposition["files"].items()):
+                    if entry["id"] == parts[4]:
+                        del deposition["files"][key]
+                        return self._send(204)
+            return self._error(404, "File does not exist.")
+        return self._error(404, "Not found.")
+
+    def _upload(self, bucket: str, key: str):
+        with self.store.lock:
+            deposition = self.store.depositions.get(self.store.buckets.get(bucket))
+        if deposition is None:
+            self._drain()
+            return self._error(404, "Bucket does not exist.")
+        if deposition["submitted"]:
+            self._drain()
+            return self._error(403, "Bucket is locked.")
+
+        length = int(self.headers.get("Content-Length") or 0)
+        drop_at = length // 2 if self.config.drop_rate and self.config.random.random() < self.config.drop_rate else None
+        digest = hashlib.md5()
+        received = 0
+        started = time.monotonic()
+        while received < length:
+            block = self.rfile.read(min(READ_SIZE, length - received))
+            if not block:
+                break
+            digest.update(block)
+            received += len(block)
+            self._count("bytes_received", len(block))
+            if drop_at is not None and received >= drop_at:
+                # Hang up mid-upload, like a proxy timing out
+                self._count("connections_dropped")
+                self.close_connection = True
+                return
+            if self.config.bandwidth:
+                ahead = received / self.config.bandwidth - (time.monotonic() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+        if received < length:
+            self.close_connection = True
+            return
+
+        entry = {"id": uuid.uuid4().hex, "filename": key, "size": received, "md5": digest.hexdigest()}
+        with self.store.lock:
+            deposition["files"][key] = entry
+            self.store.stats["files_uploaded"] += 1
+        self._send(201, {
+            "key": key,
+            "size": received,
+            "checksum": f"md5:{entry['md5']}",
+            "created": str(date.today()),
+        })
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PUT(self):
+        self._handle("PUT")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+
+class ZenodoEmulator:
+    """
+    In-process Zenodo API stand-in, e.g. for tests and benchmarks.
+
+        with ZenodoEmulator(latency=0.05, error_rate=0.1) as emulator:
+            upload_ro_crate_to_zenodo(zip_path, metadata, access_token="test",
+                                      base_url=emulator.api_url)
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **config):
+        self.config = EmulatorConfig(**config)
+        handler = type("EmulatorHandler", (_Handler,), {
+            "config": self.config,
+            "limiter": {"tokens": float(self.config.rate_limit or 0), "updated": time.monotonic()},
+        })
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        handler.store = _Store(self.url)
+        self.store = handler.store
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def api_url(self) -> str:
+        return f"{self.url}/api"
+
+    @property
+    def stats(self) -> dict:
+        with self.store.lock:
+            return dict(self.store.stats)
+
+    def start(self) -> "ZenodoEmulator":
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline Zenodo API emulator for upload testing")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--bandwidth", type=float, help="Upload bandwidth cap in MB/s")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 5xx")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="Fraction of uploads dropped halfway")
+    parser.add_argument("--rate-limit", type=float, help="Requests per minute before answering 429")
+    parser.add_argument("--seed", type=int, help="Seed for reproducible error injection")
+    args = parser.parse_args(argv)
+
+    emulator = ZenodoEmulator(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        bandwidth=args.bandwidth * 1024 * 1024 if args.bandwidth else None,
+        error_rate=args.error_rate,
+        drop_rate=args.drop_rate,
+        rate_limit=args.rate_limit,
+        seed=args.seed,
+    )
+    print(f"[bold green]🧪 Zenodo emulator listening on {emulator.api_url}[/]")
+    print(f"[bold]💡 Use --zenodo-url {emulator.api_url} --zenodo-token test[/]")
+    try:
+        emulator.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        emulator.server.server_close()
+        stats = emulator.stats
+        print(f"[bold]📊 {stats['requests']} request(s), {stats['files_uploaded']} file(s), "
+              f"{stats['bytes_received'] / (1024 * 1024):.1f} MB received[/]")
+
+
+if __name__ == "__main__":
+    main()
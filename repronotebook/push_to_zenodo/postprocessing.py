@@ -2,10 +2,10 @@
 
 from pathlib import Path
 from datetime import date
-import shutil
 import json
+from repronotebook.push_to_zenodo.zip_writer import iter_tree, write_zip
 
-def zip_ro_crate(crate_folder: Path, output_path: Path = None):
+def zip_ro_crate(crate_folder: Path, output_path: Path = None, level: int = 6, jobs: int = None):
     if output_path is None:
         zip_path = crate_folder.with_suffix(".zip")
     else:
@@ -14,7 +14,9 @@ def zip_ro_crate(crate_folder: Path, output_path: Path = None):
     # Create parent directory if it doesn't exist
     zip_path.parent.mkdir(parents=True, exist_ok=True)
     
-    shutil.make_archive(str(zip_path.with_suffix("")), 'zip', root_dir=crate_folder.parent, base_dir=crate_folder.name)
+    # Same layout as shutil.make_archive (crate folder at the archive root), but
+    # streamed, deflated in parallel and byte-reproducible
+    write_zip(zip_path, iter_tree(crate_folder), level=level, jobs=jobs)
     print(f"📦 Zipped RO-Crate at: {zip_path}")
     return zip_path
 
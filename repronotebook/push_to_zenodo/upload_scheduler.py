@@ -0,0 +1,196 @@
+# repronotebook/push_to_zenodo/upload_scheduler.py
+
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from rich import print
+from repronotebook.checks_pipeline.tracing import span
+from repronotebook.push_to_zenodo.deposition_sync import crate_files, sync_files
+from repronotebook.push_to_zenodo.zenodo_upload import ZenodoUploader, load_state, upload_with_state
+
+# Zenodo allows authenticated clients about 100 requests per minute
+DEFAULT_RATE = 100 / 60
+DEFAULT_BURST = 10
+BATCH_STATE_NAME = "upload_batch.json"
+
+
+class AdaptiveTokenBucket:
+    """
+    Token bucket shared by all upload threads, adapting to rate-limit responses.
+
+    Every request takes a token; tokens refill at `rate` per second up to
+    `burst`. A 429 halves the rate and, with Retry-After, pauses everyone
+    until the server is ready again. Each successful response raises the rate
+    a little (additive increase, multiplicative decrease), up to max_rate.
+    """
+
+    def __init__(self, rate: float = DEFAULT_RATE, burst: int = DEFAULT_BURST,
+                 min_rate: float = 0.05, max_rate: Optional[float] = None):
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate or rate
+        self.increase = rate * 0.02
+        self.tokens = float(burst)
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Block until a request may be sent."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def feedback(self, status_code: int, retry_after: Optional[float] = None):
+        """Adjust the rate to a response from the server."""
+        with self._lock:
+            if status_code == 429:
+                self.rate = max(self.min_rate, self.rate / 2)
+                self.tokens = 0.0
+                if retry_after:
+                    self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            elif status_code < 500:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+
+
+class _BatchState:
+    """Per-notebook status of a batch, persisted after every change so a crashed batch can continue."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def get(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.entries.get(key, {}))
+
+    def update(self, key: str, **fields):
+        with self._lock:
+            self.entries.setdefault(key, {}).update(fields, updated=time.time())
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+
+
+def _already_uploaded(job: Dict[str, Any], entry: Dict[str, Any], publish: bool) -> bool:
+    """True when a previous batch finished this job and the ZIP has not changed since."""
+    if entry.get("status") != "done" or job.get("sync"):
+        return False
+    state = load_state(job["state_path"])
+    try:
+        stat = Path(job["zip_path"]).stat()
+    except OSError:
+        return False
+    if state.get("uploaded_stat") != [stat.st_size, stat.st_mtime_ns]:
+        return False
+    return bool(state.get("doi")) or not publish
+
+
+def schedule_uploads(
+    jobs: List[Dict[str, Any]],
+    zenodo_dir: Path,
+    access_token: Optional[str] = None,
+    sandbox: bool = False,
+    base_url: Optional[str] = None,
+    publish: bool = False,
+    concurrency: int = 4,
+    rate: float = DEFAULT_RATE,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Upload many RO-Crates concurrently, each to its own deposition.
+
+    A job is a dict with notebook, zip_path, metadata_path, state_path and
+    results_path; sync jobs (sync=True) have crate_folder and an optional
+    deposition_id instead of zip_path and are synced file by file. Up to
+    `concurrency` depositions are created, filled and (optionally)
+    published at the same time, all requests sharing one
+    AdaptiveTokenBucket. Progress is saved to <zenodo_dir>/upload_batch.json
+    and each deposition's upload_state file, so re-running a crashed batch
+    skips finished jobs and resumes unfinished drafts.
+
+    Returns notebook -> {"status": "done" | "failed", "deposition_id", "error"}.
+    """
+    batch = _BatchState(Path(zenodo_dir) / BATCH_STATE_NAME)
+    limiter = AdaptiveTokenBucket(rate=rate)
+    local = threading.local()
+    uploaders = []
+    uploaders_lock = threading.Lock()
+
+    def uploader() -> ZenodoUploader:
+        # requests.Session is not thread-safe: one pooled client per thread
+        if not hasattr(local, "uploader"):
+            local.uploader = ZenodoUploader(access_token=access_token, sandbox=sandbox, base_url=base_url,
+                                            show_progress=False, rate_limiter=limiter)
+            with uploaders_lock:
+                uploaders.append(local.uploader)
+        return local.uploader
+
+    def run(job: Dict[str, Any]) -> Dict[str, Any]:
+        key = str(job["notebook"])
+        name = Path(key).name
+        if _already_uploaded(job, batch.get(key), publish):
+            print(f"[blue]♻️ {name}: already uploaded in a previous batch[/]")
+            return batch.get(key)
+
+        batch.update(key, status="uploading", error=None)
+        try:
+            with open(job["metadata_path"], "r") as f:
+                metadata = json.load(f)
+            with span("upload", notebook=name, sync=bool(job.get("sync"))):
+                if job.get("sync"):
+                    # Depositions already upload in parallel; their files go one at a time
+                    result = sync_files(uploader(), crate_files(job["crate_folder"]), deposition_id=job.get("deposition_id"),
+                                        metadata=metadata, state_path=job["state_path"], concurrency=1, publish=publish)
+                else:
+                    result = upload_with_state(uploader(), Path(job["zip_path"]), metadata,
+                                               publish=publish, state_path=job["state_path"])
+        except Exception as e:
+            batch.update(key, status="failed", error=str(e))
+            print(f"[red]❌ {name}: Zenodo upload failed: {e}[/]")
+            return batch.get(key)
+
+        with open(job["results_path"], "w") as f:
+            json.dump(result, f, indent=2)
+        batch.update(key, status="done", deposition_id=result["deposition_id"], doi=result.get("doi"))
+        print(f"[green]✅ {name}: uploaded to deposition {result['deposition_id']}[/]")
+        return batch.get(key)
+
+    print(f"[bold]☁️ Uploading {len(jobs)} RO-Crates to Zenodo ({concurrency} at a time)...[/]")
+    outcomes = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            futures = {executor.submit(run, job): str(job["notebook"]) for job in jobs}
+            for future in as_completed(futures):
+                outcomes[futures[future]] = future.result()
+    finally:
+        for client in uploaders:
+            client.close()
+
+    done = sum(1 for o in outcomes.values() if o.get("status") == "done")
+    print(f"[bold]☁️ {done}/{len(jobs)} upload(s) complete; progress saved to {batch.path}[/]")
+    return outcomes
@@ -1,168 +1,532 @@
 # repronotebook/push_to_zenodo/zenodo_upload.py
 
-import os
-import requests
+import hashlib
 import json
+import os
+import random
+import time
+from email.utils import parsedate_to_datetime
 from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import quote
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError, NewConnectionError
 from rich import print
-from typing import Optional, Dict, Any
+from rich.progress import BarColumn, DownloadColumn, Progress, TransferSpeedColumn, TimeRemainingColumn
+from repronotebook.checks_pipeline.tracing import span
+
+ZENODO_API_URL = "https://zenodo.org/api"
+ZENODO_SANDBOX_API_URL = "https://sandbox.zenodo.org/api"
+# Responses worth retrying: rate limiting and transient server errors
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Methods that can be repeated without creating anything twice
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+class ZenodoError(Exception):
+    """A Zenodo API call failed for good (after retries, or with a non-retryable status)."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def file_md5(file_path: Path) -> str:
+    digest = hashlib.md5()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(UPLOAD_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    """Seconds to wait according to a Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get("Retry-After") if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _not_sent(error: requests.RequestException) -> bool:
+    """Whether a request failed before it reached the server (no connection could be made)."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, (NewConnectionError, ConnectTimeoutError))
+
+
+class _UploadStream:
+    """
+    File wrapper that hashes and reports progress while requests streams it.
+
+    requests sends any object with read() as the request body and takes the
+    Content-Length from len().
+    """
+
+    def __init__(self, file_path: Path, on_read: Callable[[int], None] = None):
+        self._file = open(file_path, "rb")
+        self._size = os.fstat(self._file.fileno()).st_size
+        self._on_read = on_read
+        self.md5 = hashlib.md5()
+
+    def __len__(self):
+        return self._size
+
+    def read(self, size: int = -1) -> bytes:
+        block = self._file.read(UPLOAD_BLOCK_SIZE if size is None or size < 0 else size)
+        if block:
+            self.md5.update(block)
+            if self._on_read:
+                self._on_read(len(block))
+        return block
+
+    def close(self):
+        self._file.close()
+
 
 class ZenodoUploader:
-    def __init__(self, access_token: Optional[str] = None, sandbox: bool = False):
+    def __init__(
+        self,
+        access_token: Optional[str] = None,
+        sandbox: bool = False,
+        base_url: Optional[str] = None,
+        max_retries: int = 5,
+        backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        timeout: float = 60.0,
+        pool_size: int = 10,
+        show_progress: bool = True,
+        rate_limiter=None,
+    ):
         """
         Initialize Zenodo uploader with API token.
-        
+
+        All calls go through one pooled requests.Session, so TLS connections are
+        kept alive and reused. Failed calls are retried with exponential backoff
+        (honoring Retry-After on 429/5xx), and bucket URLs are remembered from
+        the deposition responses instead of being looked up for every file.
+
         Args:
             access_token: Zenodo API token. If None, reads from ZENODO_TOKEN env var
             sandbox: Use Zenodo sandbox for testing (default: False)
+            base_url: API root, e.g. a local stand-in for tests. Defaults to the
+                ZENODO_API_URL env var, then to (sandbox.)zenodo.org
+            max_retries: Retries per call before giving up
+            backoff: First retry delay in seconds; doubles on every retry
+            max_backoff: Upper bound for a single retry delay
+            timeout: Seconds to wait for the server to respond
+            pool_size: Connections kept open per host
+            show_progress: Show a progress bar while uploading files
+            rate_limiter: Shared limiter (see upload_scheduler.AdaptiveTokenBucket)
+                consulted before every request and told about every response
         """
         self.access_token = access_token or os.getenv("ZENODO_TOKEN")
         if not self.access_token:
             raise ValueError("Zenodo API token required. Set ZENODO_TOKEN environment variable or pass access_token parameter.")
-        
-        self.base_url = "https://sandbox.zenodo.org/api" if sandbox else "https://zenodo.org/api"
-        self.params = {"access_token": self.access_token}
-    
+
+        self.base_url = (
+            base_url
+            or os.getenv("ZENODO_API_URL")
+            or (ZENODO_SANDBOX_API_URL if sandbox else ZENODO_API_URL)
+        ).rstrip("/")
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.show_progress = show_progress
+        self.rate_limiter = rate_limiter
+        self.pool_size = pool_size
+        self._buckets = {}
+
+        self.session = requests.Session()
+        # The token goes in a header rather than the query string, so it never ends up in URLs or logs
+        self.session.headers["Authorization"] = f"Bearer {self.access_token}"
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def spawn(self, show_progress: Optional[bool] = None) -> "ZenodoUploader":
+        """
+        A new client with the same settings, for use on another thread.
+
+        requests.Session is not thread-safe; the spawned client has its own
+        session but shares the bucket cache and the rate limiter. Pass
+        show_progress=False when several clients upload at once: only one
+        progress bar can be shown at a time.
+        """
+        clone = ZenodoUploader(
+            access_token=self.access_token, base_url=self.base_url, max_retries=self.max_retries,
+            backoff=self.backoff, max_backoff=self.max_backoff, timeout=self.timeout,
+            pool_size=self.pool_size, rate_limiter=self.rate_limiter,
+            show_progress=self.show_progress if show_progress is None else show_progress,
+        )
+        clone._buckets = self._buckets
+        return clone
+
+    @property
+    def web_url(self) -> str:
+        """Base URL of the Zenodo website that belongs to the API."""
+        return self.base_url[:-len("/api")] if self.base_url.endswith("/api") else self.base_url
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _delay(self, attempt: int, response: Optional[requests.Response] = None) -> float:
+        retry_after = _retry_after(response)
+        if retry_after is not None:
+            return min(retry_after, self.max_backoff)
+        # Full jitter keeps many clients from retrying in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def request(self, method: str, url: str, expected: tuple = (200,), body_factory: Callable = None,
+                idempotent: Optional[bool] = None, **kwargs) -> requests.Response:
+        """
+        Send a request, retrying connection errors, timeouts, 429 and 5xx.
+
+        body_factory, if given, is called before every attempt to produce a
+        fresh request body (a file stream cannot be replayed after a failure).
+        A request that is not idempotent (by default: POST) may have been
+        carried out even though it failed, so it is only retried when the
+        server certainly did not act on it: a 429, or a connection that could
+        not be opened.
+        """
+        if not url.startswith(("http://", "https://")):
+            url = f"{self.base_url}/{url.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        if idempotent is None:
+            idempotent = method.upper() in IDEMPOTENT_METHODS
+
+        for attempt in range(self.max_retries + 1):
+            body = body_factory() if body_factory else None
+            response = None
+            try:
+                if body is not None:
+                    kwargs["data"] = body
+                if self.rate_limiter is not None:
+                    self.rate_limiter.acquire()
+                with span(f"HTTP {method}", category="http", url=url, attempt=attempt + 1) as s:
+                    response = self.session.request(method, url, **kwargs)
+                    sent = response.request.headers.get("Content-Length")
+                    s.set(status=response.status_code, bytes=int(sent) if sent else len(response.content))
+                if self.rate_limiter is not None:
+                    self.rate_limiter.feedback(response.status_code, _retry_after(response))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt == self.max_retries or not (idempotent or _not_sent(e)):
+                    raise ZenodoError(f"{method} {url} failed after {attempt + 1} attempt(s): {e}") from e
+                error = str(e)
+            else:
+                if response.status_code in expected:
+                    return response
+                retryable = response.status_code in RETRY_STATUSES if idempotent else response.status_code == 429
+                if not retryable or attempt == self.max_retries:
+                    raise ZenodoError(
+                        f"{method} {url} failed: {response.status_code} - {response.text[:500]}",
+                        status_code=response.status_code,
+                    )
+                error = f"HTTP {response.status_code}"
+            finally:
+                if body is not None and hasattr(body, "close"):
+                    body.close()
+
+            delay = self._delay(attempt, response)
+            print(f"[yellow]⚠️ {error}; retrying in {delay:.1f}s ({attempt + 1}/{self.max_retries})[/]")
+            time.sleep(delay)
+
+    def _remember_bucket(self, deposition: Dict[str, Any]):
+        bucket = deposition.get("links", {}).get("bucket")
+        if bucket:
+            self._buckets[str(deposition["id"])] = bucket
+
     def create_deposition(self, metadata: Dict[str, Any]) -> str:
         """
         Create a new deposition on Zenodo.
-        
+
+        The POST is not retried after a server error or a lost connection,
+        since Zenodo may have created the deposition anyway.
+
         Args:
             metadata: Zenodo metadata dictionary
-            
+
         Returns:
             Deposition ID
         """
         print("[bold]🚀 Creating new Zenodo deposition...[/]")
-        
-        response = requests.post(
-            f"{self.base_url}/deposit/depositions",
-            params=self.params,
-            json={"metadata": metadata},
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code != 201:
-            raise Exception(f"Failed to create deposition: {response.status_code} - {response.text}")
-        
+
+        response = self.request("POST", "deposit/depositions", expected=(201,), json={"metadata": metadata})
         deposition_data = response.json()
-        deposition_id = deposition_data["id"]
-        
+        self._remember_bucket(deposition_data)
+        deposition_id = str(deposition_data["id"])
+
         print(f"[green]✅ Deposition created with ID: {deposition_id}[/]")
-        return str(deposition_id)
-    
-    def upload_file(self, deposition_id: str, file_path: Path) -> bool:
+        return deposition_id
+
+    def get_deposition(self, deposition_id: str) -> Dict[str, Any]:
+        deposition = self.request("GET", f"deposit/depositions/{deposition_id}").json()
+        self._remember_bucket(deposition)
+        return deposition
+
+    def bucket_url(self, deposition_id: str) -> str:
+        """Bucket URL of a deposition, fetched once and then cached."""
+        deposition_id = str(deposition_id)
+        if deposition_id not in self._buckets:
+            self.get_deposition(deposition_id)
+        return self._buckets[deposition_id]
+
+    def list_files(self, deposition_id: str) -> Dict[str, Dict[str, Any]]:
+        """Files already in a deposition: filename -> {"size", "checksum" (md5 hex)}."""
+        response = self.request("GET", f"deposit/depositions/{deposition_id}/files")
+        files = {}
+        for entry in response.json():
+            checksum = entry.get("checksum", "")
+            files[entry["filename"]] = {
+                "id": entry.get("id"),
+                "size": entry.get("filesize"),
+                "checksum": checksum.split(":", 1)[-1],
+            }
+        return files
+
+    def upload_file(self, deposition_id: str, file_path: Path, filename: Optional[str] = None,
+                    existing_files: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
         """
         Upload a file to an existing Zenodo deposition.
-        
+
+        A file the deposition already holds with the same size and MD5 is not
+        uploaded again, so an interrupted upload resumes where it stopped.
+        Zenodo buckets cannot take partial uploads, so a failed PUT is retried
+        from the start of that file.
+
         Args:
             deposition_id: The deposition ID
             file_path: Path to file to upload
-            
+            filename: Name in the deposition (default: the file's name)
+            existing_files: Result of list_files(), if the caller already has it
+
         Returns:
             True if successful
         """
-        print(f"[bold]📤 Uploading file: {file_path.name}...[/]")
-        
-        # Get bucket URL for file upload
-        deposition_response = requests.get(
-            f"{self.base_url}/deposit/depositions/{deposition_id}",
-            params=self.params
-        )
-        
-        if deposition_response.status_code != 200:
-            raise Exception(f"Failed to get deposition info: {deposition_response.status_code}")
-        
-        bucket_url = deposition_response.json()["links"]["bucket"]
-        
-        # Upload file using PUT to bucket
-        with open(file_path, 'rb') as file:
-            upload_response = requests.put(
-                f"{bucket_url}/{file_path.name}",
-                data=file,
-                params=self.params
+        file_path = Path(file_path)
+        filename = filename or file_path.name
+        size = file_path.stat().st_size
+        file_size_mb = size / (1024 * 1024)
+
+        if existing_files is None:
+            existing_files = self.list_files(deposition_id)
+        existing = existing_files.get(filename)
+        if existing and existing["size"] == size and existing["checksum"] == file_md5(file_path):
+            print(f"[blue]♻️ {filename} is already in the deposition, skipping upload[/]")
+            return True
+
+        print(f"[bold]📤 Uploading file: {filename}...[/]")
+        url = f"{self.bucket_url(deposition_id)}/{quote(filename, safe='/')}"
+        streams = []
+
+        with Progress(
+            "[progress.description]{task.description}", BarColumn(), DownloadColumn(),
+            TransferSpeedColumn(), TimeRemainingColumn(),
+            disable=not self.show_progress, transient=True,
+        ) as progress:
+            task = progress.add_task(filename, total=size)
+
+            def open_stream():
+                progress.reset(task, total=size)
+                stream = _UploadStream(file_path, on_read=lambda n: progress.advance(task, n))
+                streams.append(stream)
+                return stream
+
+            response = self.request(
+                "PUT", url, expected=(200, 201), body_factory=open_stream,
+                headers={"Content-Type": "application/octet-stream"},
             )
-        
-        if upload_response.status_code not in [200, 201]:
-            raise Exception(f"Failed to upload file: {upload_response.status_code} - {upload_response.text}")
-        
-        file_size_mb = file_path.stat().st_size / (1024 * 1024)
-        print(f"[green]✅ Uploaded {file_path.name} ({file_size_mb:.1f} MB)[/]")
+
+        # Zenodo reports "md5:<hex>" for what it stored; catch corrupted transfers
+        local_md5 = streams[-1].md5.hexdigest()
+        remote_md5 = (response.json().get("checksum") or "").split(":", 1)[-1]
+        if remote_md5 and remote_md5 != local_md5:
+            raise ZenodoError(f"Checksum mismatch for {filename}: sent {local_md5}, Zenodo stored {remote_md5}")
+
+        print(f"[green]✅ Uploaded {filename} ({file_size_mb:.1f} MB)[/]")
         return True
-    
+
+    def delete_file(self, deposition_id: str, file_id: str):
+        """Remove a file from a draft deposition."""
+        self.request("DELETE", f"deposit/depositions/{deposition_id}/files/{file_id}", expected=(204,))
+
+    def update_metadata(self, deposition_id: str, metadata: Dict[str, Any]):
+        """Replace the metadata of a draft deposition."""
+        deposition = self.request("PUT", f"deposit/depositions/{deposition_id}", json={"metadata": metadata}).json()
+        self._remember_bucket(deposition)
+
+    def new_version(self, deposition_id: str) -> str:
+        """
+        Open a new version draft of a published deposition and return its ID.
+
+        The draft starts with the previous version's files, so unchanged
+        files do not have to be uploaded again. If a draft is already open
+        (e.g. from an interrupted sync, or a request that failed after Zenodo
+        had created the draft), that draft is returned.
+        """
+        try:
+            response = self.request("POST", f"deposit/depositions/{deposition_id}/actions/newversion", expected=(201,))
+            links = response.json().get("links", {})
+        except ZenodoError as e:
+            # 400: Zenodo refuses a second draft. 5xx or a lost connection: the draft may exist anyway.
+            if e.status_code is not None and e.status_code != 400 and e.status_code < 500:
+                raise
+            links = self.get_deposition(deposition_id).get("links", {})
+            open_draft = links.get("latest_draft") and self.request("GET", links["latest_draft"]).json()
+            if not open_draft or open_draft.get("submitted"):
+                raise
+        latest_draft = links.get("latest_draft")
+        if not latest_draft:
+            raise ZenodoError(f"Zenodo did not return a new version draft for deposition {deposition_id}")
+        draft = self.request("GET", latest_draft).json()
+        self._remember_bucket(draft)
+        print(f"[green]✅ New version draft {draft['id']} opened for deposition {deposition_id}[/]")
+        return str(draft["id"])
+
     def publish_deposition(self, deposition_id: str) -> str:
         """
         Publish a deposition to make it publicly available.
-        
+
         Args:
             deposition_id: The deposition ID
-            
+
         Returns:
             DOI of published record
         """
         print("[bold]🔓 Publishing deposition...[/]")
-        
-        response = requests.post(
-            f"{self.base_url}/deposit/depositions/{deposition_id}/actions/publish",
-            params=self.params
-        )
-        
-        if response.status_code != 202:
-            raise Exception(f"Failed to publish deposition: {response.status_code} - {response.text}")
-        
-        published_data = response.json()
-        doi = published_data["doi"]
-        
+
+        response = self.request("POST", f"deposit/depositions/{deposition_id}/actions/publish", expected=(202,))
+        doi = response.json()["doi"]
+
         print(f"[green]✅ Published successfully! DOI: {doi}[/]")
         return doi
 
 
+def load_state(state_path: Optional[Path]) -> Dict[str, Any]:
+    if state_path is None or not Path(state_path).exists():
+        return {}
+    try:
+        with open(state_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_state(state_path: Optional[Path], state: Dict[str, Any]):
+    if state_path is None:
+        return
+    state_path = Path(state_path)
+    state_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = state_path.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def upload_with_state(
+    uploader: ZenodoUploader,
+    crate_zip_path: Path,
+    zenodo_metadata: Dict[str, Any],
+    publish: bool = False,
+    state_path: Optional[Path] = None,
+) -> Dict[str, str]:
+    """
+    Create (or continue) a deposition, upload the crate and optionally publish.
+
+    With state_path, the deposition ID is saved as soon as the deposition
+    exists. A later call with the same state_path continues that deposition
+    (if it is still an unpublished draft) instead of creating a new one, and
+    skips files the deposition already holds.
+
+    Returns:
+        Dictionary with deposition_id and optional DOI
+    """
+    state = load_state(state_path)
+    deposition_id = None
+    if state.get("deposition_id") and not state.get("doi"):
+        try:
+            deposition = uploader.get_deposition(state["deposition_id"])
+            if not deposition.get("submitted"):
+                deposition_id = str(deposition["id"])
+                print(f"[blue]♻️ Resuming upload to deposition {deposition_id}[/]")
+        except ZenodoError as e:
+            if e.status_code not in (403, 404, 410):
+                raise
+    if deposition_id is None:
+        deposition_id = uploader.create_deposition(zenodo_metadata)
+        state = {"deposition_id": deposition_id}
+        save_state(state_path, state)
+
+    uploader.upload_file(deposition_id, crate_zip_path)
+    stat = Path(crate_zip_path).stat()
+    state["uploaded"] = Path(crate_zip_path).name
+    state["uploaded_stat"] = [stat.st_size, stat.st_mtime_ns]
+    save_state(state_path, state)
+
+    result = {"deposition_id": deposition_id}
+    if publish:
+        result["doi"] = uploader.publish_deposition(deposition_id)
+        state["doi"] = result["doi"]
+        save_state(state_path, state)
+    return result
+
+
 def upload_ro_crate_to_zenodo(
-    crate_zip_path: Path, 
+    crate_zip_path: Path,
     zenodo_metadata: Dict[str, Any],
     access_token: Optional[str] = None,
     sandbox: bool = False,
-    publish: bool = False
+    publish: bool = False,
+    base_url: Optional[str] = None,
+    state_path: Optional[Path] = None,
 ) -> Dict[str, str]:
     """
     Upload an RO-Crate ZIP file to Zenodo.
-    
+
     Args:
         crate_zip_path: Path to the RO-Crate ZIP file
         zenodo_metadata: Zenodo metadata dictionary
         access_token: Zenodo API token (optional, reads from env)
         sandbox: Use sandbox environment (default: False)
         publish: Automatically publish after upload (default: False)
-        
+        base_url: Zenodo API root (optional, see ZenodoUploader)
+        state_path: JSON file recording the upload's progress, so an
+            interrupted upload can resume (optional, see upload_with_state)
+
     Returns:
         Dictionary with deposition_id and optional DOI
     """
-    uploader = ZenodoUploader(access_token=access_token, sandbox=sandbox)
-    
-    # Determine the correct base web URL
-    web_base_url = "https://sandbox.zenodo.org" if sandbox else "https://zenodo.org"
-    
-    try:
-        # Create deposition
-        deposition_id = uploader.create_deposition(zenodo_metadata)
-        
-        # Upload ZIP file
-        uploader.upload_file(deposition_id, crate_zip_path)
-        
-        result = {"deposition_id": deposition_id}
-        
-        # Publish if requested
-        if publish:
-            doi = uploader.publish_deposition(deposition_id)
-            result["doi"] = doi
-            print(f"[bold green]🎉 RO-Crate successfully uploaded and published![/]")
-            print(f"[bold]📄 Access your dataset at: {web_base_url}/record/{deposition_id}[/]")
-        else:
-            print(f"[bold yellow]⚠️ RO-Crate uploaded but not published. Visit Zenodo to review and publish.[/]")
-            print(f"[bold]📄 Review at: {web_base_url}/deposit/{deposition_id}[/]")
-        
-        return result
-        
-    except Exception as e:
-        print(f"[red]❌ Zenodo upload failed: {str(e)}[/]")
-        raise
\ No newline at end of file
+    with ZenodoUploader(access_token=access_token, sandbox=sandbox, base_url=base_url) as uploader:
+        web_base_url = uploader.web_url
+        try:
+            result = upload_with_state(uploader, crate_zip_path, zenodo_metadata, publish=publish, state_path=state_path)
+            deposition_id = result["deposition_id"]
+
+            if publish:
+                print(f"[bold green]🎉 RO-Crate successfully uploaded and published![/]")
+                print(f"[bold]📄 Access your dataset at: {web_base_url}/record/{deposition_id}[/]")
+            else:
+                print(f"[bold yellow]⚠️ RO-Crate uploaded but not published. Visit Zenodo to review and publish.[/]")
+                print(f"[bold]📄 Review at: {web_base_url}/deposit/{deposition_id}[/]")
+
+            return result
+
+        except Exception as e:
+            print(f"[red]❌ Zenodo upload failed: {str(e)}[/]")
+            raise
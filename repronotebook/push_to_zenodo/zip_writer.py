@@ -0,0 +1,348 @@
+# repronotebook/push_to_zenodo/zip_writer.py
+
+import os
+import struct
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, Optional, Union
+from repronotebook.checks_pipeline.tracing import span
+
+ZIP64_LIMIT = 0xFFFFFFFF
+ZIP64_COUNT_LIMIT = 0xFFFF
+READ_SIZE = 1024 * 1024
+# Members at least this large are deflated in parallel, CHUNK_SIZE at a time
+CHUNK_SIZE = 1024 * 1024
+PARALLEL_THRESHOLD = 4 * CHUNK_SIZE
+# Deflate's window: each chunk is primed with the tail of the previous one
+WINDOW_SIZE = 32 * 1024
+SAMPLE_SIZE = 256 * 1024
+
+# Formats that are already compressed; deflating them only burns CPU
+STORED_EXTENSIONS = {
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".heic", ".tif", ".tiff",
+    ".mp3", ".mp4", ".m4a", ".mov", ".avi", ".mkv", ".webm", ".ogg", ".flac",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".lz4", ".7z", ".rar", ".jar", ".whl",
+    ".parquet", ".feather", ".arrow", ".orc", ".avro", ".npz", ".h5", ".hdf5", ".nc", ".zarr",
+    ".pdf", ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".epub",
+}
+
+_LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+_CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+_END_RECORD = struct.Struct("<IHHHHIIH")
+_END_RECORD64 = struct.Struct("<IQHHIIQQQQ")
+_END_LOCATOR64 = struct.Struct("<IIQI")
+
+_FLAG_UTF8 = 0x800
+_METHOD_STORED = 0
+_METHOD_DEFLATED = 8
+_MADE_BY_UNIX = (3 << 8) | 45
+
+# (arcname, source): a file path, in-memory bytes, or None for a directory
+Source = Union[str, Path, bytes, None]
+
+
+def _dos_timestamp() -> tuple[int, int]:
+    """
+    Fixed (time, date) stamped on every member so archives are reproducible.
+
+    Honors SOURCE_DATE_EPOCH; defaults to 1980-01-01, the earliest DOS date.
+    """
+    epoch = os.environ.get("SOURCE_DATE_EPOCH")
+    if not epoch:
+        return 0, (1 << 5) | 1
+    t = time.gmtime(max(int(epoch), 315532800))
+    return (
+        (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2),
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday,
+    )
+
+
+def should_compress(path: Path, size: int) -> bool:
+    """Deflate unless the file type is known to be compressed, or a sample doesn't shrink."""
+    if path.suffix.lower() in STORED_EXTENSIONS:
+        return False
+    if size < SAMPLE_SIZE * 4:
+        return True
+    try:
+        with open(path, "rb") as f:
+            sample = f.read(SAMPLE_SIZE)
+    except OSError:
+        return True
+    return len(zlib.compress(sample, 1)) < len(sample) * 0.97
+
+
+def _compress_chunk(data: bytes, zdict: bytes, level: int, last: bool) -> bytes:
+    """
+    Raw-deflate one chunk so that chunks can simply be concatenated.
+
+    Non-final chunks end with a sync flush (byte aligned, no final-block bit);
+    priming with the previous 32 KiB keeps the ratio close to a serial deflate.
+    """
+    kwargs = {"zdict": zdict} if zdict else {}
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, **kwargs)
+    return compressor.compress(data) + compressor.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class _Entry:
+    __slots__ = ("arcname", "method", "crc", "compressed_size", "size", "offset", "mode", "is_dir")
+
+    def __init__(self, arcname: str, method: int, mode: int, is_dir: bool):
+        self.arcname = arcname
+        self.method = method
+        self.mode = mode
+        self.is_dir = is_dir
+        self.crc = 0
+        self.compressed_size = 0
+        self.size = 0
+        self.offset = 0
+
+
+class ZipWriter:
+    """
+    Streams files into a deterministic zip archive.
+
+    Members are read from their source in blocks and written straight to the
+    archive; no staging copy of the crate is needed. Each member is stored or
+    deflated depending on its type, large members are deflated on several
+    threads in pigz-style chunks, and ZIP64 records are written when sizes,
+    offsets or the member count need them. Timestamps and permissions are
+    normalized, so the same entries in the same order give the same bytes.
+    """
+
+    def __init__(self, output_path: Path, level: int = 6, jobs: Optional[int] = None):
+        self.output_path = Path(output_path)
+        self.level = level
+        self.jobs = jobs or os.cpu_count() or 1
+        self.dos_time, self.dos_date = _dos_timestamp()
+        self._entries = []
+        self._executor = None
+        self._tmp_path = self.output_path.with_name(f".{self.output_path.name}.{os.getpid()}.tmp")
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self._tmp_path, "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        # zlib releases the GIL while compressing, so threads scale across cores
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.jobs)
+        return self._executor
+
+    def write(self, arcname: str, source: Source = None, compress: Optional[bool] = None):
+        """Add a member from a file path, from bytes, or a directory if source is None."""
+        arcname = arcname.replace(os.sep, "/")
+        if source is None:
+            entry = _Entry(arcname.rstrip("/") + "/", _METHOD_STORED, 0o40755, True)
+            self._write_local_header(entry, zip64=False)
+            self._entries.append(entry)
+            return
+
+        if isinstance(source, bytes):
+            size, mode = len(source), 0o100644
+            if compress is None:
+                compress = True
+        else:
+            source = Path(source)
+            stat = source.stat()
+            size = stat.st_size
+            mode = 0o100755 if stat.st_mode & 0o111 else 0o100644
+            if compress is None:
+                compress = should_compress(source, size)
+
+        entry = _Entry(arcname, _METHOD_DEFLATED if compress else _METHOD_STORED, mode, False)
+        # Deflate can grow incompressible data slightly; decide ZIP64 up front
+        zip64 = size * 1.05 > ZIP64_LIMIT
+        self._write_local_header(entry, zip64)
+
+        if isinstance(source, bytes):
+            self._write_blocks(entry, (source[i:i + READ_SIZE] for i in range(0, size, READ_SIZE)), size)
+        else:
+            with open(source, "rb") as f:
+                self._write_blocks(entry, iter(lambda: f.read(READ_SIZE), b""), size)
+
+        if not zip64 and max(entry.size, entry.compressed_size) >= ZIP64_LIMIT:
+            raise ValueError(f"{arcname} grew past 4 GiB while it was being archived")
+        self._patch_local_header(entry, zip64)
+        self._entries.append(entry)
+
+    def _write_local_header(self, entry: _Entry, zip64: bool):
+        entry.offset = self._file.tell()
+        name = entry.arcname.encode("utf-8")
+        extra = struct.pack("<HHQQ", 0x0001, 16, 0, 0) if zip64 else b""
+        self._file.write(_LOCAL_HEADER.pack(
+            0x04034b50, self._version_needed(entry, zip64), self._flags(entry), entry.method,
+            self.dos_time, self.dos_date, 0,
+            ZIP64_LIMIT if zip64 else 0, ZIP64_LIMIT if zip64 else 0,
+            len(name), len(extra),
+        ))
+        self._file.write(name)
+        self._file.write(extra)
+
+    def _patch_local_header(self, entry: _Entry, zip64: bool):
+        end = self._file.tell()
+        self._file.seek(entry.offset + 14)
+        if zip64:
+            self._file.write(struct.pack("<I", entry.crc))
+            self._file.seek(entry.offset + 30 + len(entry.arcname.encode("utf-8")) + 4)
+            self._file.write(struct.pack("<QQ", entry.size, entry.compressed_size))
+        else:
+            self._file.write(struct.pack("<III", entry.crc, entry.compressed_size, entry.size))
+        self._file.seek(end)
+
+    def _write_blocks(self, entry: _Entry, blocks: Iterable[bytes], size: int):
+        if entry.method == _METHOD_STORED:
+            for block in blocks:
+                entry.crc = zlib.crc32(block, entry.crc)
+                entry.size += len(block)
+                self._file.write(block)
+            entry.compressed_size = entry.size
+        elif size >= PARALLEL_THRESHOLD:
+            # Chunked whatever the job count, so the bytes don't depend on the machine
+            self._deflate_parallel(entry, blocks)
+        else:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -15)
+            for block in blocks:
+                entry.crc = zlib.crc32(block, entry.crc)
+                entry.size += len(block)
+                self._emit(entry, compressor.compress(block))
+            self._emit(entry, compressor.flush())
+
+    def _deflate_parallel(self, entry: _Entry, blocks: Iterable[bytes]):
+        """Compress fixed-size chunks concurrently and write them back in order."""
+        pool = self._pool() if self.jobs > 1 else None
+        pending = deque()
+        max_pending = self.jobs * 2  # bounds memory to a few chunks per thread
+        window = b""
+        chunk = next(blocks, b"")
+        while True:
+            following = next(blocks, None)
+            last = following is None
+            entry.crc = zlib.crc32(chunk, entry.crc)
+            entry.size += len(chunk)
+            if self.jobs > 1:
+                pending.append(pool.submit(_compress_chunk, chunk, window, self.level, last))
+            else:
+                self._emit(entry, _compress_chunk(chunk, window, self.level, last))
+            window = chunk[-WINDOW_SIZE:] if len(chunk) >= WINDOW_SIZE else (window + chunk)[-WINDOW_SIZE:]
+            while len(pending) >= max_pending:
+                self._emit(entry, pending.popleft().result())
+            if last:
+                break
+            chunk = following
+        while pending:
+            self._emit(entry, pending.popleft().result())
+
+    def _emit(self, entry: _Entry, data: bytes):
+        if data:
+            entry.compressed_size += len(data)
+            self._file.write(data)
+
+    def _version_needed(self, entry: _Entry, zip64: bool) -> int:
+        if zip64:
+            return 45
+        return 20 if entry.method == _METHOD_DEFLATED or entry.is_dir else 10
+
+    @staticmethod
+    def _flags(entry: _Entry) -> int:
+        return 0 if entry.arcname.isascii() else _FLAG_UTF8
+
+    def close(self):
+        """Write the central directory and move the archive into place."""
+        cd_offset = self._file.tell()
+        for entry in self._entries:
+            name = entry.arcname.encode("utf-8")
+            zip64_fields = []
+            size, compressed_size, offset = entry.size, entry.compressed_size, entry.offset
+            if size >= ZIP64_LIMIT:
+                zip64_fields.append(size)
+                size = ZIP64_LIMIT
+            if compressed_size >= ZIP64_LIMIT:
+                zip64_fields.append(compressed_size)
+                compressed_size = ZIP64_LIMIT
+            if offset >= ZIP64_LIMIT:
+                zip64_fields.append(offset)
+                offset = ZIP64_LIMIT
+            extra = b""
+            if zip64_fields:
+                extra = struct.pack(f"<HH{len(zip64_fields)}Q", 0x0001, 8 * len(zip64_fields), *zip64_fields)
+            external_attr = (entry.mode << 16) | (0x10 if entry.is_dir else 0)
+            self._file.write(_CENTRAL_HEADER.pack(
+                0x02014b50, _MADE_BY_UNIX, self._version_needed(entry, bool(zip64_fields)),
+                self._flags(entry), entry.method, self.dos_time, self.dos_date,
+                entry.crc, compressed_size, size, len(name), len(extra), 0, 0, 0,
+                external_attr, offset,
+            ))
+            self._file.write(name)
+            self._file.write(extra)
+        cd_end = self._file.tell()
+        cd_size = cd_end - cd_offset
+        count = len(self._entries)
+
+        if count >= ZIP64_COUNT_LIMIT or cd_offset >= ZIP64_LIMIT or cd_size >= ZIP64_LIMIT:
+            self._file.write(_END_RECORD64.pack(
+                0x06064b50, _END_RECORD64.size - 12, _MADE_BY_UNIX, 45, 0, 0, count, count, cd_size, cd_offset
+            ))
+            self._file.write(_END_LOCATOR64.pack(0x07064b50, 0, cd_end, 1))
+        self._file.write(_END_RECORD.pack(
+            0x06054b50, 0, 0,
+            min(count, ZIP64_COUNT_LIMIT), min(count, ZIP64_COUNT_LIMIT),
+            min(cd_size, ZIP64_LIMIT), min(cd_offset, ZIP64_LIMIT), 0,
+        ))
+        self._file.close()
+        self._shutdown_pool()
+        os.replace(self._tmp_path, self.output_path)
+
+    def abort(self):
+        """Discard a partially written archive."""
+        self._file.close()
+        self._shutdown_pool()
+        try:
+            self._tmp_path.unlink()
+        except FileNotFoundError:
+            pass
+
+    def _shutdown_pool(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+def iter_tree(folder: Path, arcname_root: str = None) -> list[tuple[str, Optional[Path]]]:
+    """
+    List (arcname, path) for a directory tree in sorted, reproducible order.
+
+    Directories get their own entries (path None), like shutil.make_archive.
+    """
+    folder = Path(folder)
+    root = arcname_root if arcname_root is not None else folder.name
+    entries = [(root, None)] if root else []
+    for dirpath, dirnames, filenames in os.walk(folder):
+        dirnames.sort()
+        relative = Path(dirpath).relative_to(folder)
+        prefix = "/".join(p for p in (root, relative.as_posix()) if p and p != ".")
+        for name in dirnames:
+            entries.append((f"{prefix}/{name}" if prefix else name, None))
+        for name in filenames:
+            entries.append((f"{prefix}/{name}" if prefix else name, Path(dirpath) / name))
+    entries.sort(key=lambda e: e[0])
+    return entries
+
+
+def write_zip(output_path: Path, entries: Iterable[tuple[str, Source]], level: int = 6, jobs: Optional[int] = None) -> Path:
+    """Write (arcname, source) pairs to a reproducible zip archive."""
+    with span("zip write", category="io", path=str(output_path)) as s:
+        with ZipWriter(output_path, level=level, jobs=jobs) as writer:
+            for arcname, source in entries:
+                writer.write(arcname, source)
+        s.set(bytes=os.path.getsize(output_path))
+    return Path(output_path)
@@ -0,0 +1,188 @@
+# repronotebook/ro_crate_library/externalize.py
+
+import argparse
+import base64
+import binascii
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Optional
+from rich import print
+
+# Outputs at least this large (in bytes of notebook JSON) are moved to blob files
+EXTERNALIZE_MIN_SIZE = 64 * 1024
+
+# Crate folder holding the extracted outputs, relative to the notebook
+BLOBS_DIR = "blobs"
+
+# Stored in the output's metadata so rehydrate_notebook() can restore the data
+METADATA_KEY = "repronotebook"
+
+_EXTENSIONS = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/svg+xml": ".svg",
+    "image/webp": ".webp",
+    "application/pdf": ".pdf",
+    "text/html": ".html",
+    "text/markdown": ".md",
+    "text/latex": ".tex",
+    "text/plain": ".txt",
+    "application/javascript": ".js",
+}
+
+
+def _is_base64(mime: str) -> bool:
+    # nbformat stores every non-text, non-JSON mimetype base64-encoded, except SVG
+    return not (mime.startswith("text/") or mime == "image/svg+xml" or mime.endswith("json") or mime == "application/javascript")
+
+
+def _encode(mime: str, payload: str) -> tuple[bytes, dict]:
+    """Blob bytes for a payload, and what rehydrating needs to rebuild it exactly."""
+    if _is_base64(mime):
+        stripped = payload.rstrip("\n")
+        try:
+            data = base64.b64decode(stripped, validate=True)
+        except (binascii.Error, ValueError):
+            data = None
+        # Only store the decoded image if encoding it again gives the same text
+        if data is not None and base64.b64encode(data).decode("ascii") == stripped:
+            return data, {"encoding": "base64", "suffix": payload[len(stripped):]}
+    return payload.encode("utf-8"), {"encoding": "utf-8"}
+
+
+def _decode(data: bytes, reference: dict) -> str:
+    if reference["encoding"] == "base64":
+        return base64.b64encode(data).decode("ascii") + reference.get("suffix", "")
+    return data.decode("utf-8")
+
+
+def write_blob(blobs_dir: Path, data: bytes, extension: str = "") -> str:
+    """
+    Store data as <blobs_dir>/<sha256><extension> and return the file name.
+
+    Identical data is written once; concurrent writers are safe because the
+    file only appears under its final name when it is complete.
+    """
+    name = hashlib.sha256(data).hexdigest() + extension
+    path = Path(blobs_dir) / name
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{name}.")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            # mkstemp creates the file private to its owner
+            os.chmod(tmp, 0o644)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+    return name
+
+
+def externalize_notebook(notebook_path: Path, output_path: Path, blobs_dir: Path,
+                         min_size: int = EXTERNALIZE_MIN_SIZE) -> dict[str, dict]:
+    """
+    Move large outputs of a notebook into content-addressed blob files.
+
+    Every display_data / execute_result payload of at least min_size bytes is
+    written to blobs_dir as <sha256>.<ext> (decoded for base64 images) and
+    removed from the notebook written to output_path. The output's metadata
+    records the blob as blobs/<sha256>.<ext>, i.e. relative to the notebook
+    once it is packaged. Returns blob file name -> {"mime", "size", "sha256"}
+    for every blob the notebook references.
+    """
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        nb = json.load(f)
+
+    blobs = {}
+    for cell in nb.get("cells", []):
+        for output in cell.get("outputs", []):
+            if output.get("output_type") not in ("display_data", "execute_result"):
+                continue
+            data = output.get("data", {})
+            references = {}
+            for mime, payload in list(data.items()):
+                # JSON mimetypes (widgets, Vega...) hold objects, not text
+                if isinstance(payload, list) and all(isinstance(line, str) for line in payload):
+                    text, as_lines = "".join(payload), True
+                elif isinstance(payload, str):
+                    text, as_lines = payload, False
+                else:
+                    continue
+                if len(text) < min_size:
+                    continue
+                blob, reference = _encode(mime, text)
+                name = write_blob(blobs_dir, blob, _EXTENSIONS.get(mime, ".bin"))
+                blobs[name] = {"mime": mime, "size": len(blob), "sha256": name.split(".")[0]}
+                references[mime] = {"path": f"{BLOBS_DIR}/{name}", "lines": as_lines, **reference}
+                del data[mime]
+            if references:
+                if "text/plain" not in data:
+                    data["text/plain"] = f"<{', '.join(references)} output stored in {BLOBS_DIR}/>"
+                    # An externalized text/plain keeps its blob reference; rehydrating replaces the placeholder
+                    if "text/plain" not in references:
+                        references["text/plain"] = {"placeholder": True}
+                output.setdefault("metadata", {}).setdefault(METADATA_KEY, {})["externalized"] = references
+
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(nb, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+    return blobs
+
+
+def rehydrate_notebook(notebook_path: Path, output_path: Optional[Path] = None) -> Path:
+    """
+    Put externalized outputs back into a notebook, undoing externalize_notebook().
+
+    Blob paths are resolved against the notebook's folder, e.g. inside an
+    unpacked RO-Crate. Each blob's sha256 is checked before it is inlined.
+    Writes output_path (the notebook itself by default) and returns it.
+    """
+    notebook_path = Path(notebook_path)
+    with open(notebook_path, "r", encoding="utf-8") as f:
+        nb = json.load(f)
+
+    for cell in nb.get("cells", []):
+        for output in cell.get("outputs", []):
+            metadata = output.get("metadata", {})
+            references = metadata.get(METADATA_KEY, {}).pop("externalized", None)
+            if not references:
+                continue
+            data = output.setdefault("data", {})
+            for mime, reference in references.items():
+                if reference.get("placeholder"):
+                    data.pop(mime, None)
+                    continue
+                blob = (notebook_path.parent / reference["path"]).read_bytes()
+                if hashlib.sha256(blob).hexdigest() != Path(reference["path"]).name.split(".")[0]:
+                    raise ValueError(f"{reference['path']} does not match its checksum")
+                text = _decode(blob, reference)
+                data[mime] = text.splitlines(keepends=True) if reference["lines"] else text
+            if not metadata[METADATA_KEY]:
+                del metadata[METADATA_KEY]
+
+    output_path = Path(output_path or notebook_path)
+    with open(output_path, "w", encoding="utf-8") as f:
+        json.dump(nb, f, indent=1, ensure_ascii=False)
+        f.write("\n")
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Restore outputs a packaged notebook keeps in blobs/")
+    parser.add_argument("notebook", type=Path, help="Notebook inside an unpacked RO-Crate")
+    parser.add_argument("--output", "-o", type=Path, help="Where to write the restored notebook (default: in place)")
+    args = parser.parse_args(argv)
+    output_path = rehydrate_notebook(args.notebook, args.output)
+    print(f"[green]✅ Restored notebook written to {output_path}[/]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# repronotebook/ro_crate_library/fixity.py
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional
+from repronotebook.checks_pipeline.tracing import span
+
+INDEX_VERSION = 1
+BLOCK_SIZE = 8 * 1024 * 1024
+# Smaller files are read into a reused buffer; mapping them costs more than it saves
+MMAP_MIN_SIZE = 16 * 1024 * 1024
+
+
+def file_checksums(path: Path) -> dict[str, str]:
+    """sha256 and md5 of a file, computed in one pass over its bytes."""
+    sha256, md5 = hashlib.sha256(), hashlib.md5()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size >= MMAP_MIN_SIZE:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+                for offset in range(0, len(view), BLOCK_SIZE):
+                    with view[offset:offset + BLOCK_SIZE] as block:
+                        sha256.update(block)
+                        md5.update(block)
+        else:
+            buffer = bytearray(BLOCK_SIZE)
+            with memoryview(buffer) as view:
+                while True:
+                    n = f.readinto(buffer)
+                    if not n:
+                        break
+                    with view[:n] as block:
+                        sha256.update(block)
+                        md5.update(block)
+    return {"sha256": sha256.hexdigest(), "md5": md5.hexdigest()}
+
+
+def _stat_key(stat: os.stat_result) -> str:
+    # A rewritten file gets a new mtime; a replaced one a new inode
+    return f"{stat.st_dev}:{stat.st_ino}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _load_index(index_path: Optional[Path]) -> dict:
+    if index_path is None or not Path(index_path).exists():
+        return {}
+    try:
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return index.get("entries", {}) if index.get("version") == INDEX_VERSION else {}
+
+
+def _save_index(index_path: Path, entries: dict):
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=index_path.parent, prefix=f".{index_path.name}.")
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump({"version": INDEX_VERSION, "entries": entries}, f)
+        os.replace(tmp, index_path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def compute_fixity(files: dict[str, Path], index_path: Optional[Path] = None,
+                   jobs: Optional[int] = None) -> tuple[dict[str, dict], int]:
+    """
+    Checksum every file of a crate (crate-relative path -> file).
+
+    Results are cached in the sidecar index_path keyed by (device, inode,
+    size, mtime_ns), so only new or modified files are read again. Those are
+    hashed in a thread pool; hashlib releases the GIL on large buffers.
+    Returns crate path -> {"sha256", "md5", "size"} and how many files were
+    hashed. The index is rewritten to hold just these files.
+    """
+    known = _load_index(index_path)
+    entries, checksums, pending = {}, {}, []
+    for rel_path, path in files.items():
+        stat = os.stat(path)
+        key = _stat_key(stat)
+        if key in known:
+            entries[key] = known[key]
+            checksums[rel_path] = {**known[key], "size": stat.st_size}
+        else:
+            pending.append((rel_path, path, stat, key))
+
+    if pending:
+        with span("fixity", category="io", files=len(pending)) as s:
+            workers = jobs or min(8, os.cpu_count() or 1)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                hashed = executor.map(lambda item: file_checksums(item[1]), pending)
+                for (rel_path, path, stat, key), sums in zip(pending, hashed):
+                    entries[key] = sums
+                    checksums[rel_path] = {**sums, "size": stat.st_size}
+            s.set(bytes=sum(item[2].st_size for item in pending))
+
+    if index_path is not None and (pending or len(entries) != len(known)):
+        _save_index(index_path, entries)
+    return checksums, len(pending)
+
+
+def tree_files(folder: Path) -> dict[str, Path]:
+    """Every file under folder keyed by its relative POSIX path; symlinked folders are not followed."""
+    folder = Path(folder)
+    files = {}
+    for root, _, names in os.walk(folder):
+        for name in names:
+            path = Path(root) / name
+            if path.is_file():
+                files[path.relative_to(folder).as_posix()] = path
+    return files
+
+
+def fixity_index_path(crate_folder: Path) -> Path:
+    """Sidecar index next to the crate, so it survives the crate being rebuilt."""
+    crate_folder = Path(crate_folder)
+    return crate_folder.with_name(f".{crate_folder.name}.fixity.json")
+
+
+def fixity_properties(sums: dict) -> dict:
+    """File entity properties recording a file's checksums."""
+    return {"sha256": sums["sha256"], "md5": sums["md5"], "contentSize": str(sums["size"])}
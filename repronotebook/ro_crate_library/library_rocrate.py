@@ -1,7 +1,12 @@
 from rocrate.rocrate import ROCrate
 from pathlib import Path
 from datetime import date
+import shutil
 from rocrate.model.person import Person
+from repronotebook.checks_pipeline.tracing import span
+from repronotebook.ro_crate_library.fixity import compute_fixity, fixity_index_path, fixity_properties, tree_files
+from repronotebook.ro_crate_library.materialize import materialize, materialize_tree
+from repronotebook.ro_crate_library.metadata_writer import PYTHON_LANGUAGE, write_crate_metadata
 
 def extract_readme_metadata(folder: Path):
     readme = folder / "README.md"
@@ -25,34 +30,24 @@ def extract_license(folder: Path):
     return "https://creativecommons.org/licenses/by/4.0/"  # fallback default
 
 
-def generate_ro_crate_with_library(folder_path: str, author_name: str):
-    # set up input and output paths to folders
-    folder = Path(folder_path).resolve()
-    crate_folder = folder.with_name(f"{folder.name}-library-ro-crate_v2")
-
-
-    # Create a new RO-Crate object
-    crate = ROCrate()
-
-   # Add all files including subfolders
-    for file in folder.rglob("*"):
-        if file.is_file():
-            rel_path = file.relative_to(folder)
-            crate.add_file(str(file), dest_path=str(rel_path))
-    
+def _dataset_properties(folder: Path) -> dict:
+    """Root dataset properties read from the README and LICENSE in folder."""
     # Extract title/description/license metadata
     title, description = extract_readme_metadata(folder)
-    license_url = extract_license(folder)
+    return {
+        "name": title,
+        "description": description,
+        "datePublished": str(date.today()),
+        #"keywords": ["jupyter", "reproducibility", "RO-Crate", "notebook", "biomedical"],
+        "license": extract_license(folder),
+    }
 
- 
 
+def _describe_crate(crate: ROCrate, folder: Path, author_name: str):
     # Add dataset root info
     root = crate.root_dataset
-    root["name"] = title
-    root["description"] = description
-    root["datePublished"] = str(date.today())
-    #root["keywords"] = ["jupyter", "reproducibility", "RO-Crate", "notebook", "biomedical"]
-    root["license"] = license_url
+    for key, value in _dataset_properties(folder).items():
+        root[key] = value
 
     # Add author info 
     author = Person(crate, "#author", properties={
@@ -64,13 +59,87 @@ def generate_ro_crate_with_library(folder_path: str, author_name: str):
      # Mark any notebook as written in Python
     for entity in crate.get_entities():
         if entity.id.endswith(".ipynb"):
-            entity["programmingLanguage"] = {
-                "@id": "https://w3id.org/ro/terms#Python",
-                "name": "Python",
-                "alternateName": "py"
-            }
+            entity["programmingLanguage"] = dict(PYTHON_LANGUAGE)
+
+
+class _FixityProperties:
+    """File entity checksum properties, built as write_crate_metadata() reaches each file."""
+
+    def __init__(self, checksums: dict):
+        self.checksums = checksums
+
+    def get(self, rel_path: str, default=()):
+        sums = self.checksums.get(rel_path)
+        return fixity_properties(sums) if sums else default
+
+
+def generate_ro_crate_with_library(folder_path: str, author_name: str):
+    """
+    Package every file under folder_path as an RO-Crate next to it.
+
+    Files are reflinked, hardlinked or copied into the crate and
+    ro-crate-metadata.json is streamed while walking the tree, instead of
+    building rocrate-py's object graph, so folders with 100k+ files take
+    seconds and the metadata writer itself runs in flat memory. Every file's
+    sha256 and md5 are recorded; only files changed since the last packaging
+    are read to compute them. The checksums (and their sidecar index) hold
+    one small entry per file, so that part still grows with the tree.
+    """
+    # set up input and output paths to folders
+    folder = Path(folder_path).resolve()
+    crate_folder = folder.with_name(f"{folder.name}-library-ro-crate_v2")
+    if crate_folder.exists():
+        shutil.rmtree(crate_folder)
+    crate_folder.mkdir(parents=True)
+
+    counts = materialize_tree(folder, crate_folder)
+    checksums, hashed = compute_fixity(tree_files(folder), fixity_index_path(crate_folder))
+    with span("rocrate write", category="io") as s:
+        stats = write_crate_metadata(
+            crate_folder,
+            {**_dataset_properties(folder), "author": {"@id": "#author"}},
+            extra_entities=[{"@id": "#author", "@type": "Person", "name": author_name}],
+            file_properties=_FixityProperties(checksums),
+        )
+        s.set(files=stats["files"], bytes=(crate_folder / "ro-crate-metadata.json").stat().st_size)
+
+    linked = counts["reflink"] + counts["hardlink"]
+    print(f"✅ RO-Crate generated at: {crate_folder} ({stats['files']} file(s), {linked} linked, {counts['copy']} copied, {hashed} hashed)")
+    return crate_folder
+
+
+def generate_ro_crate_from_manifest(manifest: dict, crate_folder: Path, author_name: str, metadata_folder: Path = None,
+                                    file_properties: dict = None):
+    """
+    Build an RO-Crate from an explicit manifest of crate path -> source file.
+
+    Files are placed in crate_folder by reflink or hardlink where the
+    filesystem allows it (copied otherwise), and only ro-crate-metadata.json
+    is written by rocrate-py, so data is never copied through a temp folder.
+    Title, description and license are read from metadata_folder.
+    file_properties maps crate paths to extra properties of their File entity.
+    Checksums of every file are recorded, reusing those of unchanged sources.
+    """
+    crate_folder = Path(crate_folder)
+    manifest = {str(rel_path): Path(source).resolve() for rel_path, source in manifest.items()}
+    if crate_folder.exists():
+        shutil.rmtree(crate_folder)
+    crate_folder.mkdir(parents=True)
+
+    checksums, hashed = compute_fixity(manifest, fixity_index_path(crate_folder))
+    crate = ROCrate()
+    for rel_path, source in sorted(manifest.items()):
+        properties = {**fixity_properties(checksums[rel_path]), **(file_properties or {}).get(rel_path, {})}
+        crate.add_file(str(source), dest_path=rel_path, properties=properties)
+    _describe_crate(crate, Path(metadata_folder or crate_folder).resolve(), author_name)
 
-    # Write the crate to disk
-    crate.write_crate(crate_folder)
+    with span("materialize", category="io", files=len(manifest)) as s:
+        counts = materialize(manifest, crate_folder)
+        s.set(**counts)
+    with span("rocrate write", category="io") as s:
+        crate.metadata.write(crate_folder)
+        s.set(bytes=(crate_folder / "ro-crate-metadata.json").stat().st_size)
 
-    print(f"✅ RO-Crate generated using rocrate-py at: {crate_folder}")
+    linked = counts["reflink"] + counts["hardlink"]
+    print(f"✅ RO-Crate generated using rocrate-py at: {crate_folder} ({linked} file(s) linked, {counts['copy']} copied, {hashed} hashed)")
+    return crate_folder
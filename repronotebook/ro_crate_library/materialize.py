@@ -0,0 +1,102 @@
+# repronotebook/ro_crate_library/materialize.py
+
+import errno
+import os
+import shutil
+import sys
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows: no reflinks, hardlinks and copies still work
+    fcntl = None
+
+# ioctl(dest_fd, FICLONE, src_fd): copy-on-write clone on btrfs, XFS, bcachefs...
+FICLONE = 0x40049409
+
+# A hardlink shares the inode, so a source rewritten in place would change
+# the crate too. Small files are cheap to copy; only large ones are linked.
+HARDLINK_MIN_SIZE = 1024 * 1024
+
+# Errors that mean "this link type is not possible here", not a real failure
+_UNSUPPORTED = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.ENOTSUP, errno.EOPNOTSUPP, errno.EINVAL, errno.ENOTTY}
+
+
+def _reflink(source: Path, dest: Path) -> bool:
+    if fcntl is None or not sys.platform.startswith("linux"):
+        return False
+    with open(source, "rb") as src, open(dest, "wb") as dst:
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        except OSError as e:
+            if e.errno in _UNSUPPORTED:
+                dst.close()
+                dest.unlink()
+                return False
+            raise
+    shutil.copystat(source, dest)
+    return True
+
+
+def link_or_copy(source: Path, dest: Path, reflink: bool = True) -> str:
+    """
+    Place source at dest without copying data when the filesystem allows it.
+
+    Tries a reflink (copy-on-write clone, unless reflink=False), then a
+    hardlink for files of at least HARDLINK_MIN_SIZE bytes, then falls back
+    to a regular copy. Returns which of "reflink", "hardlink" or "copy" was used.
+    """
+    source, dest = Path(source), Path(dest)
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+
+    if reflink and _reflink(source, dest):
+        return "reflink"
+    if source.stat().st_size >= HARDLINK_MIN_SIZE:
+        try:
+            os.link(source, dest)
+            return "hardlink"
+        except OSError as e:
+            if e.errno not in _UNSUPPORTED:
+                raise
+    shutil.copy2(source, dest)
+    return "copy"
+
+
+def materialize(manifest: dict[str, Path], dest_folder: Path) -> dict[str, int]:
+    """
+    Lay out manifest entries (crate-relative path -> source file) under dest_folder.
+
+    Returns how many files were reflinked, hardlinked and copied.
+    """
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0}
+    dest_folder = Path(dest_folder)
+    for rel_path, source in manifest.items():
+        counts[link_or_copy(source, dest_folder / rel_path)] += 1
+    return counts
+
+
+def materialize_tree(source_folder: Path, dest_folder: Path) -> dict[str, int]:
+    """
+    Lay out every file under source_folder at the same relative path under dest_folder.
+
+    The tree is walked with os.scandir without collecting it first, and
+    symlinked directories are not followed. Returns the same counts as materialize().
+    """
+    counts = {"reflink": 0, "hardlink": 0, "copy": 0}
+    # Source and crate stay on the same filesystems for the whole tree, so one
+    # refused reflink means the rest would be refused too
+    reflink = True
+    pending = [(str(source_folder), Path(dest_folder))]
+    while pending:
+        source_dir, dest_dir = pending.pop()
+        with os.scandir(source_dir) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, dest_dir / entry.name))
+                elif entry.is_file():
+                    method = link_or_copy(Path(entry.path), dest_dir / entry.name, reflink=reflink)
+                    reflink = method == "reflink"
+                    counts[method] += 1
+    return counts
@@ -0,0 +1,225 @@
+# repronotebook/ro_crate_library/metadata_writer.py
+
+import heapq
+import json
+import mimetypes
+import os
+import stat
+import tempfile
+from pathlib import Path
+from typing import Iterator
+from urllib.parse import quote
+from rocrate.model.metadata import BASENAME, DEFAULT_VERSION
+
+# Same language entity _describe_crate() attaches to notebooks
+PYTHON_LANGUAGE = {
+    "@id": "https://w3id.org/ro/terms#Python",
+    "name": "Python",
+    "alternateName": "py",
+}
+
+# Names sorted in memory at a time; larger folders are merged from sorted runs on disk
+SORT_RUN_SIZE = 50_000
+
+# Formats mimetypes does not know about
+_ENCODING_FORMATS = {
+    ".ipynb": "application/x-ipynb+json",
+    ".yml": "application/yaml",
+    ".yaml": "application/yaml",
+    ".md": "text/markdown",
+}
+
+
+def encoding_format(name: str):
+    suffix = os.path.splitext(name)[1].lower()
+    return _ENCODING_FORMATS.get(suffix) or mimetypes.guess_type(name, strict=False)[0]
+
+
+class _GraphWriter:
+    """Writes @graph entities one at a time, formatted like rocrate-py's output."""
+
+    # Stands in for a streamed hasPart list while the rest of the entity is formatted
+    _PARTS = "\0hasPart\0"
+
+    def __init__(self, f):
+        self.f = f
+        self.first = True
+
+    def write(self, entity: dict, parts: Iterator[str] = None):
+        """Write an entity; parts, if given, are the @ids of its hasPart, streamed in."""
+        if parts is not None:
+            entity = {**entity, "hasPart": self._PARTS}
+        text = json.dumps(entity, indent=4, sort_keys=True, ensure_ascii=False).replace("\n", "\n        ")
+        self.f.write("\n        " if self.first else ",\n        ")
+        self.first = False
+        if parts is None:
+            self.f.write(text)
+            return
+        before, after = text.split(json.dumps(self._PARTS), 1)
+        self.f.write(before + "[")
+        separator = "\n"
+        for part in parts:
+            item = json.dumps({"@id": part}, indent=4, ensure_ascii=False)
+            self.f.write(separator + " " * 16 + item.replace("\n", "\n" + " " * 16))
+            separator = ",\n"
+        self.f.write("\n" + " " * 12 + "]" + after)
+
+
+def _sorted_names(path: str) -> Iterator[str]:
+    """
+    Entry names of a folder in sorted order.
+
+    Up to SORT_RUN_SIZE names are sorted in memory; bigger folders are
+    spilled to sorted runs on disk and merged, so a folder of any size is
+    listed in bounded memory.
+    """
+    runs, batch = [], []
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                batch.append(entry.name)
+                if len(batch) >= SORT_RUN_SIZE:
+                    runs.append(_spill(sorted(batch)))
+                    batch = []
+        batch.sort()
+        if not runs:
+            yield from batch
+            return
+        runs.append(_spill(batch))
+        del batch
+        # json.dumps keeps names containing newlines on one line
+        yield from heapq.merge(*((json.loads(line) for line in run) for run in runs))
+    finally:
+        for run in runs:
+            run.close()
+
+
+def _spill(names: list[str]):
+    run = tempfile.TemporaryFile("w+", encoding="utf-8")
+    for name in names:
+        run.write(json.dumps(name) + "\n")
+    run.seek(0)
+    return run
+
+
+class _PartsSpill:
+    """
+    hasPart @ids of the folders being walked, one spill file per depth.
+
+    A folder's children are recorded while its subtree is written; its own
+    entity is written after them, streaming the list back. Only the open
+    folders along the current path use a file, so memory follows the
+    depth of the tree, not the number of entries.
+    """
+
+    def __init__(self):
+        self.files = []
+
+    def start(self, depth: int):
+        while len(self.files) <= depth:
+            self.files.append(tempfile.TemporaryFile("w+", encoding="utf-8"))
+        f = self.files[depth]
+        f.seek(0)
+        f.truncate()
+
+    def add(self, depth: int, entity_id: str):
+        self.files[depth].write(json.dumps(entity_id) + "\n")
+
+    def read(self, depth: int) -> Iterator[str]:
+        f = self.files[depth]
+        f.seek(0)
+        return (json.loads(line) for line in f)
+
+    def close(self):
+        for f in self.files:
+            f.close()
+
+
+def _walk(writer: _GraphWriter, spill: _PartsSpill, path: str, rel: str, depth: int, stats: dict,
+          file_properties: dict) -> int:
+    """Write the entities under one directory, children first; record its hasPart at depth; return its size."""
+    spill.start(depth)
+    count = 0
+    for name in _sorted_names(path):
+        # The metadata file itself, or its half-written temp file
+        if not rel and (name == BASENAME or name.startswith(f".{BASENAME}.")):
+            continue
+        entry_path = os.path.join(path, name)
+        entry_rel = rel + name
+        try:
+            st = os.lstat(entry_path)
+            link = stat.S_ISLNK(st.st_mode)
+            if link:
+                st = os.stat(entry_path)
+        except OSError:
+            continue
+        # Symlinked directories are skipped so a link cycle cannot loop forever
+        if stat.S_ISDIR(st.st_mode) and not link:
+            entity = {"@id": quote(entry_rel + "/"), "@type": "Dataset", "name": name}
+            children = _walk(writer, spill, entry_path, entry_rel + "/", depth + 1, stats, file_properties)
+            writer.write(entity, spill.read(depth + 1) if children else None)
+            stats["datasets"] += 1
+        elif stat.S_ISREG(st.st_mode):
+            entity = {"@id": quote(entry_rel), "@type": "File", "contentSize": str(st.st_size)}
+            fmt = encoding_format(name)
+            if fmt:
+                entity["encodingFormat"] = fmt
+            if name.endswith(".ipynb"):
+                entity["programmingLanguage"] = PYTHON_LANGUAGE
+            entity.update(file_properties.get(entry_rel, ()))
+            writer.write(entity)
+            stats["files"] += 1
+            stats["bytes"] += st.st_size
+        else:
+            continue
+        spill.add(depth, entity["@id"])
+        count += 1
+    return count
+
+
+def write_crate_metadata(crate_folder: Path, root_properties: dict = None, extra_entities: list = (),
+                         file_properties: dict = None, version: str = DEFAULT_VERSION) -> dict[str, int]:
+    """
+    Stream ro-crate-metadata.json for every file and folder under crate_folder.
+
+    The tree is walked with os.scandir and each File / Dataset entity is
+    written as soon as it is seen. Folder listings are sorted in bounded
+    runs and hasPart lists are spilled to temp files, so the writer's memory
+    stays flat however many files the crate or a single folder holds.
+    Folders are Dataset entities listing their direct children in hasPart;
+    the root dataset (with root_properties) comes after its contents,
+    followed by extra_entities such as the author. file_properties maps
+    crate paths to extra properties of their File entity (looked up per
+    file, so any mapping works). Returns the number of files, datasets and
+    bytes described.
+    """
+    crate_folder = Path(crate_folder)
+    stats = {"files": 0, "datasets": 0, "bytes": 0}
+    fd, tmp = tempfile.mkstemp(dir=crate_folder, prefix=f".{BASENAME}.")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write('{\n    "@context": %s,\n    "@graph": [' % json.dumps(f"https://w3id.org/ro/crate/{version}/context"))
+            writer = _GraphWriter(f)
+            writer.write({
+                "@id": BASENAME,
+                "@type": "CreativeWork",
+                "about": {"@id": "./"},
+                "conformsTo": {"@id": f"https://w3id.org/ro/crate/{version}"},
+            })
+            spill = _PartsSpill()
+            try:
+                parts = _walk(writer, spill, str(crate_folder), "", 0, stats, file_properties or {})
+                root = {"@id": "./", "@type": "Dataset", **(root_properties or {})}
+                writer.write(root, spill.read(0) if parts else None)
+            finally:
+                spill.close()
+            for entity in extra_entities:
+                writer.write(entity)
+            f.write("\n    ]\n}\n")
+        # mkstemp creates the file private to its owner
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, crate_folder / BASENAME)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+    return stats
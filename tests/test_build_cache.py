@@ -0,0 +1,92 @@
+from repronotebook.checks_pipeline.build_cache import BuildCache
+
+
+def _run_stage(cache, source, output, runs):
+    """A stage that writes output from source, skipped when the cache allows it."""
+    digest = cache.digest(source)
+    if cache.lookup("stage", digest) is None:
+        runs.append(source.read_text())
+        output.write_text(source.read_text().upper())
+        cache.record("stage", digest, outputs=[output], data={"length": len(source.read_text())})
+
+
+def test_unchanged_inputs_skip_the_stage(tmp_path):
+    source, output, manifest = tmp_path / "in.txt", tmp_path / "out.txt", tmp_path / "cache.json"
+    source.write_text("a")
+    runs = []
+
+    cache = BuildCache(manifest)
+    _run_stage(cache, source, output, runs)
+    cache.save()
+
+    cache = BuildCache(manifest)
+    _run_stage(cache, source, output, runs)
+    assert runs == ["a"]
+    assert (cache.hits, cache.misses) == (1, 0)
+    assert cache.lookup("stage", cache.digest(source)) == {"length": 1}
+
+
+def test_changed_input_reruns_the_stage(tmp_path):
+    source, output, manifest = tmp_path / "in.txt", tmp_path / "out.txt", tmp_path / "cache.json"
+    source.write_text("a")
+    runs = []
+    cache = BuildCache(manifest)
+    _run_stage(cache, source, output, runs)
+    cache.save()
+
+    source.write_text("b")
+    _run_stage(BuildCache(manifest), source, output, runs)
+    assert runs == ["a", "b"]
+    assert output.read_text() == "B"
+
+
+def test_missing_or_edited_output_reruns_the_stage(tmp_path):
+    source, output, manifest = tmp_path / "in.txt", tmp_path / "out.txt", tmp_path / "cache.json"
+    source.write_text("a")
+    runs = []
+    cache = BuildCache(manifest)
+    _run_stage(cache, source, output, runs)
+    cache.save()
+
+    output.write_text("tampered")
+    _run_stage(BuildCache(manifest), source, output, runs)
+    output.unlink()
+    _run_stage(BuildCache(manifest), source, output, runs)
+    assert runs == ["a", "a", "a"]
+
+
+def test_force_ignores_the_manifest(tmp_path):
+    source, output, manifest = tmp_path / "in.txt", tmp_path / "out.txt", tmp_path / "cache.json"
+    source.write_text("a")
+    runs = []
+    cache = BuildCache(manifest)
+    _run_stage(cache, source, output, runs)
+    cache.save()
+
+    _run_stage(BuildCache(manifest, force=True), source, output, runs)
+    assert runs == ["a", "a"]
+
+
+def test_digest_hashes_paths_by_content(tmp_path):
+    cache = BuildCache(tmp_path / "cache.json")
+    first, second = tmp_path / "first.txt", tmp_path / "second.txt"
+    first.write_text("same")
+    second.write_text("same")
+    assert cache.digest(first) == cache.digest(second)
+    assert cache.digest(first) != cache.digest(tmp_path / "missing.txt")
+    assert cache.digest(first, "x") != cache.digest(first, "y")
+
+
+def test_second_pipeline_run_reuses_every_stage(tmp_path, monkeypatch):
+    import nbformat
+    from repronotebook.checks_pipeline.pipeline import process_notebook
+
+    monkeypatch.chdir(tmp_path)
+    nb = tmp_path / "analysis.ipynb"
+    nbformat.write(nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell("import json\nprint(json.dumps(1))")]), nb)
+
+    first = process_notebook(nb, tmp_path, generate_rocrate=True)
+    second = process_notebook(nb, tmp_path, generate_rocrate=True)
+    assert first["cache_misses"] == 3
+    assert (second["cache_hits"], second["cache_misses"]) == (3, 0)
+    assert second["crate"] == first["crate"]
@@ -0,0 +1,75 @@
+import pytest
+from repronotebook.push_to_zenodo.deposition_sync import crate_files, sync_files
+from repronotebook.push_to_zenodo.emulator import ZenodoEmulator
+from repronotebook.push_to_zenodo.zenodo_upload import ZenodoUploader
+
+METADATA = {"title": "Test crate", "upload_type": "dataset"}
+
+
+@pytest.fixture
+def emulator():
+    with ZenodoEmulator() as emulator:
+        yield emulator
+
+
+@pytest.fixture
+def uploader(emulator):
+    with ZenodoUploader(access_token="test", base_url=emulator.api_url, backoff=0, show_progress=False) as uploader:
+        yield uploader
+
+
+@pytest.fixture
+def crate(tmp_path):
+    folder = tmp_path / "crate"
+    (folder / "data").mkdir(parents=True)
+    (folder / "ro-crate-metadata.json").write_text('{"@graph": []}')
+    (folder / "notebook.ipynb").write_text('{"cells": []}')
+    (folder / "data" / "table.csv").write_text("a,b\n1,2\n")
+    return folder
+
+
+def _sync(uploader, crate, state_path):
+    return sync_files(uploader, crate_files(crate), metadata=METADATA, state_path=state_path, publish=True)
+
+
+def test_unchanged_crate_does_not_open_a_new_version(emulator, uploader, crate, tmp_path):
+    state_path = tmp_path / "state.json"
+    first = _sync(uploader, crate, state_path)
+    assert sorted(first["uploaded"]) == ["data/table.csv", "notebook.ipynb", "ro-crate-metadata.json"]
+
+    second = _sync(uploader, crate, state_path)
+    assert second["deposition_id"] == first["deposition_id"]
+    assert second["doi"] == first["doi"]
+    assert second["uploaded"] == [] and second["bytes_uploaded"] == 0
+    assert len(emulator.store.depositions) == 1
+    assert emulator.stats["files_uploaded"] == 3
+
+
+def test_changed_crate_uploads_only_the_difference_to_a_new_version(emulator, uploader, crate, tmp_path):
+    state_path = tmp_path / "state.json"
+    first = _sync(uploader, crate, state_path)
+    (crate / "data" / "table.csv").write_text("a,b\n1,2\n3,4\n")
+    (crate / "notebook.ipynb").unlink()
+    (crate / "figure.svg").write_text("<svg/>")
+
+    second = _sync(uploader, crate, state_path)
+    assert second["deposition_id"] != first["deposition_id"]
+    assert second["doi"] != first["doi"]
+    assert sorted(second["uploaded"]) == ["data/table.csv", "figure.svg"]
+    assert second["unchanged"] == ["ro-crate-metadata.json"]
+    assert second["deleted"] == ["notebook.ipynb"]
+    version = emulator.store.depositions[int(second["deposition_id"])]
+    assert version["parent"] == int(first["deposition_id"])
+    assert sorted(version["files"]) == ["data/table.csv", "figure.svg", "ro-crate-metadata.json"]
+    # The published version is left as it was
+    assert "notebook.ipynb" in emulator.store.depositions[int(first["deposition_id"])]["files"]
+
+
+def test_draft_is_synced_in_place(emulator, uploader, crate, tmp_path):
+    state_path = tmp_path / "state.json"
+    first = sync_files(uploader, crate_files(crate), metadata=METADATA, state_path=state_path)
+    (crate / "data" / "table.csv").write_text("changed\n")
+    second = sync_files(uploader, crate_files(crate), metadata=METADATA, state_path=state_path)
+    assert second["deposition_id"] == first["deposition_id"]
+    assert second["uploaded"] == ["data/table.csv"]
+    assert len(emulator.store.depositions) == 1
@@ -0,0 +1,69 @@
+import json
+import os
+import pytest
+from repronotebook.checks_pipeline.conda_env import env_pool
+from repronotebook.checks_pipeline.conda_env.env_pool import CondaEnvPool, env_name_for_spec
+
+
+@pytest.fixture
+def env_yml(tmp_path):
+    path = tmp_path / "environment.yml"
+    path.write_text("name: nb\ndependencies:\n  - python=3.11\n")
+    return path
+
+
+@pytest.fixture
+def conda(tmp_path, monkeypatch):
+    """Fake Conda: envs are plain folders under tmp_path/envs."""
+    envs = tmp_path / "envs"
+    removed = []
+
+    def create(env_yml_path, env_name):
+        (envs / env_name).mkdir(parents=True, exist_ok=True)
+        return True
+
+    def remove(env_name):
+        removed.append(env_name)
+        if not (envs / env_name).is_dir():
+            return False
+        (envs / env_name).rmdir()
+        return True
+
+    monkeypatch.setattr(env_pool, "create_conda_env", create)
+    monkeypatch.setattr(env_pool, "remove_conda_env", remove)
+    monkeypatch.setattr(env_pool, "env_prefix", lambda name: envs / name if (envs / name).is_dir() else None)
+    return envs, removed
+
+
+def test_reused_env_is_leased_before_evict_can_see_it_idle(tmp_path, env_yml, conda, monkeypatch):
+    registry_path = tmp_path / "registry.json"
+    pool = CondaEnvPool(max_envs=1, registry_path=registry_path)
+    envs, removed = conda
+    pool.release(pool.acquire(env_yml))  # now registered and idle
+    real_create = env_pool.create_conda_env
+
+    def create_while_evicting(env_yml_path, env_name):
+        created = real_create(env_yml_path, env_name)
+        # Another worker with a smaller cap enforces it right after the env was found
+        CondaEnvPool(max_envs=0, registry_path=registry_path).evict()
+        return created
+
+    monkeypatch.setattr(env_pool, "create_conda_env", create_while_evicting)
+    env_name = pool.acquire(env_yml)
+    assert env_name == env_name_for_spec(env_yml)
+    assert (envs / env_name).is_dir()
+    assert removed == []
+
+
+def test_envs_removed_outside_the_pool_are_forgotten(tmp_path, env_yml, conda):
+    registry_path = tmp_path / "registry.json"
+    registry_path.write_text(json.dumps({
+        "repronotebook-gone": {"spec": "x", "prefix": str(tmp_path / "gone"), "size": 10, "created": 0,
+                               "last_used": 0, "leases": []},
+        "repronotebook-crashed": {"spec": "x", "prefix": None, "size": 0, "created": 0,
+                                  "last_used": 0, "leases": [2 ** 22 + 1]},
+    }))
+    pool = CondaEnvPool(max_envs=1, registry_path=registry_path)
+    env_name = pool.acquire(env_yml)
+    assert set(json.loads(registry_path.read_text())) == {env_name}
+    assert json.loads(registry_path.read_text())[env_name]["leases"] == [os.getpid()]
@@ -0,0 +1,53 @@
+import base64
+import json
+import os
+import pytest
+from repronotebook.ro_crate_library.externalize import BLOBS_DIR, externalize_notebook, rehydrate_notebook
+
+
+def _notebook(path):
+    png = base64.b64encode(os.urandom(3000)).decode("ascii") + "\n"
+    nb = {
+        "cells": [{
+            "cell_type": "code", "execution_count": 1, "metadata": {}, "source": "show()",
+            "outputs": [
+                {"output_type": "display_data", "metadata": {},
+                 "data": {"image/png": png, "text/plain": "<Figure>"}},
+                {"output_type": "execute_result", "execution_count": 1, "metadata": {},
+                 "data": {"text/plain": [f"row {i}\n" for i in range(1000)]}},
+                {"output_type": "stream", "name": "stdout", "text": "x" * 5000},
+            ],
+        }],
+        "metadata": {}, "nbformat": 4, "nbformat_minor": 5,
+    }
+    path.write_text(json.dumps(nb))
+    return nb
+
+
+def test_externalize_then_rehydrate_restores_outputs(tmp_path):
+    original = _notebook(tmp_path / "source.ipynb")
+    crate = tmp_path / "crate"
+    blobs = externalize_notebook(tmp_path / "source.ipynb", crate / "nb.ipynb", crate / BLOBS_DIR, min_size=1024)
+
+    assert {info["mime"] for info in blobs.values()} == {"image/png", "text/plain"}
+    # The png is stored decoded, not as base64 text
+    png_blob = next(name for name, info in blobs.items() if info["mime"] == "image/png")
+    assert (crate / BLOBS_DIR / png_blob).read_bytes() == base64.b64decode(original["cells"][0]["outputs"][0]["data"]["image/png"])
+    externalized = json.loads((crate / "nb.ipynb").read_text())
+    outputs = externalized["cells"][0]["outputs"]
+    assert "image/png" not in outputs[0]["data"]
+    assert outputs[1]["data"]["text/plain"].endswith(f"stored in {BLOBS_DIR}/>")
+    # Streams are never externalized
+    assert outputs[2] == original["cells"][0]["outputs"][2]
+
+    restored = rehydrate_notebook(crate / "nb.ipynb", tmp_path / "restored.ipynb")
+    assert json.loads(restored.read_text()) == original
+
+
+def test_rehydrate_rejects_a_modified_blob(tmp_path):
+    _notebook(tmp_path / "source.ipynb")
+    crate = tmp_path / "crate"
+    blobs = externalize_notebook(tmp_path / "source.ipynb", crate / "nb.ipynb", crate / BLOBS_DIR, min_size=1024)
+    (crate / BLOBS_DIR / next(iter(blobs))).write_bytes(b"tampered")
+    with pytest.raises(ValueError, match="checksum"):
+        rehydrate_notebook(crate / "nb.ipynb")
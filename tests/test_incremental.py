@@ -0,0 +1,51 @@
+import re
+import nbformat
+from repronotebook.checks_pipeline.execution import incremental
+from repronotebook.checks_pipeline.execution.incremental import CellCache
+
+
+def _kernel(checkpoint_size):
+    """Stand-in for run_hidden: writes a checkpoint_size byte file for every checkpoint call."""
+    def run_hidden(code):
+        match = re.search(r"checkpoint\('([^']+)'\)", code)
+        if match:
+            with open(match.group(1), "wb") as f:
+                f.write(b"\0" * checkpoint_size)
+        return {"status": "ok"}
+    return run_hidden
+
+
+def _run(folder, cells=10, checkpoint_size=100):
+    nb = nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(f"x = {i}") for i in range(cells)])
+    cache = CellCache(folder)
+    run_hidden = _kernel(checkpoint_size)
+    cache.resume(nb, run_hidden)
+    for index, cell in enumerate(nb.cells):
+        cache.executed(cell, index, elapsed=5.0, run_hidden=run_hidden)
+    cache.save()
+    return cache
+
+
+def _kept(cache):
+    return [index for index, cell_hash in cache.hashes.items() if cache.cells[cell_hash]["checkpoint"]]
+
+
+def test_only_the_latest_checkpoints_are_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "CHECKPOINT_MAX_COUNT", 3)
+    cache = _run(tmp_path)
+    assert _kept(cache) == [7, 8, 9]
+    assert sorted(p.stem for p in tmp_path.glob("*.pkl")) == sorted(cache.hashes[i] for i in (7, 8, 9))
+
+
+def test_checkpoints_fit_the_byte_budget(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "CHECKPOINT_MAX_BYTES", 250)
+    cache = _run(tmp_path)
+    assert _kept(cache) == [8, 9]
+    assert sum(p.stat().st_size for p in tmp_path.glob("*.pkl")) <= 250
+
+
+def test_checkpoint_larger_than_the_budget_is_not_kept(tmp_path, monkeypatch):
+    monkeypatch.setattr(incremental, "CHECKPOINT_MAX_BYTES", 50)
+    cache = _run(tmp_path)
+    assert _kept(cache) == []
+    assert list(tmp_path.glob("*.pkl")) == []
@@ -0,0 +1,67 @@
+import pytest
+from repronotebook.checks_pipeline.execution import kernel_pool
+from repronotebook.checks_pipeline.execution.kernel_pool import KernelPool, get_kernel_pool, shutdown_env_kernels
+
+
+class FakeKernel:
+    def __init__(self):
+        self.alive = True
+
+    async def is_alive(self):
+        return self.alive
+
+    async def restart_kernel(self, now=False):
+        pass
+
+    async def shutdown_kernel(self, now=False):
+        self.alive = False
+
+
+@pytest.fixture(autouse=True)
+def fake_kernels(monkeypatch):
+    monkeypatch.setattr(kernel_pool, "_pools", {})
+    monkeypatch.setattr(KernelPool, "_start", lambda self: FakeKernel())
+
+
+def _env(tmp_path, name):
+    python = tmp_path / name / "bin" / "python"
+    python.parent.mkdir(parents=True)
+    python.touch()
+    return python
+
+
+def _run(pool):
+    km, _ = pool.acquire()
+    pool.release(km)
+    return km
+
+
+def test_pools_of_one_env_share_its_idle_kernel(tmp_path):
+    python = _env(tmp_path, "env")
+    restart = _run(get_kernel_pool(python=python, reset_mode="restart"))
+    reset = _run(get_kernel_pool(python=python, reset_mode="reset"))
+    assert reset.alive and not restart.alive
+
+
+def test_only_recent_envs_keep_idle_kernels(tmp_path, monkeypatch):
+    monkeypatch.setattr(kernel_pool, "MAX_IDLE_ENVS", 2)
+    kernels = [_run(get_kernel_pool(python=_env(tmp_path, f"env{i}"))) for i in range(3)]
+    assert [km.alive for km in kernels] == [False, True, True]
+
+
+def test_evicted_env_kernels_are_shut_down(tmp_path):
+    python = _env(tmp_path, "env")
+    km = _run(get_kernel_pool(python=python))
+    shutdown_env_kernels(tmp_path / "env")
+    assert not km.alive
+    assert kernel_pool._pools == {}
+
+
+def test_kernel_of_a_removed_env_is_not_handed_out(tmp_path):
+    python = _env(tmp_path, "env")
+    pool = get_kernel_pool(python=python)
+    km = _run(pool)
+    python.unlink()
+    with pytest.raises(RuntimeError, match="no longer exists"):
+        pool.acquire()
+    assert not km.alive
@@ -0,0 +1,46 @@
+import json
+from rocrate.rocrate import ROCrate
+from repronotebook.ro_crate_library import metadata_writer
+from repronotebook.ro_crate_library.library_rocrate import generate_ro_crate_with_library
+from repronotebook.ro_crate_library.metadata_writer import write_crate_metadata
+
+
+def _tree(folder):
+    for name in ["a/b/data.csv", "a/n.ipynb", "c d/ü.txt", "z/y/x/deep.yml", "README.md"]:
+        (folder / name).parent.mkdir(parents=True, exist_ok=True)
+        (folder / name).write_text(name)
+    for i in range(25):
+        (folder / "many" / f"f{i:02}.txt").parent.mkdir(exist_ok=True)
+        (folder / "many" / f"f{i:02}.txt").write_text(str(i))
+    return folder
+
+
+def test_large_folders_are_listed_like_small_ones(tmp_path, monkeypatch):
+    crate = _tree(tmp_path / "crate")
+    write_crate_metadata(crate, {"name": "t"})
+    in_memory = (crate / "ro-crate-metadata.json").read_text()
+    # Force every folder listing through sorted runs merged from disk
+    monkeypatch.setattr(metadata_writer, "SORT_RUN_SIZE", 2)
+    stats = write_crate_metadata(crate, {"name": "t"})
+    assert (crate / "ro-crate-metadata.json").read_text() == in_memory
+    assert stats["files"] == 30 and stats["datasets"] == 7
+
+
+def test_metadata_loads_with_rocrate_py(tmp_path):
+    crate = _tree(tmp_path / "crate")
+    write_crate_metadata(crate, {"name": "t"}, file_properties={"a/n.ipynb": {"sha256": "abc"}})
+    loaded = ROCrate(crate)
+    assert loaded.root_dataset["name"] == "t"
+    assert loaded.dereference("many/")["hasPart"][0].id == "many/f00.txt"
+    assert loaded.dereference("a/n.ipynb")["sha256"] == "abc"
+    assert loaded.dereference("c%20d/%C3%BC.txt")["contentSize"] == str(len("c d/ü.txt".encode()))
+    graph = json.loads((crate / "ro-crate-metadata.json").read_text())["@graph"]
+    ids = [entity["@id"] for entity in graph]
+    assert ids.index("a/b/data.csv") < ids.index("a/b/") < ids.index("./")
+
+
+def test_library_crate_records_checksums(tmp_path):
+    crate = generate_ro_crate_with_library(str(_tree(tmp_path / "data")), "Ada")
+    graph = {e["@id"]: e for e in json.loads((crate / "ro-crate-metadata.json").read_text())["@graph"]}
+    assert len(graph["README.md"]["sha256"]) == 64
+    assert graph["#author"]["name"] == "Ada"
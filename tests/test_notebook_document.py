@@ -0,0 +1,20 @@
+from repronotebook.checks_pipeline.notebook_document import strip_magics
+
+
+def test_help_syntax_becomes_pass():
+    assert strip_magics("np.mean?\n  obj??") == "pass\n  pass"
+
+
+def test_code_ending_in_a_question_mark_is_kept():
+    source = 's = "why?"\nvalue = x  # really?'
+    assert strip_magics(source) == source
+
+
+def test_magics_keep_line_numbers():
+    assert strip_magics("%matplotlib inline\n!ls\nx = 1") == "pass\npass\nx = 1"
+    assert strip_magics("%time y = f()") == "y = f()"
+    assert strip_magics("%%bash\necho hi") == ""
+
+
+def test_assigned_magic_keeps_its_target():
+    assert strip_magics("files = !ls\n  out = %sx pwd") == "files = None\n  out = None"
@@ -0,0 +1,69 @@
+import json
+import pytest
+from repronotebook.checks_pipeline.notebook_reader import (
+    METADATA_KEYS, NotebookStreamError, iter_notebook_cells, read_notebook_sources,
+)
+
+
+def _join(value):
+    return "".join(value) if isinstance(value, list) else value
+
+
+@pytest.fixture
+def notebook(tmp_path):
+    nb = {
+        "cells": [
+            {"cell_type": "markdown", "metadata": {}, "source": ["# Title with \"quotes\" and \\ backslash\n", "ünïcødé ✓"]},
+            {"cell_type": "code", "execution_count": 1, "metadata": {"tags": ["a]", "{b"]},
+             "source": "x = {'k': [1, 2]}\nprint(\"}]\")",
+             "outputs": [
+                 {"output_type": "stream", "name": "stdout", "text": ["}]\n", "done\n"]},
+                 {"output_type": "execute_result", "execution_count": 1, "metadata": {},
+                  "data": {"text/plain": ["{'k': ", "[1, 2]}"], "application/json": {"nested": [{"a": None}, True, 1.5e3]}}},
+             ]},
+            {"cell_type": "raw", "metadata": {}, "source": "", "attachments": {"x.png": {"image/png": "QUJD" * 500}}},
+        ],
+        "metadata": {"kernelspec": {"name": "python3", "display_name": "Python 3"},
+                     "language_info": {"name": "python"},
+                     "widgets": {"state": {"w": "x" * 10000}}},
+        "nbformat": 4,
+        "nbformat_minor": 5,
+    }
+    path = tmp_path / "nb.ipynb"
+    path.write_text(json.dumps(nb, indent=1, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_read_notebook_sources_matches_json_load(notebook, chunk_size):
+    with open(notebook, encoding="utf-8") as f:
+        expected = json.load(f)
+    streamed = read_notebook_sources(notebook, chunk_size=chunk_size)
+    assert streamed["nbformat"] == 4 and streamed["nbformat_minor"] == 5
+    assert streamed["metadata"] == {key: expected["metadata"][key] for key in METADATA_KEYS}
+    assert streamed["cells"] == [
+        {"cell_type": cell["cell_type"], "source": _join(cell["source"])} for cell in expected["cells"]
+    ]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 1 << 20])
+def test_iter_notebook_cells_matches_json_load(notebook, chunk_size):
+    with open(notebook, encoding="utf-8") as f:
+        expected = json.load(f)["cells"]
+    for cell in expected:
+        cell["source"] = _join(cell["source"])
+        for output in cell.get("outputs", ()):
+            if "text" in output:
+                output["text"] = _join(output["text"])
+            for mime, value in output.get("data", {}).items():
+                output["data"][mime] = _join(value)
+    assert list(iter_notebook_cells(notebook, chunk_size=chunk_size)) == expected
+
+
+def test_non_notebook_json_is_rejected(tmp_path):
+    path = tmp_path / "data.json"
+    path.write_text(json.dumps({"rows": [1, 2, 3]}))
+    with pytest.raises(NotebookStreamError):
+        read_notebook_sources(path)
+    with pytest.raises(NotebookStreamError):
+        list(iter_notebook_cells(path))
@@ -0,0 +1,36 @@
+import nbformat
+from repronotebook.checks_pipeline.output_check.output_diff import compare_notebooks
+
+
+def _code(source, text):
+    cell = nbformat.v4.new_code_cell(source, execution_count=1)
+    cell.outputs = [nbformat.v4.new_output("stream", name="stdout", text=text)]
+    return cell
+
+
+def _write(path, cells):
+    nbformat.write(nbformat.v4.new_notebook(cells=cells), path)
+    return path
+
+
+def test_added_and_removed_markdown_cells_are_not_mismatches(tmp_path):
+    original = _write(tmp_path / "original.ipynb", [
+        nbformat.v4.new_markdown_cell("# Title"), _code("print(1)", "1\n"),
+        nbformat.v4.new_raw_cell("raw"), _code("print(2)", "2\n"),
+    ])
+    executed = _write(tmp_path / "executed.ipynb", [
+        _code("print(1)", "1\n"), nbformat.v4.new_markdown_cell("new notes"),
+        nbformat.v4.new_markdown_cell("more"), _code("print(2)", "2\n"),
+    ])
+    report = compare_notebooks(original, executed)
+    assert report["reproducible"] is True
+    assert [(cell["index"], cell["status"]) for cell in report["cells"]] == [(1, "identical"), (3, "identical")]
+
+
+def test_missing_code_cell_is_different(tmp_path):
+    original = _write(tmp_path / "original.ipynb", [_code("print(1)", "1\n"), _code("print(2)", "2\n")])
+    executed = _write(tmp_path / "executed.ipynb", [nbformat.v4.new_markdown_cell("x"), _code("print(1)", "1\n")])
+    report = compare_notebooks(original, executed)
+    assert report["reproducible"] is False
+    assert report["cells"][-1] == {"index": 1, "status": "different", "outputs": [],
+                                   "detail": "cell missing from the re-run"}
@@ -0,0 +1,32 @@
+import nbformat
+from repronotebook.checks_pipeline.pipeline import notebook_key, run_pipeline
+
+
+def _notebook(path, source):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    nbformat.write(nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(source)]), path)
+    return path
+
+
+def test_notebook_key_is_unique_per_relative_path(tmp_path):
+    assert notebook_key(tmp_path / "analysis.ipynb", tmp_path) == "analysis"
+    a = notebook_key(tmp_path / "a" / "analysis.ipynb", tmp_path)
+    b = notebook_key(tmp_path / "b" / "analysis.ipynb", tmp_path)
+    assert a != b
+    assert a.startswith("analysis-") and b.startswith("analysis-")
+
+
+def test_same_named_notebooks_keep_separate_outputs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    notebooks = [_notebook(tmp_path / "a" / "analysis.ipynb", "import json"),
+                 _notebook(tmp_path / "b" / "analysis.ipynb", "import yaml")]
+
+    results = run_pipeline(notebooks, tmp_path, generate_rocrate=True)
+    assert [r["status"] for r in results] == ["ok", "ok"]
+    crates = {r["crate"] for r in results}
+    assert len(crates) == 2
+
+    generated = tmp_path / "generated"
+    assert len(list((generated / "style_reports").glob("analysis-*.json"))) == 2
+    requirements = sorted(p.read_text().strip().lower() for p in (generated / "dependencies").glob("*/requirements.txt"))
+    assert requirements == ["", "pyyaml"]
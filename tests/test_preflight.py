@@ -0,0 +1,16 @@
+import os
+from repronotebook.checks_pipeline import preflight
+
+
+def test_installing_a_kernelspec_changes_the_fingerprint(tmp_path, monkeypatch):
+    kernels = tmp_path / "kernels"
+    kernels.mkdir()
+    monkeypatch.setattr(preflight, "_kernelspec_dirs", lambda: [kernels, tmp_path / "missing"])
+    before = preflight._fingerprint()
+    assert preflight._fingerprint() == before
+
+    (kernels / "myenv").mkdir()
+    # Directory mtimes can be coarse; make sure this one moves
+    stat = kernels.stat()
+    os.utime(kernels, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert preflight._fingerprint() != before
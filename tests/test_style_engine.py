@@ -0,0 +1,55 @@
+import nbformat
+import pytest
+from repronotebook.checks_pipeline.styling_check.style_engine import check_style, engine_available
+
+pytestmark = pytest.mark.skipif(not engine_available(), reason="pyflakes/pycodestyle not installed")
+
+
+def _issues(tmp_path, *sources):
+    nb = tmp_path / "nb.ipynb"
+    nbformat.write(nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(s) for s in sources]), nb)
+    return [(issue["cell"], issue["code"]) for issue in check_style(nb, tmp_path / "cache", use_cache=False)]
+
+
+def test_name_defined_in_an_earlier_cell_is_not_undefined(tmp_path):
+    assert _issues(tmp_path, "x = 1", "print(x)") == []
+
+
+def test_name_defined_only_in_a_later_cell_is_undefined(tmp_path):
+    assert _issues(tmp_path, "print(x)", "x = 1") == [(0, "F821")]
+
+
+def test_import_used_in_a_later_cell_is_not_unused(tmp_path):
+    assert _issues(tmp_path, "import os", "os.getcwd()") == []
+    assert _issues(tmp_path, "import numpy as np", "np.zeros(1)") == []
+
+
+def test_import_used_only_before_it_is_unused(tmp_path):
+    assert _issues(tmp_path, "re.compile('x')", "import re") == [(0, "F821"), (1, "F401")]
+
+
+def test_cached_results_resolve_like_fresh_ones(tmp_path):
+    sources = ("print(x)", "x = 1", "import os", "os.getcwd()")
+    nb = tmp_path / "nb.ipynb"
+    nbformat.write(nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(s) for s in sources]), nb)
+    fresh = check_style(nb, tmp_path / "cache")
+    assert check_style(nb, tmp_path / "cache") == fresh
+    assert [(issue["cell"], issue["code"]) for issue in fresh] == [(0, "F821")]
+
+
+def test_assigned_magic_keeps_its_target(tmp_path):
+    assert _issues(tmp_path, "files = !ls\nprint(files)") == []
+    assert _issues(tmp_path, "out = %sx ls", "print(out)") == []
+
+
+def test_ipython_builtins_are_defined(tmp_path):
+    assert _issues(tmp_path, "display(get_ipython())\nprint(In, Out)") == []
+
+
+def test_names_bound_inside_functions_stay_local(tmp_path):
+    assert _issues(tmp_path, "def f():\n    y = 1\n    return y", "print(y)") == [(1, "F821")]
+    assert _issues(tmp_path, "squares = [n * n for n in range(3)]", "print(n)") == [(1, "F821")]
+
+
+def test_global_declared_in_a_function_is_bound(tmp_path):
+    assert _issues(tmp_path, "def setup():\n    global cfg\n    cfg = 1", "print(cfg)") == []
@@ -0,0 +1,24 @@
+import csv
+import json
+from repronotebook.checks_pipeline import tracing
+
+
+def _trace(trace_path):
+    tracing.enable_tracing(trace_path)
+    with tracing.span("stage", category="stage"):
+        pass
+    return tracing.finish_tracing(trace_path)
+
+
+def test_csv_replaces_the_trace_suffix(tmp_path):
+    json_path, csv_path = _trace(tmp_path / "trace.json")
+    assert csv_path == tmp_path / "trace.csv"
+    assert any(e.get("name") == "stage" for e in json.loads(json_path.read_text())["traceEvents"])
+    with open(csv_path, newline="") as f:
+        assert [row["name"] for row in csv.DictReader(f)] == ["stage"]
+
+
+def test_csv_does_not_overwrite_a_csv_named_trace(tmp_path):
+    json_path, csv_path = _trace(tmp_path / "trace.csv")
+    assert csv_path == tmp_path / "trace.spans.csv"
+    assert json.loads(json_path.read_text())["traceEvents"]
@@ -0,0 +1,38 @@
+import nbformat
+from repronotebook.checks_pipeline.dependency_check.dependency import local_modules, module_search_dirs
+from repronotebook.checks_pipeline.notebook_document import load_notebook
+from repronotebook.checks_pipeline.watch import WatchSession
+
+
+def _notebook(path, source):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    nbformat.write(nbformat.v4.new_notebook(cells=[nbformat.v4.new_code_cell(source)]), path)
+    return path
+
+
+def _project(tmp_path):
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "helpers.py").write_text("def load(): pass\n")
+    importer = _notebook(tmp_path / "notebooks" / "analysis.ipynb", "import helpers\nhelpers.load()")
+    other = _notebook(tmp_path / "notebooks" / "plots.ipynb", "import json")
+    return importer, other
+
+
+def test_helper_module_under_src_is_found(tmp_path):
+    importer, other = _project(tmp_path)
+    search = module_search_dirs(importer, tmp_path)
+    assert local_modules(load_notebook(importer), search) == [tmp_path / "src" / "helpers.py"]
+    assert local_modules(load_notebook(other), search) == []
+
+
+def test_changed_helper_module_reruns_its_importers_anywhere(tmp_path):
+    importer, other = _project(tmp_path)
+    package = _notebook(tmp_path / "reports" / "summary.ipynb", "from src.helpers import load")
+    session = WatchSession(tmp_path)
+    try:
+        session.scan()
+        affected, rescan = session._affected({tmp_path / "src" / "helpers.py"})
+        assert sorted(affected) == sorted([importer.resolve(), package.resolve()])
+        assert not rescan
+    finally:
+        session.close()
@@ -0,0 +1,75 @@
+import pytest
+from repronotebook.push_to_zenodo.emulator import ZenodoEmulator
+from repronotebook.push_to_zenodo.zenodo_upload import ZenodoError, ZenodoUploader, file_md5, load_state, upload_with_state
+
+METADATA = {"title": "Test crate", "upload_type": "dataset"}
+
+
+@pytest.fixture
+def emulator():
+    with ZenodoEmulator() as emulator:
+        yield emulator
+
+
+def _uploader(emulator, **kwargs):
+    return ZenodoUploader(access_token="test", base_url=emulator.api_url, backoff=0, show_progress=False, **kwargs)
+
+
+@pytest.fixture
+def crate_zip(tmp_path):
+    path = tmp_path / "crate.zip"
+    path.write_bytes(b"PK" + bytes(range(256)) * 400)
+    return path
+
+
+def test_upload_and_publish(emulator, crate_zip, tmp_path):
+    state_path = tmp_path / "state.json"
+    with _uploader(emulator) as uploader:
+        result = upload_with_state(uploader, crate_zip, METADATA, publish=True, state_path=state_path)
+    deposition = emulator.store.depositions[int(result["deposition_id"])]
+    assert deposition["submitted"]
+    assert result["doi"] == deposition["doi"]
+    assert deposition["files"]["crate.zip"]["md5"] == file_md5(crate_zip)
+    assert load_state(state_path)["doi"] == result["doi"]
+
+
+def test_interrupted_upload_resumes_the_same_deposition(emulator, crate_zip, tmp_path):
+    state_path = tmp_path / "state.json"
+    with _uploader(emulator) as uploader:
+        first = upload_with_state(uploader, crate_zip, METADATA, state_path=state_path)
+        second = upload_with_state(uploader, crate_zip, METADATA, publish=True, state_path=state_path)
+    assert second["deposition_id"] == first["deposition_id"]
+    assert len(emulator.store.depositions) == 1
+    # The file already in the draft is not sent again
+    assert emulator.stats["files_uploaded"] == 1
+    assert second["doi"]
+
+
+def test_post_is_not_retried_on_server_error(emulator):
+    emulator.config.error_rate = 1.0
+    with _uploader(emulator, max_retries=3) as uploader:
+        with pytest.raises(ZenodoError) as error:
+            uploader.create_deposition(METADATA)
+    assert error.value.status_code >= 500
+    assert emulator.stats["requests"] == 1
+
+
+def test_idempotent_requests_are_retried_on_server_error(emulator):
+    with _uploader(emulator, max_retries=3) as uploader:
+        deposition_id = uploader.create_deposition(METADATA)
+        emulator.config.error_rate = 1.0
+        with pytest.raises(ZenodoError):
+            uploader.update_metadata(deposition_id, METADATA)
+    assert emulator.stats["requests"] == 1 + 4
+    assert emulator.stats["errors_injected"] == 4
+
+
+def test_new_version_continues_an_open_draft(emulator, crate_zip):
+    with _uploader(emulator) as uploader:
+        deposition_id = uploader.create_deposition(METADATA)
+        uploader.upload_file(deposition_id, crate_zip)
+        uploader.publish_deposition(deposition_id)
+        draft_id = uploader.new_version(deposition_id)
+        # Zenodo refuses a second draft; the open one is returned instead
+        assert uploader.new_version(deposition_id) == draft_id
+    assert set(emulator.store.depositions[int(draft_id)]["files"]) == {"crate.zip"}
@@ -0,0 +1,46 @@
+import os
+import zipfile
+from repronotebook.push_to_zenodo.postprocessing import zip_ro_crate
+from repronotebook.push_to_zenodo.zip_writer import CHUNK_SIZE, iter_tree, write_zip
+
+
+def _crate(folder):
+    (folder / "data").mkdir(parents=True)
+    (folder / "ro-crate-metadata.json").write_text('{"@graph": []}')
+    (folder / "notebook.ipynb").write_text('{"cells": []}\n' * 1000)
+    (folder / "data" / "image.png").write_bytes(os.urandom(1000))
+    # Large enough to be deflated in parallel chunks
+    (folder / "data" / "table.csv").write_text("a,b,c\n1,2,3\n" * (CHUNK_SIZE // 2))
+    return folder
+
+
+def test_zip_is_byte_reproducible(tmp_path):
+    crate = _crate(tmp_path / "crate")
+    first = zip_ro_crate(crate, tmp_path / "first.zip", jobs=4)
+    # Touch every file: timestamps must not leak into the archive
+    for path in crate.rglob("*"):
+        os.utime(path, (1_000_000_000, 1_000_000_000))
+    second = zip_ro_crate(crate, tmp_path / "second.zip", jobs=1)
+    assert first.read_bytes() == second.read_bytes()
+
+
+def test_zip_round_trips_through_zipfile(tmp_path):
+    crate = _crate(tmp_path / "crate")
+    archive = zip_ro_crate(crate, tmp_path / "crate.zip")
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.testzip() is None
+        names = zf.namelist()
+        assert names == sorted(names)
+        for arcname, path in iter_tree(crate):
+            if path is not None:
+                assert zf.read(arcname) == path.read_bytes()
+        # Already-compressed formats are stored
+        assert zf.getinfo("crate/data/image.png").compress_type == zipfile.ZIP_STORED
+        assert zf.getinfo("crate/data/table.csv").compress_type == zipfile.ZIP_DEFLATED
+
+
+def test_source_date_epoch_sets_member_timestamps(tmp_path, monkeypatch):
+    monkeypatch.setenv("SOURCE_DATE_EPOCH", "1700000000")
+    archive = write_zip(tmp_path / "out.zip", [("a.txt", b"hello")])
+    with zipfile.ZipFile(archive) as zf:
+        assert zf.getinfo("a.txt").date_time[:3] == (2023, 11, 14)